@@ -0,0 +1,574 @@
+"""
+异步（asyncio）服务模式
+基于aiohttp提供与Flask版本相同JSON/SSE协议的翻译接口和流式翻译接口，
+上游调用使用非阻塞客户端，单个进程即可同时保持大量流式连接
+
+启动: python3 async_app.py
+"""
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+from aiohttp import web
+from dotenv import load_dotenv
+
+import config
+from translation_cache import TranslationCache, make_cache_key, prompt_fingerprint
+from cache_store import open_store
+from prompt_builder import TokenBudget, build_messages
+from language_detect import is_entirely_in, resolve_source_lang
+import metrics
+from metrics import STAGE_SECONDS, record_error
+from segmenter import split_into_chunks, join_translations, chunk_joiner, estimate_tokens, DeltaStripper
+from sse import (HEARTBEAT, StreamDeadline, StreamEncoder, StreamTimeout, aiter_sse_data, aiter_with_heartbeat,
+                 json_loads, parse_stream_mode)
+from singleflight import AsyncSingleFlight
+from translation_memory import finish_with_memory, learn_translation, open_memory, plan_with_memory
+
+# 加载.env文件中的配置
+dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+if os.path.exists(dotenv_path):
+    load_dotenv(dotenv_path)
+    print(f"已加载环境变量: {dotenv_path}")
+else:
+    print("警告: 未找到.env文件")
+
+# 上游服务选择：deepseek 或 chatglm（OpenAI兼容接口）
+PROVIDER = os.getenv('ASYNC_PROVIDER', 'deepseek' if os.getenv('DEEPSEEK_API_KEY') else 'chatglm')
+if PROVIDER == 'deepseek':
+    API_KEY = os.getenv('DEEPSEEK_API_KEY')
+    API_URL = f"{os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com')}/v1/chat/completions"
+    MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')
+else:
+    API_KEY = os.getenv('CHATGLM_API_KEY')
+    API_URL = os.getenv('CHATGLM_API_URL')
+    MODEL = os.getenv('CHATGLM_MODEL')
+JAVA_BACKEND_URL = os.getenv('JAVA_BACKEND_URL', 'http://localhost:8080/api/translations')
+
+print(f"异步服务模式，上游: {PROVIDER}，模型: {MODEL}")
+print(f"API配置状态: {'已配置' if API_KEY else '未配置'}")
+print(f"完整API路径: {API_URL}")
+
+# 翻译结果缓存（与Flask版本共享同一个磁盘缓存）
+cache_store = open_store(config.CACHE_DB_PATH, config.CACHE_DB_MAX_MB * 1024 * 1024,
+                         config.CACHE_TTL_SECONDS, config.CACHE_DB_POLICY)
+translation_cache = TranslationCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS, cache_store)
+# 翻译记忆（与Flask版本共享同一个记忆库）；SQLite查询和写入放到线程中执行，不阻塞事件循环
+translation_memory = open_memory(config.TM_DB_PATH, config.TM_FUZZY_THRESHOLD, config.TM_MAX_SEGMENTS)
+# 合并并发的相同翻译请求
+inflight = AsyncSingleFlight()
+# 上游token预算：按原文长度和目标语言确定每次调用的max_tokens，并按上游返回的usage校准估算
+token_budget = TokenBudget(config.MODEL_CONTEXT_TOKENS, config.MAX_OUTPUT_TOKENS, config.MIN_OUTPUT_TOKENS,
+                           config.OUTPUT_TOKEN_SAFETY)
+
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # 防止Nginx缓冲
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+def sse_event(data):
+    return f"data: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=lambda d: json.dumps(d, ensure_ascii=False))
+
+
+def segment_cache_key(text, source_lang, target_lang, references=None):
+    messages = build_messages(text, source_lang, target_lang, references=references)
+    return make_cache_key(text, source_lang, target_lang, MODEL, prompt_fingerprint(messages, text))
+
+
+async def call_llm_api(session, messages, target_lang, stream=False, max_tokens=None):
+    """非阻塞调用上游接口，流式模式返回未读取的响应对象；max_tokens默认按token预算估算"""
+    if not API_KEY:
+        raise ValueError("未配置API密钥")
+    if max_tokens is None:
+        max_tokens = token_budget.max_tokens(messages, target_lang, MODEL)
+        if max_tokens is None:
+            raise ValueError("原文超出模型上下文窗口，请切分后再翻译")
+
+    payload = {
+        "model": MODEL,
+        "messages": messages,
+        "temperature": 0.3,
+        "max_tokens": max_tokens
+    }
+    if stream:
+        payload["stream"] = True
+
+    start = time.perf_counter()
+    try:
+        response = await session.post(
+            API_URL,
+            headers={"Authorization": f"Bearer {API_KEY}"},
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=None if stream else 300, sock_read=300)
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        record_error('upstream', e)
+        metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, (PROVIDER, MODEL or '', type(e).__name__))
+        raise
+    if response.status >= 400:
+        body = await response.text()
+        response.release()
+        outcome = 'http_429' if response.status == 429 else f"http_{response.status // 100}xx"
+        metrics.ERRORS.inc(('upstream', outcome))
+        metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, (PROVIDER, MODEL or '', outcome))
+        raise ValueError(f"API HTTP错误({response.status}): {body[:200]}")
+    metrics.UPSTREAM_TTFB_SECONDS.observe(time.perf_counter() - start, (PROVIDER, MODEL or ''))
+    if stream:
+        return response
+    async with response:
+        result = await response.json()
+    metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, (PROVIDER, MODEL or '', 'ok'))
+    record_usage(messages, target_lang, result.get('usage'), max_tokens, result['choices'][0].get('finish_reason'))
+    return result
+
+
+def record_usage(messages, target_lang, usage, max_tokens, finish_reason):
+    """把上游返回的usage交给token预算校准，返回译文是否因max_tokens不足被截断"""
+    truncated = finish_reason == 'length'
+    token_budget.record(MODEL, messages, target_lang, usage if isinstance(usage, dict) else None,
+                        max_tokens, truncated)
+    if truncated:
+        print(f"⚠️ 译文达到max_tokens={max_tokens}被截断")
+    return truncated
+
+
+async def translate_segment(session, text, source_lang, target_lang, references=None):
+    """翻译单个原文片段（优先查缓存），返回(译文, 是否命中缓存)；references为翻译记忆中相似句的(原文, 译文)参考"""
+    cache_key = segment_cache_key(text, source_lang, target_lang, references)
+    cached_text = translation_cache.get(cache_key)
+    if cached_text is not None:
+        return cached_text, True
+
+    async def call():
+        messages = build_messages(text, source_lang, target_lang, references=references)
+        result = await call_llm_api(session, messages, target_lang)
+        if result['choices'][0].get('finish_reason') == 'length':
+            # 估算的max_tokens偏小导致译文被截断时，按上限重新翻译一次
+            result = await call_llm_api(session, messages, target_lang, max_tokens=token_budget.max_output_tokens)
+        translated_text = result['choices'][0]['message']['content'].strip()
+        translation_cache.set(cache_key, translated_text)
+        return translated_text
+
+    translated_text, _ = await inflight.do(cache_key, call)
+    return translated_text, False
+
+
+async def save_to_database(session, original_text, translated_text, source_lang, target_lang, ip_address):
+    """保存翻译记录到Java后端数据库，失败只记录日志"""
+    if not translated_text or not translated_text.strip():
+        return False
+    data = {
+        "originalText": original_text,
+        "translatedText": translated_text,
+        "sourceLang": source_lang,
+        "targetLang": target_lang,
+        "ipAddress": ip_address,
+        "model": MODEL
+    }
+    start = time.perf_counter()
+    try:
+        async with session.post(JAVA_BACKEND_URL, json=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status == 201:
+                return True
+            print(f"保存到数据库失败: HTTP {response.status}")
+            metrics.ERRORS.inc(('history', f"http_{response.status // 100}xx"))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"连接Java后端失败: {str(e)}")
+        record_error('history', e)
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, ('history_write',))
+    return False
+
+
+def spawn_background(app, coro):
+    """启动后台任务并保持引用，关闭服务时等待其完成"""
+    task = asyncio.ensure_future(coro)
+    app['background_tasks'].add(task)
+    task.add_done_callback(app['background_tasks'].discard)
+    return task
+
+
+async def parse_request(request):
+    """解析翻译请求，返回(text, source_lang, target_lang)或错误响应"""
+    try:
+        data = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        data = None
+    if not data:
+        return None, json_response({"error": "未收到有效的JSON数据"}, 400)
+    text = data.get('text', '')
+    if not text:
+        return None, json_response({"error": "文本不能为空"}, 400)
+    source_lang = data.get('source_lang', config.DEFAULT_SOURCE_LANG)
+    target_lang = data.get('target_lang', config.DEFAULT_TARGET_LANG)
+    return (text, source_lang, target_lang), None
+
+
+async def translate(request):
+    """翻译API端点，请求和响应格式与app.py相同"""
+    if not API_KEY:
+        return json_response({"error": "未配置API密钥"}, 500)
+    parsed, error = await parse_request(request)
+    if error is not None:
+        return error
+    text, source_lang, target_lang = parsed
+    session = request.app['client_session']
+
+    # 未指定源语言时在本地检测；整段原文已是目标语言时直接返回，不调用上游
+    with STAGE_SECONDS.time(('detect',)):
+        source_lang, detected = resolve_source_lang(text, source_lang)
+    if detected and source_lang == target_lang and is_entirely_in(text, target_lang):
+        return json_response({
+            "original_text": text,
+            "translated_text": text,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "mode": "api",
+            "cached": False,
+            "detected_source_lang": source_lang,
+            "same_language": True
+        })
+
+    semaphore = asyncio.Semaphore(max(1, config.TRANSLATE_PARALLELISM))
+
+    async def translate_text(part, references=()):
+        """长文本按段落/句子切分，各片段并发翻译后按顺序拼接；模糊命中的参考只附在包含该句的片段上"""
+        chunks = split_into_chunks(part, token_budget.chunk_tokens(config.SEGMENT_MAX_TOKENS, target_lang))
+
+        async def run(chunk):
+            chunk_references = [(source, target) for sentence, source, target in references
+                                if sentence in chunk.text]
+            async with semaphore:
+                return await translate_segment(session, chunk.text, source_lang, target_lang, chunk_references or None)
+
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return join_translations(chunks, [r[0] for r in results], target_lang), all(r[1] for r in results)
+
+    try:
+        # 与Flask版本相同：多句文档先查翻译记忆，精确命中的句子直接复用，没有任何命中时按普通方式翻译
+        plan = None
+        if translation_memory is not None:
+            with STAGE_SECONDS.time(('memory',)):
+                plan = await asyncio.to_thread(plan_with_memory, translation_memory, text, source_lang, target_lang)
+        memory_stats = None
+        if plan is not None:
+            results = await asyncio.gather(*(translate_text(span.source, span.references) for span in plan.spans))
+            translated_text, memory_stats = await asyncio.to_thread(
+                finish_with_memory, translation_memory, plan, results, source_lang, target_lang)
+            cached = memory_stats["cached"]
+            print(f"翻译记忆命中 {memory_stats['memory_hits']}/{memory_stats['segments']} 句")
+        else:
+            translated_text, cached = await translate_text(text)
+            if not cached and translation_memory is not None:
+                await asyncio.to_thread(learn_translation, translation_memory, text, translated_text,
+                                        source_lang, target_lang)
+    except Exception as e:
+        print(f"翻译错误: {str(e)}")
+        record_error('api', e)
+        return json_response({"error": str(e)}, 500)
+
+    spawn_background(request.app, save_to_database(
+        session, text, translated_text, source_lang, target_lang, request.remote))
+
+    return json_response({
+        "original_text": text,
+        "translated_text": translated_text,
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "mode": "api",
+        "cached": cached,
+        **({"detected_source_lang": source_lang} if detected else {}),
+        **({"translation_memory": {k: memory_stats[k] for k in ("segments", "memory_hits", "translated")}}
+           if memory_stats else {})
+    })
+
+
+async def translate_stream(request):
+    """流式翻译API端点，SSE事件格式与app.py相同"""
+    if not API_KEY:
+        return json_response({"error": "未配置API密钥"}, 500)
+    parsed, error = await parse_request(request)
+    if error is not None:
+        return error
+    text, source_lang, target_lang = parsed
+    stream_mode = parse_stream_mode((await request.json()).get('stream_mode'))
+    if stream_mode is None:
+        return json_response({"error": "stream_mode只能是full或delta"}, 400)
+    session = request.app['client_session']
+
+    response = web.StreamResponse(headers=SSE_HEADERS)
+    await response.prepare(request)
+    encoder = StreamEncoder(stream_mode, config.SSE_COALESCE_MS, config.SSE_COALESCE_BYTES,
+                            config.SSE_CHECKPOINT_EVERY)
+
+    async def emit(event):
+        if event:
+            await response.write(event.encode('utf-8'))
+
+    deadline = StreamDeadline(config.STREAM_IDLE_TIMEOUT, config.STREAM_TOTAL_TIMEOUT)
+    heartbeat = config.STREAM_HEARTBEAT_SECONDS or None
+
+    # 未指定源语言时在本地检测；整段原文已是目标语言时直接返回原文
+    with STAGE_SECONDS.time(('detect',)):
+        source_lang, detected = resolve_source_lang(text, source_lang)
+    start_fields = {'source_lang': source_lang, 'target_lang': target_lang}
+    if detected:
+        start_fields['detected_source_lang'] = source_lang
+    await emit(encoder.start_event(**start_fields))
+    if detected and source_lang == target_lang and is_entirely_in(text, target_lang):
+        await emit(encoder.push(text))
+        await emit(encoder.end_event(same_language=True))
+        await response.write_eof()
+        return response
+
+    # 第一个片段流式输出，其余片段同时并发翻译，完成后按顺序输出
+    chunks = split_into_chunks(text, token_budget.chunk_tokens(config.SEGMENT_MAX_TOKENS, target_lang))
+    semaphore = asyncio.Semaphore(max(1, config.TRANSLATE_PARALLELISM))
+
+    async def run(chunk):
+        async with semaphore:
+            return await translate_segment(session, chunk.text, source_lang, target_lang)
+
+    pending = [asyncio.ensure_future(run(chunk)) for chunk in chunks[1:]]
+    try:
+        first_key = segment_cache_key(chunks[0].text, source_lang, target_lang)
+        first_cached = translation_cache.get(first_key)
+        all_cached = first_cached is not None
+        if first_cached is not None:
+            await emit(encoder.push(chunks[0].leading + first_cached))
+        else:
+            messages = build_messages(chunks[0].text, source_lang, target_lang)
+            max_tokens = token_budget.max_tokens(messages, target_lang, MODEL)
+            api_response = await call_llm_api(session, messages, target_lang, stream=True, max_tokens=max_tokens)
+            usage = None
+            finish_reason = None
+            stream_start = time.perf_counter()
+            first_token_at = None
+            # 与缓存中的译文及非流式拼接一致，去掉片段首尾的空白
+            stripper = DeltaStripper(chunks[0].leading)
+            # 客户端断开、超时或出错而提前退出时，未读完的上游响应随连接一起关闭，上游随即停止生成
+            async with api_response:
+                # 有缓冲的增量时最多等到合并时间窗口结束，随后发送（后沿），不等下一个增量或心跳
+                async for data in aiter_with_heartbeat(aiter_sse_data(api_response.content.iter_any()),
+                                                       lambda: encoder.wait_timeout(heartbeat)):
+                    if data is None:
+                        deadline.check()
+                        # 上游暂时没有输出：发送缓冲的增量或心跳，客户端已断开时写入失败
+                        await emit(encoder.flush() or HEARTBEAT)
+                        continue
+                    deadline.touch()
+                    deadline.check()
+                    try:
+                        data_json = json_loads(data)
+                    except ValueError:
+                        print(f"无法解析JSON: {data[:200]!r}")
+                        continue
+                    if not isinstance(data_json, dict):
+                        continue
+                    if isinstance(data_json.get('usage'), dict):
+                        usage = data_json['usage']
+                    if data_json.get('choices'):
+                        choice = data_json['choices'][0]
+                        finish_reason = choice.get('finish_reason') or finish_reason
+                        content = choice.get('delta', {}).get('content')
+                        if content:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            await emit(encoder.push(stripper.push(content)))
+            record_usage(messages, target_lang, usage, max_tokens, finish_reason)
+            labels = (PROVIDER, MODEL or '')
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - stream_start, labels + ('ok',))
+            if first_token_at is not None:
+                metrics.STREAM_TTFT_SECONDS.observe(first_token_at - stream_start, labels)
+                generation = time.perf_counter() - first_token_at
+                tokens = (usage or {}).get('completion_tokens') or estimate_tokens(encoder.text)
+                if generation > 0 and tokens:
+                    metrics.STREAM_TOKENS_PER_SECOND.observe(tokens / generation, labels)
+            translation_cache.set(first_key, encoder.text)
+
+        for chunk, future in zip(chunks, pending):
+            if not future.done():
+                # 等待其余片段前先发送缓冲的增量
+                await emit(encoder.flush())
+            while not (await asyncio.wait({future}, timeout=heartbeat))[0]:
+                deadline.check(idle=False)
+                await emit(HEARTBEAT)
+            segment_text, segment_cached = future.result()
+            all_cached = all_cached and segment_cached
+            await emit(encoder.push(chunk_joiner(chunk, target_lang) + segment_text))
+
+        await emit(encoder.end_event(**({'cached': True} if all_cached else {})))
+        final_text = encoder.text
+        spawn_background(request.app, save_to_database(
+            session, text, final_text, source_lang, target_lang, request.remote))
+    except (ConnectionResetError, asyncio.CancelledError):
+        print("客户端已断开流式连接")
+        metrics.STREAMS_CANCELLED.inc(('translate_stream', 'client_disconnect'))
+        raise
+    except StreamTimeout as e:
+        print(f"流式翻译超时: {str(e)}")
+        metrics.STREAMS_CANCELLED.inc(('translate_stream', e.reason))
+        await emit(encoder.flush())
+        await response.write(sse_event({'type': 'error', 'message': str(e)}))
+    except Exception as e:
+        print(f"流式翻译过程中出错: {str(e)}")
+        record_error('api', e)
+        await emit(encoder.flush())
+        await response.write(sse_event({'type': 'error', 'message': str(e)}))
+    finally:
+        for future in pending:
+            future.cancel()
+
+    await response.write_eof()
+    return response
+
+
+async def index(request):
+    """首页 - 返回API状态信息"""
+    return json_response({
+        "status": "ok",
+        "message": "翻译API服务正在运行（异步模式）",
+        "model": MODEL,
+        "endpoints": [
+            "/api/translate - 翻译API",
+            "/api/translate/stream - 流式翻译API",
+            "/api/languages - 获取支持的语言",
+            "/api/check - 检查API密钥",
+            "/api/health - 健康检查",
+            "/api/cache/stats - 缓存统计"
+        ]
+    })
+
+
+async def get_languages(request):
+    """获取支持的语言列表"""
+    return json_response({
+        "zh": "中文",
+        "en": "英语",
+        "ja": "日语",
+        "ko": "韩语",
+        "fr": "法语",
+        "de": "德语",
+        "es": "西班牙语",
+        "ru": "俄语",
+        "ar": "阿拉伯语",
+        "pt": "葡萄牙语",
+        "it": "意大利语"
+    })
+
+
+async def check_api(request):
+    """检查API密钥是否已配置"""
+    if API_KEY:
+        return json_response({"status": "ok", "message": "API密钥已配置", "model": MODEL, "offline_mode": False})
+    return json_response({"status": "error", "message": "API密钥未配置"}, 500)
+
+
+async def health_check(request):
+    return json_response({"status": "ok", "message": "服务正常运行", "model": MODEL})
+
+
+async def cache_stats(request):
+    """翻译缓存命中/未命中/淘汰统计，以及合并的并发请求数"""
+    stats = translation_cache.stats()
+    stats["inflight"] = inflight.stats()
+    stats["translation_memory"] = translation_memory.stats() if translation_memory is not None else None
+    return json_response(stats)
+
+
+async def providers_stats(request):
+    """上游服务和token预算的校准情况"""
+    return json_response({"provider": PROVIDER, "model": MODEL, "token_budget": token_budget.stats()})
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """允许任何来源访问API"""
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    response.headers.setdefault('Access-Control-Allow-Headers', 'Content-Type')
+    response.headers.setdefault('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+    return response
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """记录各接口的处理耗时和进行中的请求数；流式接口的输出期间同时计入进行中的流数量"""
+    route = request.match_info.route
+    endpoint = route.handler.__name__ if route.resource is not None else 'unknown'
+    start = time.perf_counter()
+    status = 500
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc((endpoint,))
+    if endpoint == 'translate_stream':
+        metrics.STREAMS_IN_FLIGHT.inc((endpoint,))
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec((endpoint,))
+        if endpoint == 'translate_stream':
+            metrics.STREAMS_IN_FLIGHT.dec((endpoint,))
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, (endpoint, str(status)))
+
+
+async def metrics_endpoint(request):
+    """Prometheus文本格式的运行指标"""
+    return web.Response(body=metrics.REGISTRY.render().encode('utf-8'),
+                        headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+async def on_startup(app):
+    # 共享的非阻塞上游客户端，按主机复用keep-alive连接
+    connector = aiohttp.TCPConnector(
+        limit=config.ASYNC_UPSTREAM_LIMIT,
+        limit_per_host=config.ASYNC_UPSTREAM_LIMIT_PER_HOST,
+        keepalive_timeout=60
+    )
+    app['client_session'] = aiohttp.ClientSession(connector=connector)
+    app['background_tasks'] = set()
+
+
+async def on_cleanup(app):
+    # 等待尚未完成的数据库保存任务
+    if app['background_tasks']:
+        await asyncio.gather(*app['background_tasks'], return_exceptions=True)
+    await app['client_session'].close()
+
+
+def create_app():
+    app = web.Application(middlewares=[cors_middleware, metrics_middleware])
+    app.router.add_get('/', index)
+    app.router.add_post('/api/translate', translate)
+    app.router.add_post('/api/translate/stream', translate_stream)
+    app.router.add_get('/api/languages', get_languages)
+    app.router.add_get('/api/check', check_api)
+    app.router.add_get('/api/health', health_check)
+    app.router.add_get('/api/cache/stats', cache_stats)
+    app.router.add_get('/api/providers/stats', providers_stats)
+    app.router.add_get('/api/metrics', metrics_endpoint)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == '__main__':
+    host = os.getenv('HOST', '0.0.0.0')
+    port = int(os.getenv('PORT', 5000))
+    print(f"启动异步服务器: {host}:{port}")
+    web.run_app(create_app(), host=host, port=port)
@@ -0,0 +1,139 @@
+"""
+批量翻译
+把大量短文本按token预算打包成少量JSON结构的提示，一次上游调用翻译多条，
+再按编号把模型输出拆回各条；无法对齐的条目单独重试
+"""
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_builder import SYSTEM_PROMPT
+from segmenter import estimate_tokens
+
+# 模型有时会用```json代码块包裹输出
+CODE_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def pack_items(texts, max_tokens, max_items):
+    """按token预算和条数上限把条目下标打包成若干组，超出预算的单条自成一组"""
+    groups = []
+    current = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        # 每条额外计入编号和JSON引号等结构开销
+        tokens = estimate_tokens(text) + 4
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def build_batch_messages(texts, source_lang, target_lang):
+    """构造批量翻译的消息：输入输出都是以编号为键的JSON对象"""
+    payload = {str(i + 1): text for i, text in enumerate(texts)}
+    source = '原文' if source_lang == 'auto' else source_lang
+    prompt = (
+        f"将下面JSON对象中每个值从{source}翻译成{target_lang}语言。"
+        f"返回一个JSON对象，键保持不变（共{len(texts)}个），值替换为对应译文。"
+        f"只输出JSON，不要添加任何解释:\n\n{json.dumps(payload, ensure_ascii=False)}"
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_batch_output(content, count):
+    """解析模型输出，返回长度为count的译文列表，缺失或无法解析的位置为None"""
+    results = [None] * count
+    if not content:
+        return results
+    content = CODE_FENCE_RE.sub('', content.strip())
+    start = content.find('{')
+    end = content.rfind('}')
+    if start < 0 or end <= start:
+        return results
+    try:
+        data = json.loads(content[start:end + 1])
+    except json.JSONDecodeError:
+        return results
+    if not isinstance(data, dict):
+        return results
+    for key, value in data.items():
+        try:
+            index = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < count and isinstance(value, str) and value.strip():
+            results[index] = value.strip()
+    return results
+
+
+def translate_batch(texts, source_lang, target_lang, lookup, store, complete, translate_one,
+                    max_tokens=1500, max_items=50, parallelism=4):
+    """
+    批量翻译入口
+    lookup(text)            -> 缓存中的译文或None
+    store(text, translated) -> 写入缓存
+    complete(messages)      -> 上游模型输出的文本
+    translate_one(text)     -> 单条翻译（用于无法对齐时的重试）
+    返回(结果列表, 统计信息)
+    """
+    results = [None] * len(texts)
+    stats = {"items": len(texts), "cached": 0, "batches": 0, "single_calls": 0, "retried": 0, "failed": 0}
+
+    pending = []
+    for index, text in enumerate(texts):
+        cached = lookup(text)
+        if cached is not None:
+            results[index] = {"translated_text": cached, "cached": True}
+            stats["cached"] += 1
+        else:
+            pending.append(index)
+
+    def run_group(group):
+        """翻译一组条目，返回需要单独重试的下标"""
+        group_texts = [texts[i] for i in group]
+        if len(group) == 1:
+            return group
+        try:
+            content = complete(build_batch_messages(group_texts, source_lang, target_lang))
+        except Exception as e:
+            print(f"批量翻译请求失败，改为逐条翻译: {str(e)}")
+            return group
+        parsed = parse_batch_output(content, len(group))
+        missing = []
+        for index, translated in zip(group, parsed):
+            if translated is None:
+                missing.append(index)
+            else:
+                results[index] = {"translated_text": translated, "cached": False}
+                store(texts[index], translated)
+        if missing:
+            print(f"批量翻译有 {len(missing)}/{len(group)} 条未能对齐，逐条重试")
+        return missing
+
+    def run_single(index):
+        try:
+            results[index] = {"translated_text": translate_one(texts[index]), "cached": False}
+        except Exception as e:
+            results[index] = {"translated_text": None, "cached": False, "error": str(e)}
+
+    groups = pack_items([texts[i] for i in pending], max_tokens, max_items)
+    groups = [[pending[i] for i in group] for group in groups]
+    stats["batches"] = sum(1 for group in groups if len(group) > 1)
+
+    if groups:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(groups)))) as executor:
+            retry = [i for missing in executor.map(run_group, groups) for i in missing]
+            list(executor.map(run_single, retry))
+        stats["single_calls"] = len(retry)
+        stats["retried"] = len(retry) - sum(1 for group in groups if len(group) == 1)
+
+    stats["failed"] = sum(1 for r in results if r.get("error"))
+    return results, stats
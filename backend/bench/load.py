@@ -0,0 +1,349 @@
+"""
+翻译接口压测工具，输出JSON格式的结果，便于不同版本之间对比
+
+用法（先启动mock_llm.py、mock_history.py，并让被测服务指向它们）:
+    python bench/load.py --url http://127.0.0.1:5000 --endpoint both --concurrency 16 --requests 400
+    python bench/load.py --endpoint stream --duration 60 --text-file corpus.txt -o result.json
+    python bench/load.py --compare baseline.json result.json
+
+统计项（按接口分别统计）：
+    每秒请求数、总耗时的p50/p95/p99、流式接口的首个token时间（收到第一个update事件）、
+    每次翻译的SSE字节数和事件数、按状态码/错误类型的失败数
+默认在每条原文末尾附加序号，避免命中翻译缓存；--repeat 则重复使用原文，用于测缓存命中路径
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+
+import requests
+
+ENDPOINTS = {
+    'translate': '/api/translate',
+    'stream': '/api/translate/stream',
+}
+
+DEFAULT_TEXT = ("The quick brown fox jumps over the lazy dog. "
+                "Performance testing helps us understand how the service behaves under load. ")
+
+
+def percentile(values, fraction):
+    """最近秩法的分位数，values为空时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(values, scale=1000.0, digits=2):
+    """延迟分布（默认换算为毫秒）"""
+    if not values:
+        return None
+    return {
+        "min": round(min(values) * scale, digits),
+        "mean": round(sum(values) / len(values) * scale, digits),
+        "p50": round(percentile(values, 0.50) * scale, digits),
+        "p95": round(percentile(values, 0.95) * scale, digits),
+        "p99": round(percentile(values, 0.99) * scale, digits),
+        "max": round(max(values) * scale, digits),
+    }
+
+
+def load_texts(path, chars):
+    """压测原文：文件中按空行分隔的段落，未指定文件时把默认文本重复到chars个字符"""
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts = [part.strip() for part in f.read().split('\n\n') if part.strip()]
+        if not texts:
+            raise ValueError(f"{path} 中没有原文")
+        return texts
+    return [(DEFAULT_TEXT * (chars // len(DEFAULT_TEXT) + 1))[:chars]]
+
+
+class Recorder:
+    """收集单个接口的请求结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.ttfts = []
+        self.sse_bytes = []
+        self.sse_events = []
+        self.errors = {}
+
+    def ok(self, latency, ttft=None, sse_bytes=None, sse_events=None):
+        with self._lock:
+            self.latencies.append(latency)
+            if ttft is not None:
+                self.ttfts.append(ttft)
+            if sse_bytes is not None:
+                self.sse_bytes.append(sse_bytes)
+                self.sse_events.append(sse_events)
+
+    def fail(self, reason):
+        with self._lock:
+            self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def report(self, elapsed):
+        with self._lock:
+            completed = len(self.latencies)
+            failed = sum(self.errors.values())
+            result = {
+                "requests": completed + failed,
+                "completed": completed,
+                "failed": failed,
+                "errors": dict(sorted(self.errors.items())),
+                "requests_per_sec": round(completed / elapsed, 2) if elapsed > 0 else None,
+                "latency_ms": summarize(self.latencies),
+            }
+            if self.ttfts:
+                result["ttft_ms"] = summarize(self.ttfts)
+            if self.sse_bytes:
+                result["sse_bytes_per_translation"] = {
+                    "mean": round(sum(self.sse_bytes) / len(self.sse_bytes), 1),
+                    "p50": percentile(self.sse_bytes, 0.50),
+                    "p95": percentile(self.sse_bytes, 0.95),
+                    "max": max(self.sse_bytes),
+                }
+                result["sse_events_per_translation"] = round(sum(self.sse_events) / len(self.sse_events), 1)
+            return result
+
+
+def run_translate(session, url, payload, timeout, recorder):
+    start = time.perf_counter()
+    try:
+        response = session.post(url, json=payload, timeout=timeout)
+        response.content
+    except requests.exceptions.RequestException as e:
+        recorder.fail(type(e).__name__)
+        return
+    latency = time.perf_counter() - start
+    if response.status_code != 200:
+        recorder.fail(f"http_{response.status_code}")
+        return
+    try:
+        data = response.json()
+    except ValueError:
+        recorder.fail('invalid_json')
+        return
+    if not data.get('success', True):
+        recorder.fail('unsuccessful')
+        return
+    recorder.ok(latency)
+
+
+def run_stream(session, url, payload, timeout, recorder):
+    """读取整个SSE响应：首个update事件的到达时间为TTFT，收到end事件才算成功"""
+    start = time.perf_counter()
+    ttft = None
+    total_bytes = 0
+    events = 0
+    buffer = b''
+    outcome = 'no_end_event'
+    try:
+        with session.post(url, json=payload, timeout=timeout, stream=True) as response:
+            if response.status_code != 200:
+                recorder.fail(f"http_{response.status_code}")
+                return
+            for chunk in response.iter_content(chunk_size=None):
+                total_bytes += len(chunk)
+                buffer += chunk
+                while b'\n\n' in buffer:
+                    raw, buffer = buffer.split(b'\n\n', 1)
+                    # 事件可能带有id行，只解析data行
+                    data = next((line[5:] for line in raw.split(b'\n') if line.startswith(b'data:')), None)
+                    if data is None:
+                        continue
+                    events += 1
+                    try:
+                        event_type = json.loads(data).get('type')
+                    except ValueError:
+                        continue
+                    if event_type == 'update' and ttft is None:
+                        ttft = time.perf_counter() - start
+                    elif event_type == 'end':
+                        outcome = 'ok'
+                    elif event_type == 'error':
+                        outcome = 'error_event'
+    except requests.exceptions.RequestException as e:
+        recorder.fail(type(e).__name__)
+        return
+    if outcome != 'ok':
+        recorder.fail(outcome)
+        return
+    recorder.ok(time.perf_counter() - start, ttft, total_bytes, events)
+
+
+class LoadRunner:
+    """固定并发的闭环压测：每个工作线程在上一个请求结束后立即发出下一个"""
+
+    def __init__(self, base_url, endpoint, texts, args):
+        self.endpoint = endpoint
+        self.url = base_url.rstrip('/') + ENDPOINTS[endpoint]
+        self.run_one = run_stream if endpoint == 'stream' else run_translate
+        self.texts = texts
+        self.args = args
+        self.recorder = Recorder()
+        self._lock = threading.Lock()
+        self._issued = 0
+
+    def _next_index(self, deadline):
+        with self._lock:
+            if self.args.requests and self._issued >= self.args.requests:
+                return None
+            if deadline and time.monotonic() >= deadline:
+                return None
+            self._issued += 1
+            return self._issued
+
+    def _payload(self, index):
+        text = self.texts[index % len(self.texts)]
+        if not self.args.repeat:
+            # 附加运行标识、接口和序号，不同请求、不同接口、不同轮次都不会命中翻译缓存
+            text = f"{text} [{self.args.run_id}-{self.endpoint}-{index}]"
+        payload = {"text": text, "source_lang": self.args.source_lang, "target_lang": self.args.target_lang}
+        if self.args.stream_mode:
+            payload["stream_mode"] = self.args.stream_mode
+        return payload
+
+    def _worker(self, deadline):
+        with requests.Session() as session:
+            while True:
+                index = self._next_index(deadline)
+                if index is None:
+                    return
+                self.run_one(session, self.url, self._payload(index), self.args.timeout, self.recorder)
+
+    def run(self):
+        # 预热请求不计入结果（建立连接、加载词典等）
+        for index in range(self.args.warmup):
+            with requests.Session() as session:
+                self.run_one(session, self.url, self._payload(-index - 1), self.args.timeout, Recorder())
+        deadline = time.monotonic() + self.args.duration if self.args.duration else None
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, args=(deadline,), daemon=True)
+                   for _ in range(self.args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        result = self.recorder.report(elapsed)
+        result["elapsed_seconds"] = round(elapsed, 3)
+        return result
+
+
+def fetch_json(url, timeout=5):
+    """读取被测服务或模拟服务的统计接口，失败时返回None"""
+    try:
+        response = requests.get(url, timeout=timeout)
+        return response.json() if response.status_code == 200 else None
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+def compare(baseline_path, current_path):
+    """对比两次压测结果中各接口的每秒请求数和延迟分位数，输出变化百分比"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_path, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    report = {}
+    for endpoint, result in current.get("results", {}).items():
+        before = baseline.get("results", {}).get(endpoint)
+        if not before:
+            continue
+        entry = {"requests_per_sec_pct": change(before.get("requests_per_sec"), result.get("requests_per_sec"))}
+        for metric in ("latency_ms", "ttft_ms"):
+            if result.get(metric) and before.get(metric):
+                entry[f"{metric}_pct"] = {q: change(before[metric][q], result[metric][q])
+                                          for q in ("p50", "p95", "p99")}
+        if result.get("sse_bytes_per_translation") and before.get("sse_bytes_per_translation"):
+            entry["sse_bytes_per_translation_pct"] = change(before["sse_bytes_per_translation"]["mean"],
+                                                            result["sse_bytes_per_translation"]["mean"])
+        report[endpoint] = entry
+    return {"baseline": baseline_path, "current": current_path, "change": report}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="翻译接口压测")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="被测服务地址")
+    parser.add_argument('--endpoint', choices=['translate', 'stream', 'both'], default='both')
+    parser.add_argument('--concurrency', type=int, default=8, help="并发连接数")
+    parser.add_argument('--requests', type=int, default=200, help="每个接口的请求总数（0为不限，配合--duration）")
+    parser.add_argument('--duration', type=float, default=0, help="每个接口的压测时长（秒），0为不限")
+    parser.add_argument('--warmup', type=int, default=2, help="不计入结果的预热请求数")
+    parser.add_argument('--text-file', help="原文文件，按空行分隔成多条")
+    parser.add_argument('--chars', type=int, default=400, help="未指定原文文件时每条原文的字符数")
+    parser.add_argument('--repeat', action='store_true', help="重复使用相同原文（测缓存命中）")
+    parser.add_argument('--source-lang', default='en')
+    parser.add_argument('--target-lang', default='zh')
+    parser.add_argument('--stream-mode', choices=['full', 'delta'], help="流式接口的stream_mode")
+    parser.add_argument('--timeout', type=float, default=120, help="单个请求的超时（秒）")
+    parser.add_argument('--mock-llm', help="模拟LLM接口地址，如http://127.0.0.1:9100，结果中附带其统计")
+    parser.add_argument('--mock-history', help="模拟历史后端地址，如http://127.0.0.1:9200，结果中附带其统计")
+    parser.add_argument('-o', '--output', help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="对比两个结果文件")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), ensure_ascii=False, indent=2))
+        return 0
+    if not args.requests and not args.duration:
+        parser.error("--requests和--duration不能同时为0")
+    args.run_id = f"{int(time.time()):x}"
+
+    texts = load_texts(args.text_file, args.chars)
+    for mock in (args.mock_llm, args.mock_history):
+        if mock:
+            fetch_json(mock.rstrip('/') + '/stats?reset=1')
+
+    endpoints = ['translate', 'stream'] if args.endpoint == 'both' else [args.endpoint]
+    results = {}
+    for endpoint in endpoints:
+        print(f"压测 {ENDPOINTS[endpoint]}: 并发 {args.concurrency}", file=sys.stderr)
+        results[endpoint] = LoadRunner(args.url, endpoint, texts, args).run()
+
+    report = {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "target": args.url,
+        "config": {
+            "concurrency": args.concurrency, "requests": args.requests, "duration": args.duration,
+            "warmup": args.warmup, "texts": len(texts), "avg_chars": round(sum(map(len, texts)) / len(texts), 1),
+            "repeat": args.repeat, "source_lang": args.source_lang, "target_lang": args.target_lang,
+            "stream_mode": args.stream_mode or 'full',
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "results": results,
+    }
+    if args.mock_llm:
+        report["mock_llm"] = fetch_json(args.mock_llm.rstrip('/') + '/stats')
+    if args.mock_history:
+        # 历史记录是后台批量写入的，稍等队列刷新
+        time.sleep(1.5)
+        report["mock_history"] = fetch_json(args.mock_history.rstrip('/') + '/stats')
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"结果已写入 {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+本地模拟的Java历史记录后端（/api/translations），用于压测时接收翻译历史写入
+
+用法:
+    python bench/mock_history.py --port 9200 --latency-ms 20
+    JAVA_BACKEND_URL=http://127.0.0.1:9200/api/translations python app.py
+
+POST /api/translations（单条）和 /api/translations/batch（记录数组）返回201和自增的id，
+可设置每次请求的处理延迟和返回500的比例；
+GET /stats 返回累计的写入数、失败数和原文字符数，GET /stats?reset=1 同时清零
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class HistoryState:
+    def __init__(self, args):
+        self.latency = args.latency_ms / 1000.0
+        self.error_rate = args.error_rate
+        self._lock = threading.Lock()
+        self._random = random.Random(args.seed)
+        self._next_id = 1
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {"requests": 0, "batches": 0, "records": 0, "failed": 0, "original_chars": 0}
+
+    def record(self, records, batch):
+        """登记一次写入，返回各记录的id；注入错误时返回None"""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self._random.random() < self.error_rate:
+                self.stats["failed"] += len(records)
+                return None
+            if batch:
+                self.stats["batches"] += 1
+            self.stats["records"] += len(records)
+            self.stats["original_chars"] += sum(len(r.get("originalText") or '') for r in records)
+            ids = list(range(self._next_id, self._next_id + len(records)))
+            self._next_id += len(records)
+            return ids
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+class MockHistoryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/stats':
+            self._send_json(404, {"error": "not found"})
+            return
+        stats = self.state.snapshot()
+        if parse_qs(url.query).get('reset'):
+            self.state.reset()
+        self._send_json(200, stats)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+        if self.state.latency > 0:
+            time.sleep(self.state.latency)
+        batch = urlparse(self.path).path.rstrip('/').endswith('/batch')
+        records = payload if batch and isinstance(payload, list) else [payload]
+        ids = self.state.record(records, batch)
+        if ids is None:
+            self._send_json(500, {"error": "internal error (mock)"})
+            return
+        saved = [dict(record, id=record_id) for record, record_id in zip(records, ids)]
+        self._send_json(201, saved if batch else saved[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟的Java历史记录后端")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--latency-ms', type=float, default=10, help="每次请求的处理延迟（毫秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回500的请求比例")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    MockHistoryHandler.state = HistoryState(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockHistoryHandler)
+    server.daemon_threads = True
+    print(f"模拟历史记录后端: http://{args.host}:{args.port}/api/translations "
+          f"(延迟 {args.latency_ms:g}ms, 错误率 {args.error_rate:g})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+本地模拟的OpenAI兼容LLM接口，用于压测时代替DeepSeek/ChatGLM，不消耗真实额度
+
+用法:
+    python bench/mock_llm.py --port 9100 --ttft-ms 300 --tokens-per-sec 40
+    python bench/mock_llm.py --port 9100 --error-rate 0.02 --rate-limit-rate 0.05
+
+任意路径的POST都按chat/completions处理（DeepSeek为/v1/chat/completions，ChatGLM的地址可自定义），
+支持stream=true的SSE输出和普通JSON输出，遵守max_tokens（超出时finish_reason为length）并返回usage。
+译文token数 = 原文字符数 × --output-ratio，每个token输出一个字符。
+GET /stats 返回累计的请求数、错误注入数和输出token数，GET /stats?reset=1 同时清零
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 译文使用的字符，循环取用
+FILLER = "这是用于压力测试的模拟译文内容，长度与原文成比例。"
+
+
+class MockState:
+    """模拟接口的参数和累计统计"""
+
+    def __init__(self, args):
+        self.ttft = args.ttft_ms / 1000.0
+        self.tokens_per_sec = args.tokens_per_sec
+        self.chunk_tokens = max(1, args.chunk_tokens)
+        self.output_ratio = args.output_ratio
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self._lock = threading.Lock()
+        self._random = random.Random(args.seed)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {"requests": 0, "stream_requests": 0, "in_flight": 0, "max_in_flight": 0,
+                          "injected_errors": 0, "injected_429": 0, "completion_tokens": 0, "truncated": 0}
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def draw(self):
+        """决定本次请求是否注入错误：返回None、'error'或'429'"""
+        with self._lock:
+            value = self._random.random()
+        if value < self.rate_limit_rate:
+            return '429'
+        if value < self.rate_limit_rate + self.error_rate:
+            return 'error'
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+def source_text(messages):
+    """提示中待翻译的原文：最后一条用户消息里提示模板之后的部分"""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return (message.get("content") or '').split('\n\n', 1)[-1]
+    return ''
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/stats':
+            self._send_json(404, {"error": "not found"})
+            return
+        stats = self.state.snapshot()
+        if parse_qs(url.query).get('reset'):
+            self.state.reset()
+        self._send_json(200, stats)
+
+    def do_HEAD(self):
+        # 连接池预热使用HEAD请求
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        state = self.state
+        state.count("requests")
+        if payload.get("stream"):
+            state.count("stream_requests")
+        injected = state.draw()
+        if injected == '429':
+            state.count("injected_429")
+            self._send_json(429, {"error": {"message": "rate limited (mock)"}},
+                            {'Retry-After': str(state.retry_after)})
+            return
+        if injected == 'error':
+            state.count("injected_errors")
+            self._send_json(500, {"error": {"message": "internal error (mock)"}})
+            return
+
+        messages = payload.get("messages") or []
+        source = source_text(messages)
+        wanted = max(1, int(len(source) * state.output_ratio))
+        max_tokens = payload.get("max_tokens") or wanted
+        tokens = min(wanted, max_tokens)
+        finish_reason = 'length' if wanted > max_tokens else 'stop'
+        if finish_reason == 'length':
+            state.count("truncated")
+        output = (FILLER * (tokens // len(FILLER) + 1))[:tokens]
+        usage = {"prompt_tokens": sum(len(m.get("content") or '') for m in messages),
+                 "completion_tokens": tokens}
+        usage["total_tokens"] = usage["prompt_tokens"] + tokens
+        model = payload.get("model") or 'mock'
+
+        state.count("in_flight")
+        try:
+            if payload.get("stream"):
+                self._stream(output, finish_reason, usage, model)
+            else:
+                self._sleep_generation(tokens)
+                self._send_json(200, {
+                    "id": "mock", "object": "chat.completion", "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": output},
+                                 "finish_reason": finish_reason}],
+                    "usage": usage
+                })
+            state.count("completion_tokens", tokens)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开
+            pass
+        finally:
+            state.count("in_flight", -1)
+
+    def _sleep_generation(self, tokens):
+        delay = self.state.ttft
+        if self.state.tokens_per_sec > 0:
+            delay += tokens / self.state.tokens_per_sec
+        if delay > 0:
+            time.sleep(delay)
+
+    def _stream(self, output, finish_reason, usage, model):
+        state = self.state
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write(data):
+            body = data.encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(body), body))
+            self.wfile.flush()
+
+        def event(delta, reason=None, extra=None):
+            data = {"id": "mock", "object": "chat.completion.chunk", "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": reason}]}
+            if extra:
+                data.update(extra)
+            write(f"data: {json.dumps(data, ensure_ascii=False)}\n\n")
+
+        if state.ttft > 0:
+            time.sleep(state.ttft)
+        # 按设定的生成速度输出，按开始时间计算每块的发送时刻，避免sleep误差累积
+        start = time.monotonic()
+        step = state.chunk_tokens
+        for index in range(0, len(output), step):
+            if state.tokens_per_sec > 0:
+                wait = start + index / state.tokens_per_sec - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            event({"content": output[index:index + step]} if index else
+                  {"role": "assistant", "content": output[index:index + step]})
+        event({}, finish_reason, {"usage": usage})
+        write("data: [DONE]\n\n")
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟的OpenAI兼容LLM接口")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--ttft-ms', type=float, default=200, help="首个token前的延迟（毫秒）")
+    parser.add_argument('--tokens-per-sec', type=float, default=50, help="生成速度，0为不限速")
+    parser.add_argument('--chunk-tokens', type=int, default=1, help="流式输出每个事件包含的token数")
+    parser.add_argument('--output-ratio', type=float, default=1.0, help="译文token数与原文字符数之比")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回500的请求比例")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="返回429的请求比例")
+    parser.add_argument('--retry-after', type=int, default=1, help="429响应的Retry-After（秒）")
+    parser.add_argument('--seed', type=int, default=None, help="错误注入的随机种子")
+    args = parser.parse_args(argv)
+
+    MockLLMHandler.state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockLLMHandler)
+    server.daemon_threads = True
+    print(f"模拟LLM接口: http://{args.host}:{args.port}/v1/chat/completions "
+          f"(TTFT {args.ttft_ms:g}ms, {args.tokens_per_sec:g} token/s, "
+          f"错误率 {args.error_rate:g}, 429比例 {args.rate_limit_rate:g})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+上游SSE解析的微基准：对比原来的逐行解析（iter_lines + 解码 + json.loads）和sse.SSEDecoder + json_loads
+
+用法:
+    python bench/sse_parse.py                                   使用合成的DeepSeek风格响应
+    python bench/sse_parse.py --capture http://127.0.0.1:9100/v1/chat/completions -o stream.sse
+    python bench/sse_parse.py stream.sse other.sse --repeat 200
+
+录制文件为上游返回的原始SSE字节。为模拟网络到达的粒度，录制内容按 --chunk-bytes 的随机大小切块，
+两种解析方式处理同一组字节块，结果以JSON输出（每秒事件数、每个事件耗时、吞吐量和加速比）
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sse import JSON_BACKEND, iter_sse_data, json_loads  # noqa: E402
+
+SAMPLE_TEXT = "这是用于压力测试的模拟译文内容，长度与原文成比例。The quick brown fox jumps over the lazy dog. "
+
+
+def synthesize(tokens=2000, seed=0):
+    """合成DeepSeek风格的流式响应：每个事件一个token，最后一个事件携带finish_reason和usage"""
+    rng = random.Random(seed)
+    events = []
+    for index in range(tokens):
+        start = rng.randrange(len(SAMPLE_TEXT) - 3)
+        chunk = {
+            "id": "5f9d6a8e-1c2b-4e3f-9a7d-0b1c2d3e4f50", "object": "chat.completion.chunk",
+            "created": 1760000000, "model": "deepseek-chat", "system_fingerprint": "fp_mock",
+            "choices": [{"index": 0, "delta": {"content": SAMPLE_TEXT[start:start + rng.randint(1, 3)]},
+                         "logprobs": None, "finish_reason": None}]
+        }
+        if index == 0:
+            chunk["choices"][0]["delta"]["role"] = "assistant"
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append("data: " + json.dumps({
+        "id": "5f9d6a8e-1c2b-4e3f-9a7d-0b1c2d3e4f50", "object": "chat.completion.chunk",
+        "created": 1760000000, "model": "deepseek-chat",
+        "choices": [{"index": 0, "delta": {"content": ""}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 120, "completion_tokens": tokens, "total_tokens": tokens + 120}
+    }) + "\n\n")
+    events.append(": keep-alive\n\n")
+    events.append("data: [DONE]\n\n")
+    return ''.join(events).encode('utf-8')
+
+
+def capture(url, output, text, api_key):
+    """从上游（或bench/mock_llm.py）录制一次流式响应的原始字节"""
+    payload = {
+        "model": os.getenv('DEEPSEEK_MODEL', 'deepseek-chat'), "stream": True, "max_tokens": 4096,
+        "messages": [{"role": "user", "content": "将以下文本翻译成zh语言:\n\n" + text}]
+    }
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    with requests.post(url, json=payload, headers=headers, stream=True, timeout=300) as response:
+        response.raise_for_status()
+        with open(output, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=None):
+                f.write(chunk)
+    print(f"已录制 {os.path.getsize(output)} 字节到 {output}", file=sys.stderr)
+
+
+def split_chunks(data, max_bytes, seed=0):
+    """把录制内容切成1到max_bytes字节的随机大小块"""
+    rng = random.Random(seed)
+    chunks = []
+    position = 0
+    while position < len(data):
+        size = rng.randint(1, max_bytes)
+        chunks.append(data[position:position + size])
+        position += size
+    return chunks
+
+
+def legacy_parse(chunks):
+    """原来的解析循环：requests的iter_lines切行，逐行解码并用json.loads解析"""
+    response = requests.Response()
+    response.iter_content = lambda chunk_size=None, decode_unicode=False: iter(chunks)
+    parts = []
+    usage = None
+    for line in response.iter_lines():
+        if not line:
+            continue
+        line = line.decode('utf-8')
+        if not line.startswith('data: '):
+            continue
+        data_str = line[6:]
+        if data_str == '[DONE]':
+            break
+        data_json = json.loads(data_str)
+        if isinstance(data_json.get('usage'), dict):
+            usage = data_json['usage']
+        if data_json.get('choices'):
+            content = data_json['choices'][0].get('delta', {}).get('content')
+            if content:
+                parts.append(content)
+    return ''.join(parts), usage
+
+
+def decoder_parse(chunks):
+    """新的解析循环：providers.OpenAICompatibleProvider._iter_deltas中的写法"""
+    parts = []
+    usage = None
+    for data in iter_sse_data(chunks):
+        data_json = json_loads(data)
+        if not isinstance(data_json, dict):
+            continue
+        if isinstance(data_json.get('usage'), dict):
+            usage = data_json['usage']
+        if data_json.get('choices'):
+            content = data_json['choices'][0].get('delta', {}).get('content')
+            if content:
+                parts.append(content)
+    return ''.join(parts), usage
+
+
+def measure(parse, chunks, repeat):
+    """重复解析repeat次，返回最快一轮的耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="上游SSE解析微基准")
+    parser.add_argument('recordings', nargs='*', help="录制的SSE响应文件，未指定时使用合成数据")
+    parser.add_argument('--tokens', type=int, default=2000, help="合成数据的事件数")
+    parser.add_argument('--chunk-bytes', type=int, default=1400, help="模拟网络到达的最大块大小")
+    parser.add_argument('--repeat', type=int, default=50, help="每种解析方式的重复次数（取最快一轮）")
+    parser.add_argument('--capture', metavar='URL', help="从上游录制一次流式响应")
+    parser.add_argument('--text', default=SAMPLE_TEXT * 20, help="录制时的原文")
+    parser.add_argument('-o', '--output', default='stream.sse', help="录制文件的保存位置")
+    args = parser.parse_args(argv)
+
+    if args.capture:
+        capture(args.capture, args.output, args.text, os.getenv('DEEPSEEK_API_KEY'))
+        return 0
+
+    recordings = [(path, open(path, 'rb').read()) for path in args.recordings] or \
+        [(f"synthetic-{args.tokens}", synthesize(args.tokens))]
+    results = {}
+    for name, data in recordings:
+        chunks = split_chunks(data, args.chunk_bytes)
+        legacy_result = legacy_parse(chunks)
+        decoder_result = decoder_parse(chunks)
+        if legacy_result != decoder_result:
+            print(f"{name}: 两种解析方式的结果不一致", file=sys.stderr)
+            return 1
+        events = data.count(b'\ndata:') + data.startswith(b'data:')
+        legacy = measure(legacy_parse, chunks, args.repeat)
+        decoder = measure(decoder_parse, chunks, args.repeat)
+        results[name] = {
+            "bytes": len(data),
+            "chunks": len(chunks),
+            "events": events,
+            "legacy": {"seconds": round(legacy, 6), "us_per_event": round(legacy / events * 1e6, 3),
+                       "mb_per_sec": round(len(data) / legacy / 1e6, 1)},
+            "decoder": {"seconds": round(decoder, 6), "us_per_event": round(decoder / events * 1e6, 3),
+                        "mb_per_sec": round(len(data) / decoder / 1e6, 1)},
+            "speedup": round(legacy / decoder, 2),
+        }
+    print(json.dumps({"json_backend": JSON_BACKEND, "chunk_bytes": args.chunk_bytes, "repeat": args.repeat,
+                      "results": results}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
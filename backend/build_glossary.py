@@ -0,0 +1,63 @@
+"""
+把TSV/CSV双语词典编译成离线引擎使用的.glossary二进制词典
+
+用法:
+    python build_glossary.py dictionaries/                      编译目录中所有<源语言>-<目标语言>.tsv/.csv
+    python build_glossary.py zh-en.tsv                           输出到同目录的zh-en.glossary
+    python build_glossary.py big.csv -o zh-en.glossary --source-lang zh
+
+西文等使用空格分词的源语言默认忽略大小写（原文按小写保存），源语言从文件名的语言对前缀推断
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from glossary import write_glossary
+from offline_engine import read_entries
+from segmenter import NO_SPACE_LANGS
+
+
+def build(input_path, output_path, source_lang=None):
+    """编译单个词典文件，返回条目数"""
+    if source_lang is None:
+        source_lang = os.path.basename(input_path).split('-', 1)[0]
+    start = time.monotonic()
+    entries = {}
+    for source, target in read_entries(input_path):
+        # 重复的原文以后出现的为准
+        entries[source] = target
+    count = write_glossary(entries, output_path, fold_case=source_lang not in NO_SPACE_LANGS)
+    print(f"{input_path} -> {output_path}: {count} 条，{os.path.getsize(output_path)} 字节，"
+          f"耗时 {time.monotonic() - start:.2f}s")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="编译离线翻译词典")
+    parser.add_argument('input', help="TSV/CSV词典文件或词典目录")
+    parser.add_argument('-o', '--output', help="输出的.glossary文件（只用于单个文件）")
+    parser.add_argument('--source-lang', help="源语言代码，默认从文件名推断")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.input):
+        inputs = sorted(glob.glob(os.path.join(args.input, '*-*.tsv')) +
+                        glob.glob(os.path.join(args.input, '*-*.csv')))
+        if not inputs:
+            print(f"{args.input} 中没有词典文件")
+            return 1
+        for path in inputs:
+            build(path, os.path.splitext(path)[0] + '.glossary', args.source_lang)
+        return 0
+
+    if not os.path.isfile(args.input):
+        print(f"找不到词典文件: {args.input}")
+        return 1
+    output = args.output or os.path.splitext(args.input)[0] + '.glossary'
+    build(args.input, output, args.source_lang)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+从各语言语料生成语言检测使用的n-gram频率表
+
+用法:
+    python build_language_profiles.py corpus/                       语料目录中每个<语言代码>.txt为一种语言
+    python build_language_profiles.py corpus/ -o language_profiles.tsv --size 400
+
+语料应为该语言的普通文本（UTF-8），几KB即可区分常见语言，越多越准确
+"""
+import argparse
+import glob
+import os
+import sys
+
+from language_detect import PROFILE_SIZE, build_profile, write_profiles
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'language_profiles.tsv')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成语言检测n-gram频率表")
+    parser.add_argument('corpus', help="语料目录，每种语言一个<语言代码>.txt")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="输出的频率表文件")
+    parser.add_argument('--size', type=int, default=PROFILE_SIZE, help="每种语言保留的n-gram数")
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, '*.txt')))
+    if not paths:
+        print(f"{args.corpus} 中没有语料文件")
+        return 1
+    profiles = {}
+    for path in paths:
+        lang = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles[lang] = build_profile(f.read(), args.size)
+        print(f"{lang}: {profiles[lang][0]} 个n-gram，保留 {len(profiles[lang][1])} 个")
+    write_profiles(profiles, args.output)
+    print(f"已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
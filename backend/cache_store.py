@@ -0,0 +1,211 @@
+"""
+翻译缓存的磁盘存储层
+基于SQLite（WAL模式），同一主机上的多个工作进程共享，重启/重新部署后仍然保留
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCacheStore:
+    """SQLite缓存存储，带容量上限、LRU/LFU淘汰和空间回收"""
+
+    # 每写入多少次检查一次容量
+    CHECK_INTERVAL = 64
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=24 * 3600, policy='lru'):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy if policy in ('lru', 'lfu') else 'lru'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        # 统计计数由各请求线程更新，读写都在self._lock下进行
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _conn(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        # auto_vacuum必须在建表前设置，之后才能做增量回收
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries(last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_hit_count ON cache_entries(hit_count, last_access)")
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def get(self, key):
+        """查询条目，返回(译文, 创建时间)，未命中或已过期返回None"""
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None:
+                self._count("misses")
+                return None
+            if row[1] + self.ttl <= now:
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._count("misses")
+                return None
+            conn.execute(
+                "UPDATE cache_entries SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                (now, key)
+            )
+            self._count("hits")
+            return row[0], row[1]
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"读取磁盘缓存失败: {str(e)}")
+            return None
+
+    def set(self, key, value, created_at=None):
+        """写入条目，定期检查容量并淘汰"""
+        if not value:
+            return
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, created_at, last_access, hit_count) "
+                "VALUES (?, ?, ?, ?, ?, COALESCE((SELECT hit_count FROM cache_entries WHERE key = ?), 0))",
+                (key, value, len(key) + len(value.encode('utf-8')), created_at or now, now, key)
+            )
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"写入磁盘缓存失败: {str(e)}")
+            return
+
+        with self._lock:
+            self.writes += 1
+            self._writes_since_check += 1
+            should_check = self._writes_since_check >= self.CHECK_INTERVAL
+            if should_check:
+                self._writes_since_check = 0
+        if should_check:
+            self.enforce_limits()
+
+    def total_bytes(self):
+        row = self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        return row[0]
+
+    def enforce_limits(self):
+        """删除过期条目，超出容量时按淘汰策略删除，必要时回收空间"""
+        try:
+            conn = self._conn()
+            conn.execute("DELETE FROM cache_entries WHERE created_at < ?", (time.time() - self.ttl,))
+            total = self.total_bytes()
+            if total > self.max_bytes:
+                # 淘汰到容量上限的90%，避免每次写入都触发淘汰
+                target = int(self.max_bytes * 0.9)
+                if self.policy == 'lfu':
+                    order = "hit_count ASC, last_access ASC"
+                else:
+                    order = "last_access ASC"
+                rows = conn.execute(f"SELECT key, size FROM cache_entries ORDER BY {order}").fetchall()
+                victims = []
+                for key, size in rows:
+                    if total <= target:
+                        break
+                    victims.append((key,))
+                    total -= size
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("DELETE FROM cache_entries WHERE key = ?", victims)
+                conn.execute("COMMIT")
+                self._count("evictions", len(victims))
+                print(f"磁盘缓存淘汰 {len(victims)} 条记录")
+            self.compact()
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"磁盘缓存容量检查失败: {str(e)}")
+
+    def compact(self, min_free_ratio=0.2):
+        """空闲页超过一定比例时做增量回收，并截断WAL文件"""
+        conn = self._conn()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if page_count and freelist / page_count >= min_free_ratio:
+            conn.execute(f"PRAGMA incremental_vacuum({freelist})")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            print(f"磁盘缓存空间回收: 释放 {freelist} 页")
+
+    def recent_entries(self, limit):
+        """按最近访问时间返回未过期条目，用于启动时预热内存缓存"""
+        if limit <= 0:
+            return []
+        try:
+            return self._conn().execute(
+                "SELECT key, value, created_at FROM cache_entries WHERE created_at >= ? "
+                "ORDER BY last_access DESC LIMIT ?",
+                (time.time() - self.ttl, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"读取磁盘缓存预热数据失败: {str(e)}")
+            return []
+
+    def stats(self):
+        try:
+            conn = self._conn()
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        with self._lock:
+            return {
+                "path": self.path,
+                "policy": self.policy,
+                "entries": count,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "errors": self.errors
+            }
+
+
+def open_store(path, max_bytes, ttl, policy='lru'):
+    """打开磁盘缓存，路径为空或打开失败时返回None（只使用内存缓存）"""
+    if not path:
+        return None
+    try:
+        store = DiskCacheStore(path, max_bytes, ttl, policy)
+        print(f"磁盘缓存已启用: {path}")
+        return store
+    except (sqlite3.Error, OSError) as e:
+        print(f"磁盘缓存不可用，仅使用内存缓存: {str(e)}")
+        return None
@@ -14,6 +14,13 @@ DEBUG = os.getenv('DEBUG', 'True') == 'True'
 HOST = os.getenv('HOST', '0.0.0.0')
 PORT = int(os.getenv('PORT', 5000))
 
+# 离线翻译词典目录：按语言对存放<源语言>-<目标语言>.tsv
+OFFLINE_DICT_DIR = os.getenv('OFFLINE_DICT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dictionaries'))
+
+# 源语言自动检测：source_lang为auto时在本地检测语言，检测结果与目标语言相同的请求直接返回原文
+LANG_DETECT_ENABLED = os.getenv('LANG_DETECT_ENABLED', 'True') == 'True'
+LANGUAGE_PROFILES_PATH = os.getenv('LANGUAGE_PROFILES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'language_profiles.tsv'))
+
 # 翻译默认设置
 DEFAULT_SOURCE_LANG = 'auto'
 DEFAULT_TARGET_LANG = 'en'
@@ -25,3 +32,113 @@ DEEPSEEK_MODELS = {
     "deepseek-lite": "DeepSeek Lite（轻量版）",
     "deepseek-r1": "DeepSeek R1（最新版本）"
 }
+
+# 翻译缓存配置
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 2000))  # 设为0禁用缓存
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 24 * 3600))
+# 磁盘缓存（SQLite WAL，多进程共享），CACHE_DB_PATH设为空则禁用
+CACHE_DB_PATH = os.getenv('CACHE_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_cache.db'))
+CACHE_DB_MAX_MB = int(os.getenv('CACHE_DB_MAX_MB', 256))
+CACHE_DB_POLICY = os.getenv('CACHE_DB_POLICY', 'lru')  # lru 或 lfu
+
+# 翻译记忆（SQLite），TM_DB_PATH设为空则禁用；多句文档中精确命中的句子直接复用，其余句子附带上下文按批翻译
+TM_DB_PATH = os.getenv('TM_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_memory.db'))
+TM_FUZZY_THRESHOLD = float(os.getenv('TM_FUZZY_THRESHOLD', 0.7))  # 模糊匹配（字符3-gram Jaccard）作为参考译文的最低相似度
+TM_MAX_SEGMENTS = int(os.getenv('TM_MAX_SEGMENTS', 500000))  # 最多保存的句子数，超出时淘汰命中最少的
+
+# 上游连接池配置（LLM接口和Java后端共享）
+UPSTREAM_POOL_CONNECTIONS = int(os.getenv('UPSTREAM_POOL_CONNECTIONS', 10))  # 缓存的主机连接池数量
+UPSTREAM_POOL_MAXSIZE = int(os.getenv('UPSTREAM_POOL_MAXSIZE', 32))  # 每个主机保持的最大连接数
+UPSTREAM_PREWARM_CONNECTIONS = int(os.getenv('UPSTREAM_PREWARM_CONNECTIONS', 2))  # 启动时每个主机预热的连接数，0为不预热
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 5))  # LLM接口的连接超时（秒）
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', 300))  # LLM接口的读取超时（秒）
+
+# 上游token预算：每次调用的max_tokens按原文长度和目标语言估算，并按上游返回的usage校准
+MODEL_CONTEXT_TOKENS = int(os.getenv('MODEL_CONTEXT_TOKENS', 32768))  # 模型上下文窗口，超出的原文在发送前切分
+MAX_OUTPUT_TOKENS = int(os.getenv('MAX_OUTPUT_TOKENS', 8192))  # max_tokens上限（译文被截断时按此重试）
+MIN_OUTPUT_TOKENS = int(os.getenv('MIN_OUTPUT_TOKENS', 256))  # max_tokens下限
+OUTPUT_TOKEN_SAFETY = float(os.getenv('OUTPUT_TOKEN_SAFETY', 1.5))  # 估算的译文token数乘以该系数作为max_tokens
+
+# 长文本分段翻译配置
+SEGMENT_MAX_TOKENS = int(os.getenv('SEGMENT_MAX_TOKENS', 2000))  # 每个片段的原文token预算，0为不分段
+TRANSLATE_PARALLELISM = int(os.getenv('TRANSLATE_PARALLELISM', 4))  # 单个请求内并发翻译的片段数
+
+# 批量翻译配置
+BATCH_MAX_REQUEST_ITEMS = int(os.getenv('BATCH_MAX_REQUEST_ITEMS', 2000))  # 单次请求最多条目数
+BATCH_MAX_TOKENS = int(os.getenv('BATCH_MAX_TOKENS', 1500))  # 每次上游调用打包的原文token预算
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 50))  # 每次上游调用最多打包条目数
+
+# 异步服务模式（async_app.py）的上游连接上限
+ASYNC_UPSTREAM_LIMIT = int(os.getenv('ASYNC_UPSTREAM_LIMIT', 1000))  # 总连接数上限
+ASYNC_UPSTREAM_LIMIT_PER_HOST = int(os.getenv('ASYNC_UPSTREAM_LIMIT_PER_HOST', 500))  # 每个主机连接数上限，0为不限制
+
+# 流式输出delta模式的合并窗口
+SSE_COALESCE_MS = int(os.getenv('SSE_COALESCE_MS', 30))  # 时间窗口（毫秒）
+SSE_COALESCE_BYTES = int(os.getenv('SSE_COALESCE_BYTES', 256))  # 字节窗口
+SSE_CHECKPOINT_EVERY = int(os.getenv('SSE_CHECKPOINT_EVERY', 32))  # 每发送多少个update事件附带一次checkpoint，0为不发送
+
+# 流式翻译的断开检测与时限：没有输出时定期发送SSE注释作为心跳，写入失败即视为客户端断开并立即关闭上游连接；
+# 上游长时间没有输出或整个流超过总时长时同样结束并关闭上游连接
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 3))  # 心跳间隔（秒）
+STREAM_IDLE_TIMEOUT = float(os.getenv('STREAM_IDLE_TIMEOUT', 60))  # 两次输出之间的最长间隔（秒），0为不限制
+STREAM_TOTAL_TIMEOUT = float(os.getenv('STREAM_TOTAL_TIMEOUT', 300))  # 单次流式翻译的最长时间（秒），0为不限制
+
+# 可续传的流式翻译：每个流分配ID，事件带编号并保存在服务端回放缓冲中，客户端断线后带Last-Event-ID重连，
+# 只接收缺失的事件，不再调用上游。STREAM_REPLAY_MAX_MB设为0则禁用
+STREAM_REPLAY_MAX_MB = float(os.getenv('STREAM_REPLAY_MAX_MB', 64))  # 所有回放缓冲的内存上限（MB），超出时先淘汰已结束的流
+STREAM_REPLAY_STREAM_KB = int(os.getenv('STREAM_REPLAY_STREAM_KB', 2048))  # 单个流的回放缓冲上限（KB），超出时丢弃最早的事件
+STREAM_REPLAY_TTL = float(os.getenv('STREAM_REPLAY_TTL', 60))  # 流结束后保留回放缓冲的时间（秒）
+STREAM_RESUME_GRACE = float(os.getenv('STREAM_RESUME_GRACE', 15))  # 客户端全部断开后继续生成、等待重连的时间（秒），超时后关闭上游连接
+
+# 异步翻译任务（/api/jobs）：大文档提交后立即返回任务ID，由后台工作线程池处理；任务和已译完的片段保存在SQLite中，
+# 重启后继续处理未完成的任务。JOBS_DB_PATH设为空则禁用
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_jobs.db'))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # 同时处理的任务数
+JOB_PARALLELISM = int(os.getenv('JOB_PARALLELISM', 4))  # 每个任务内并发翻译的片段数
+JOB_MAX_QUEUED = int(os.getenv('JOB_MAX_QUEUED', 100))  # 排队中任务数上限，超出时返回429
+JOB_MAX_CHARS = int(os.getenv('JOB_MAX_CHARS', 1000000))  # 单个任务的原文字符数上限
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))  # 任务失败后的最多处理次数（已译完的片段不重复翻译）
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', 60))  # 任务租约时长（秒），处理进程退出后超过该时间重新排队
+JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', 72))  # 已结束任务的保留时间（小时）
+
+# 翻译记录后台批量写入配置
+HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', 10000))  # 内存队列上限，满时记录交由失败处理
+HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', 50))  # 每批写入的最大记录数
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', 1.0))  # 攒批最长等待时间（秒）
+
+# 翻译记录本地spool：Java后端不可用时记录追加到分段JSONL文件，恢复后由后台线程回放，SPOOL_DIR设为空则禁用
+SPOOL_DIR = os.getenv('SPOOL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_spool'))
+SPOOL_SEGMENT_MB = int(os.getenv('SPOOL_SEGMENT_MB', 16))  # 单个分段文件大小上限（MB），超过后轮转
+SPOOL_FSYNC_MS = int(os.getenv('SPOOL_FSYNC_MS', 10))  # group commit等待时间（毫秒），期间的写入合并为一次fsync
+SPOOL_REPLAY_BATCH = int(os.getenv('SPOOL_REPLAY_BATCH', 200))  # 回放时每批发送的记录数
+SPOOL_REPLAY_INTERVAL = float(os.getenv('SPOOL_REPLAY_INTERVAL', 5.0))  # 回放检查间隔（秒），失败时指数退避
+
+# 多服务路由：按顺序列出启用的翻译服务（deepseek、chatglm、openai、offline），未配置API密钥的会被跳过；
+# 为空时app.py默认为deepseek,chatglm,openai，app_llm.py默认为chatglm,deepseek,openai；offline只作兜底
+TRANSLATION_PROVIDERS = os.getenv('TRANSLATION_PROVIDERS', '')
+ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', 0.2))  # 延迟和错误率EWMA的平滑系数
+ROUTER_EXPLORE_RATE = float(os.getenv('ROUTER_EXPLORE_RATE', 0.05))  # 随机探测非最优服务的请求比例
+
+# 对冲请求：非流式调用超过最近延迟的指定分位数仍未返回时，向另一个（或同一个）服务发出相同请求
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'False') == 'True'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))  # 触发对冲的延迟分位数
+HEDGE_MIN_DELAY_MS = int(os.getenv('HEDGE_MIN_DELAY_MS', 200))  # 对冲前的最短等待时间（毫秒）
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))  # 延迟样本数达到该值后才开始对冲
+HEDGE_BUDGET_RATIO = float(os.getenv('HEDGE_BUDGET_RATIO', 0.05))  # 对冲请求数占总请求数的上限
+
+# 上游并发自适应限制（AIMD）：成功时缓慢提高每个服务的并发上限，429/503、超时或延迟升高时按比例降低，
+# 超出上限的请求按优先级排队（流式翻译 > 普通翻译 > 批量翻译）
+LIMITER_ENABLED = os.getenv('LIMITER_ENABLED', 'True') == 'True'
+LIMITER_INITIAL = int(os.getenv('LIMITER_INITIAL', 16))  # 初始并发上限
+LIMITER_MIN = int(os.getenv('LIMITER_MIN', 1))  # 并发上限的下限
+LIMITER_MAX = int(os.getenv('LIMITER_MAX', UPSTREAM_POOL_MAXSIZE))  # 并发上限的上限，默认与每个主机的连接池大小一致
+LIMITER_QUEUE_TIMEOUT = float(os.getenv('LIMITER_QUEUE_TIMEOUT', 30))  # 最长排队时间（秒），超时后切换到下一个服务
+
+# 重试与熔断：超时、网络错误、5xx和429在所有服务都失败后按带抖动的指数退避重试（429至少等待Retry-After）；
+# 某个服务连续失败达到阈值后熔断，冷却期内的请求直接切换到其他服务或离线兜底，冷却后放行一个探测请求
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', 3))  # 包含第一次调用在内的最多尝试轮数
+RETRY_BASE_DELAY_MS = int(os.getenv('RETRY_BASE_DELAY_MS', 500))  # 第一次重试的退避上限（毫秒），之后逐次翻倍
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 8))  # 单次退避的上限（秒）
+RETRY_MAX_ELAPSED = float(os.getenv('RETRY_MAX_ELAPSED', 60))  # 超过该时长（秒）后不再发起重试
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))  # 触发熔断的连续失败次数，0为不熔断
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))  # 熔断后的冷却时间（秒）
@@ -0,0 +1,162 @@
+"""
+预编译的二进制词典（.glossary）
+文件由有序字符串表和偏移数组组成，工作进程用mmap只读打开，无需解析、启动几乎无耗时，
+多个进程共享同一份页缓存而不是各自在内存中构建词典。
+
+文件布局（小端序）：
+    头部   magic(4) version(u32) flags(u32) count(u32) max_key_chars(u32) 保留(u32)
+           key_offsets位置(u64) value_offsets位置(u64) keys位置(u64) values位置(u64)
+    key_offsets    (count+1)个u32，第i个原文在keys区中的起止偏移
+    value_offsets  (count+1)个u32，第i个译文在values区中的起止偏移
+    keys           按UTF-8字节序排列的原文
+    values         与原文一一对应的译文
+最长匹配通过在有序表上逐字符缩小前缀区间实现，效果与字典树相同
+"""
+import mmap
+import os
+import struct
+import sys
+
+from segmenter import is_word_char
+
+MAGIC = b'TGLS'
+VERSION = 1
+FLAG_FOLD_CASE = 1
+HEADER = struct.Struct('<4sIIIII4Q')
+
+
+def write_glossary(entries, path, fold_case=False):
+    """
+    把{原文: 译文}写成.glossary文件，fold_case时原文按小写保存（查询时忽略大小写）。
+    先写临时文件再替换，正在使用旧文件的进程不受影响
+    """
+    table = {}
+    for source, target in entries.items():
+        source = source.lower() if fold_case else source
+        table[source.encode('utf-8')] = (target.encode('utf-8'), len(source))
+    keys = sorted(table)
+
+    key_offsets = [0]
+    value_offsets = [0]
+    for key in keys:
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(table[key][0]))
+    if key_offsets[-1] >= 2 ** 32 or value_offsets[-1] >= 2 ** 32:
+        raise ValueError("词典过大，单个区段超过4GB")
+    max_key_chars = max((table[key][1] for key in keys), default=0)
+
+    key_offsets_pos = HEADER.size
+    value_offsets_pos = key_offsets_pos + 4 * len(key_offsets)
+    keys_pos = value_offsets_pos + 4 * len(value_offsets)
+    values_pos = keys_pos + key_offsets[-1]
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, FLAG_FOLD_CASE if fold_case else 0, len(keys), max_key_chars, 0,
+                            key_offsets_pos, value_offsets_pos, keys_pos, values_pos))
+        f.write(struct.pack(f'<{len(key_offsets)}I', *key_offsets))
+        f.write(struct.pack(f'<{len(value_offsets)}I', *value_offsets))
+        for key in keys:
+            f.write(key)
+        for key in keys:
+            f.write(table[key][0])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+class MappedGlossary:
+    """mmap打开的.glossary词典，接口与offline_engine.DictionaryTrie相同"""
+
+    # 缓存不超过该字节数的前缀对应的区间（每个进程最多RANGE_CACHE_SIZE个）
+    RANGE_CACHE_PREFIX_BYTES = 6
+    RANGE_CACHE_SIZE = 65536
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, flags, count, max_key_chars, _,
+         key_offsets_pos, value_offsets_pos, keys_pos, values_pos) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} 不是有效的词典文件（版本 {version}）")
+        self.fold_case = bool(flags & FLAG_FOLD_CASE)
+        self.entries = count
+        self.max_length = max_key_chars
+        self._view = None
+        if sys.byteorder == 'little':
+            # 偏移数组直接映射为整数数组，不复制
+            self._view = memoryview(self._mm)
+            self._key_offsets = self._view[key_offsets_pos:value_offsets_pos].cast('I')
+            self._value_offsets = self._view[value_offsets_pos:keys_pos].cast('I')
+        else:
+            self._key_offsets = struct.unpack_from(f'<{count + 1}I', self._mm, key_offsets_pos)
+            self._value_offsets = struct.unpack_from(f'<{count + 1}I', self._mm, value_offsets_pos)
+        self._keys_pos = keys_pos
+        self._values_pos = values_pos
+        self._ranges = {}
+
+    def _key(self, index, length=None):
+        start = self._keys_pos + self._key_offsets[index]
+        end = self._keys_pos + self._key_offsets[index + 1]
+        if length is not None:
+            end = min(end, start + length)
+        return self._mm[start:end]
+
+    def _value(self, index):
+        start = self._values_pos + self._value_offsets[index]
+        end = self._values_pos + self._value_offsets[index + 1]
+        return self._mm[start:end].decode('utf-8')
+
+    def _narrow(self, lo, hi, prefix):
+        """在[lo, hi)中找出以prefix开头的原文区间，调用方保证区间内的原文都以prefix去掉最后一个字符的部分开头"""
+        cached = self._ranges.get(prefix)
+        if cached is not None:
+            return cached
+        length = len(prefix)
+        left, right = lo, hi
+        while left < right:
+            mid = (left + right) // 2
+            if self._key(mid, length) < prefix:
+                left = mid + 1
+            else:
+                right = mid
+        start = left
+        right = hi
+        while left < right:
+            mid = (left + right) // 2
+            if self._key(mid, length) <= prefix:
+                left = mid + 1
+            else:
+                right = mid
+        # 短前缀的区间在各次查询间反复用到，缓存后可省去大区间上的二分查找
+        if length <= self.RANGE_CACHE_PREFIX_BYTES and len(self._ranges) < self.RANGE_CACHE_SIZE:
+            self._ranges[prefix] = (start, left)
+        return start, left
+
+    def longest_match(self, text, start, word_boundary=False):
+        """返回从start开始的最长词条(长度, 译文)，没有时返回None；word_boundary要求词条在词尾结束"""
+        lo, hi = 0, self.entries
+        prefix = b''
+        best = None
+        for index in range(start, min(len(text), start + self.max_length)):
+            char = text[index]
+            prefix += (char.lower() if self.fold_case else char).encode('utf-8')
+            lo, hi = self._narrow(lo, hi, prefix)
+            if lo >= hi:
+                break
+            # 有序表中与前缀完全相同的原文排在区间最前面
+            if self._key(lo) == prefix:
+                end = index + 1
+                if not word_boundary or end == len(text) or not is_word_char(text[end]):
+                    best = (end - start, self._value(lo))
+        return best
+
+    def close(self):
+        if self._view is not None:
+            self._key_offsets.release()
+            self._value_offsets.release()
+            self._view.release()
+        self._mm.close()
@@ -0,0 +1,67 @@
+"""
+对冲请求（hedged request）策略
+主请求在最近观测延迟的指定分位数内仍未返回时，再向同一个或另一个provider发出一份相同的请求，
+取先成功的结果并取消另一份。对冲次数受预算限制：每个请求积累budget_ratio个令牌，
+每次对冲消耗一个令牌，因此对冲请求数不会超过总请求数的budget_ratio（另有burst上限）
+"""
+import threading
+from collections import deque
+
+
+class HedgePolicy:
+    """记录每个provider最近的延迟样本，计算对冲等待时间并管理对冲预算"""
+
+    def __init__(self, percentile=95, min_delay=0.2, min_samples=20, window=200,
+                 budget_ratio=0.05, budget_burst=10):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._tokens = 0.0
+        self._stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0, "cancelled": 0}
+
+    def record(self, provider_name, elapsed):
+        """记录一次成功调用的延迟"""
+        with self._lock:
+            samples = self._samples.get(provider_name)
+            if samples is None:
+                samples = self._samples[provider_name] = deque(maxlen=self.window)
+            samples.append(elapsed)
+
+    def delay(self, provider_name):
+        """返回对冲前的等待时间（秒）；样本不足时返回None，表示不对冲"""
+        with self._lock:
+            self._stats["requests"] += 1
+            self._tokens = min(self.budget_burst, self._tokens + self.budget_ratio)
+            samples = self._samples.get(provider_name)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def acquire(self):
+        """尝试消耗一个对冲令牌"""
+        with self._lock:
+            if self._tokens < 1:
+                self._stats["budget_denied"] += 1
+                return False
+            self._tokens -= 1
+            self._stats["hedged"] += 1
+            return True
+
+    def count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["budget_tokens"] = round(self._tokens, 2)
+            stats["hedge_rate"] = round(stats["hedged"] / stats["requests"], 4) if stats["requests"] else 0.0
+            stats["win_rate"] = round(stats["hedge_wins"] / stats["hedged"], 4) if stats["hedged"] else 0.0
+        return stats
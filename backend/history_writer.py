@@ -0,0 +1,177 @@
+"""
+翻译记录的后台批量写入
+翻译接口只把记录放入有界内存队列后立即返回，后台线程按条数/时间攒批，
+通过Java后端的批量接口写入数据库；服务退出时排空队列
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from metrics import STAGE_SECONDS, record_error
+
+
+def make_record(original_text, translated_text, source_lang, target_lang, ip_address, model):
+    """构造发送给Java后端的翻译记录；createdAt为翻译完成的时间，排队、重试或从spool回放后写入时保持不变"""
+    return {
+        "originalText": original_text,
+        "translatedText": translated_text,
+        "sourceLang": source_lang,
+        "targetLang": target_lang,
+        "ipAddress": ip_address,
+        "model": model,
+        "createdAt": datetime.now().isoformat(timespec='seconds')
+    }
+
+
+class JavaBackendSink:
+    """把一批记录发送到Java后端；批量接口不可用（旧版本后端）时逐条发送"""
+
+    def __init__(self, client, url, timeout=10):
+        self.client = client
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.batch_supported = True
+
+    def __call__(self, records):
+        if self.batch_supported:
+            response = self.client.post(f"{self.url}/batch", json=records, timeout=self.timeout)
+            if response.status_code == 201:
+                return
+            if response.status_code not in (404, 405):
+                raise RuntimeError(f"批量保存失败: HTTP {response.status_code} {response.text[:200]}")
+            print("Java后端不支持批量保存接口，改为逐条保存")
+            self.batch_supported = False
+
+        for record in records:
+            response = self.client.post(self.url, json=record, timeout=self.timeout)
+            if response.status_code != 201:
+                raise RuntimeError(f"保存失败: HTTP {response.status_code} {response.text[:200]}")
+
+
+class HistoryWriter:
+    """有界队列 + 后台批量写入线程
+
+    sink(records)        发送一批记录，失败时抛出异常
+    on_failure(records)  发送失败或队列已满被丢弃的记录交给它处理（例如写本地备份）
+    """
+
+    def __init__(self, sink, max_queue=10000, batch_size=50, flush_interval=1.0, on_failure=None):
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_failure = on_failure
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "sent": 0,
+            "failed": 0,
+            "batches": 0,
+            "high_watermark": 0,
+            "last_flush_seconds": 0.0,
+            "last_error": None
+        }
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record):
+        """放入队列，不阻塞；队列已满时返回False"""
+        if self._stop.is_set():
+            self._fail([record], "写入线程已停止")
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            print("⚠️ 翻译记录写入队列已满，记录交由失败处理")
+            self._fail([record], "队列已满", count=False)
+            return False
+        with self._lock:
+            self._stats["enqueued"] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats["high_watermark"]:
+                self._stats["high_watermark"] = depth
+        return True
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if batch:
+                self._send(batch)
+
+    def _collect(self):
+        """攒一批记录：达到batch_size或距第一条记录超过flush_interval时返回"""
+        try:
+            first = self._queue.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                # 停止时不再等待，尽快排空
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch):
+        start = time.monotonic()
+        try:
+            self.sink(batch)
+        except Exception as e:
+            print(f"❌ 批量保存 {len(batch)} 条翻译记录失败: {str(e)}")
+            record_error('history', e)
+            self._fail(batch, str(e))
+            return
+        finally:
+            elapsed = time.monotonic() - start
+            STAGE_SECONDS.observe(elapsed, ('history_write',))
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["last_flush_seconds"] = round(elapsed, 4)
+        with self._lock:
+            self._stats["sent"] += len(batch)
+
+    def _fail(self, records, reason, count=True):
+        if count:
+            with self._lock:
+                self._stats["failed"] += len(records)
+                self._stats["last_error"] = reason
+        if self.on_failure is not None:
+            try:
+                self.on_failure(records)
+            except Exception as e:
+                print(f"❌ 处理保存失败的翻译记录时出错: {str(e)}")
+
+    def close(self, timeout=10):
+        """停止接收新记录并排空队列"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._queue.qsize():
+            print(f"⚠️ 退出时仍有 {self._queue.qsize()} 条翻译记录未写入")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_queue"] = self.max_queue
+        stats["batch_size"] = self.batch_size
+        stats["flush_interval"] = self.flush_interval
+        return stats
@@ -0,0 +1,403 @@
+"""
+异步翻译任务（/api/jobs）
+大文档提交后立即返回任务ID，由后台工作线程池逐个处理，客户端轮询任务状态：
+- 任务和切分后的各片段保存在SQLite（WAL模式）中，每个片段译完即写入，
+  重启后排队中和未完成的任务继续处理，已译完的片段不再调用上游
+- 工作线程通过条件更新认领任务并持有租约（定期续期），多个进程共享同一个数据库时不会重复处理；
+  进程退出后租约过期的任务重新排队
+- 任务内的片段并发翻译，失败的任务按指数退避延迟后重新排队重试，超过次数后标记为失败
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import record_error
+from segmenter import Chunk, join_translations, leading_space
+
+STATUSES = ('queued', 'running', 'completed', 'failed')
+
+
+class JobQueueFull(Exception):
+    """排队中的任务数已达上限"""
+
+
+class JobStore:
+    """任务和片段的SQLite存储，多进程共享"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _conn(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                text TEXT NOT NULL,
+                source_lang TEXT,
+                target_lang TEXT NOT NULL,
+                filename TEXT,
+                client_ip TEXT,
+                segments INTEGER NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                lease_until REAL,
+                retry_at REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_segments (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                separator TEXT,
+                translated TEXT,
+                PRIMARY KEY (job_id, seq)
+            ) WITHOUT ROWID
+        """)
+
+    def create(self, job_id, text, chunks, source_lang, target_lang, filename=None, client_ip=None, result=None):
+        """保存新任务及其片段；给出result时任务直接完成（如原文已是目标语言）"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, status, text, source_lang, target_lang, filename, client_ip, segments, done,"
+                " result, created_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, 'queued' if result is None else 'completed', text, source_lang, target_lang, filename,
+                 client_ip, len(chunks), 0 if result is None else len(chunks), result, now,
+                 None if result is None else now)
+            )
+            conn.executemany(
+                "INSERT INTO job_segments (job_id, seq, source, separator, translated) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, seq, chunk.text, chunk.separator, None) for seq, chunk in enumerate(chunks)]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self, owner, lease):
+        """认领最早排队的任务并设置租约，返回任务行，没有排队的任务时返回None"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND (retry_at IS NULL OR retry_at <= ?)"
+                " ORDER BY created_at LIMIT 1", (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, attempts = attempts + 1,"
+                    " started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (owner, now + lease, now, row["id"])
+                )
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def renew(self, owner, lease):
+        """为本进程正在处理的任务续期租约"""
+        self._conn().execute(
+            "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = 'running'", (time.time() + lease, owner)
+        )
+
+    def requeue_expired(self):
+        """租约已过期（处理进程已退出）的任务重新排队，返回数量"""
+        return self._conn().execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' AND lease_until < ?",
+            (time.time(),)
+        ).rowcount
+
+    def segments(self, job_id):
+        return self._conn().execute(
+            "SELECT source, separator, translated FROM job_segments WHERE job_id = ? ORDER BY seq", (job_id,)
+        ).fetchall()
+
+    def save_segment(self, job_id, seq, translated):
+        """
+        保存片段译文，返回是否写入；租约过期后任务被其他进程重新认领时，两边可能译完同一片段，
+        只有先写入的一方计入进度，避免done超过片段数
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            saved = conn.execute(
+                "UPDATE job_segments SET translated = ? WHERE job_id = ? AND seq = ? AND translated IS NULL",
+                (translated, job_id, seq)
+            ).rowcount == 1
+            if saved:
+                conn.execute("UPDATE jobs SET done = done + 1 WHERE id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return saved
+
+    def finish(self, job_id, owner, status, result=None, error=None, retry_delay=0):
+        """结束本进程持有的任务：completed/failed，或以queued在retry_delay秒后重新排队"""
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, owner = NULL, lease_until = NULL,"
+            " retry_at = ?, finished_at = ? WHERE id = ? AND owner = ?",
+            (status, result, error, now + retry_delay if status == 'queued' else None,
+             None if status == 'queued' else now, job_id, owner)
+        )
+
+    def get(self, job_id):
+        return self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def queue_position(self, created_at):
+        """排在该任务之前的排队任务数"""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (created_at,)
+        ).fetchone()[0]
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def prune(self, before):
+        """删除结束时间早于before的任务及其片段，返回删除的任务数"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM job_segments WHERE job_id IN"
+                " (SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?)", (before,)
+            )
+            removed = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?", (before,)
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+
+class JobManager:
+    """
+    任务提交、查询和后台工作线程池
+    translate(片段原文, 源语言, 目标语言) 返回译文；on_complete(任务行, 译文) 在任务完成后调用（如写入翻译记录）
+    """
+
+    def __init__(self, store, translate, workers=2, parallelism=4, max_queued=100, max_attempts=3,
+                 lease=60, retention=72 * 3600, poll_interval=2.0, retry_delay=5.0, on_complete=None):
+        self.store = store
+        self.translate = translate
+        self.workers = workers
+        self.parallelism = parallelism
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.on_complete = on_complete
+        # 租约归属：主机名、进程号和随机后缀，重启后的进程不会误认为持有旧租约
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0, "segments_translated": 0}
+
+    def start(self):
+        """启动工作线程和租约维护线程；租约已过期的任务先重新排队"""
+        requeued = self.store.requeue_expired()
+        if requeued:
+            print(f"{requeued} 个未完成的翻译任务已重新排队")
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True).start()
+        threading.Thread(target=self._maintain, name='job-lease', daemon=True).start()
+
+    def submit(self, text, chunks, source_lang, target_lang, filename=None, client_ip=None, result=None):
+        """保存任务并唤醒工作线程，返回任务状态；排队中的任务数已达上限时抛出JobQueueFull"""
+        if result is None and self.store.counts()["queued"] >= self.max_queued:
+            raise JobQueueFull(f"排队中的翻译任务已达上限（{self.max_queued}），请稍后再试")
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, text, chunks, source_lang, target_lang, filename, client_ip, result)
+        with self._lock:
+            self._stats["submitted"] += 1
+        with self._cond:
+            self._cond.notify()
+        return self.status(job_id)
+
+    def status(self, job_id):
+        """任务状态、进度和译文（未完成时为已连续译完的开头部分），任务不存在时返回None"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        status = {
+            "id": job["id"],
+            "status": job["status"],
+            "source_lang": job["source_lang"],
+            "target_lang": job["target_lang"],
+            "original_chars": len(job["text"]),
+            "progress": {
+                "segments": job["segments"],
+                "done": job["done"],
+                "percent": round(job["done"] * 100.0 / job["segments"], 1) if job["segments"] else 100.0
+            },
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+        }
+        if job["filename"]:
+            status["filename"] = job["filename"]
+        if job["status"] == 'completed':
+            status["translated_text"] = job["result"]
+        elif job["status"] == 'failed':
+            status["error"] = job["error"]
+        else:
+            if job["status"] == 'queued':
+                status["queue_position"] = self.store.queue_position(job["created_at"])
+            if job["done"]:
+                status["partial_text"] = self._partial_text(job)
+            if job["error"]:
+                status["last_error"] = job["error"]
+        return status
+
+    def _partial_text(self, job):
+        """已连续译完的开头若干片段的译文"""
+        chunks, translations = [], []
+        for row in self.store.segments(job["id"]):
+            if row["translated"] is None:
+                break
+            chunks.append(Chunk(row["source"], row["separator"], '' if chunks else leading_space(job["text"])))
+            translations.append(row["translated"])
+        return join_translations(chunks, translations, job["target_lang"])
+
+    def _work(self):
+        while True:
+            try:
+                job = self.store.claim(self.owner, self.lease)
+            except sqlite3.Error as e:
+                print(f"认领翻译任务失败: {str(e)}")
+                job = None
+            if job is None:
+                with self._cond:
+                    self._cond.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job_id = job["id"]
+        rows = self.store.segments(job_id)
+        chunks = [Chunk(row["source"], row["separator"], leading_space(job["text"]) if seq == 0 else '')
+                  for seq, row in enumerate(rows)]
+        translations = [row["translated"] for row in rows]
+        pending = [seq for seq, translated in enumerate(translations) if translated is None]
+        print(f"开始处理翻译任务 {job_id}: {len(chunks)} 个片段，待翻译 {len(pending)} 个")
+        try:
+            if pending:
+                with ThreadPoolExecutor(max_workers=max(1, min(self.parallelism, len(pending)))) as executor:
+                    futures = {
+                        executor.submit(self.translate, chunks[seq].text, job["source_lang"], job["target_lang"]): seq
+                        for seq in pending
+                    }
+                    try:
+                        for future in as_completed(futures):
+                            seq = futures[future]
+                            translations[seq] = future.result()
+                            self.store.save_segment(job_id, seq, translations[seq])
+                            with self._lock:
+                                self._stats["segments_translated"] += 1
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()
+                        raise
+            result = join_translations(chunks, translations, job["target_lang"])
+        except Exception as e:
+            record_error('job', e)
+            # 已译完的片段已保存，重试时只翻译剩余片段
+            retry = job["attempts"] < self.max_attempts
+            print(f"翻译任务 {job_id} 第 {job['attempts']} 次处理失败: {str(e)}{'，重新排队' if retry else ''}")
+            self.store.finish(job_id, self.owner, 'queued' if retry else 'failed', error=str(e),
+                              retry_delay=min(self.retry_delay * 2 ** (job["attempts"] - 1), 300))
+            with self._lock:
+                self._stats["retried" if retry else "failed"] += 1
+            return
+
+        self.store.finish(job_id, self.owner, 'completed', result)
+        with self._lock:
+            self._stats["completed"] += 1
+        print(f"翻译任务 {job_id} 已完成")
+        if self.on_complete is not None:
+            try:
+                self.on_complete(job, result)
+            except Exception as e:
+                print(f"翻译任务 {job_id} 完成后的处理出错: {str(e)}")
+
+    def _maintain(self):
+        """定期续期租约、重新排队租约过期的任务，并清理过期的已结束任务"""
+        last_prune = 0.0
+        while True:
+            time.sleep(self.lease / 3.0)
+            try:
+                self.store.renew(self.owner, self.lease)
+                if self.store.requeue_expired():
+                    with self._cond:
+                        self._cond.notify_all()
+                if time.time() - last_prune >= 3600:
+                    last_prune = time.time()
+                    removed = self.store.prune(time.time() - self.retention)
+                    if removed:
+                        print(f"已清理 {removed} 个过期的翻译任务")
+            except sqlite3.Error as e:
+                print(f"维护翻译任务租约失败: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["jobs"] = self.store.counts()
+        stats["workers"] = self.workers
+        return stats
+
+
+def open_jobs(path, translate, workers, parallelism, max_queued, max_attempts, lease, retention, on_complete=None):
+    """打开任务数据库并启动工作线程，路径为空或打开失败时返回None（禁用异步翻译任务）"""
+    if not path:
+        return None
+    try:
+        manager = JobManager(JobStore(path), translate, workers, parallelism, max_queued, max_attempts,
+                             lease, retention, on_complete=on_complete)
+    except (sqlite3.Error, OSError) as e:
+        print(f"无法打开翻译任务数据库 {path}: {str(e)}，已禁用异步翻译任务")
+        return None
+    manager.start()
+    print(f"异步翻译任务已启用: {path}（{workers} 个工作线程）")
+    return manager
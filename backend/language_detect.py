@@ -0,0 +1,191 @@
+"""
+源语言检测（source_lang为auto时使用）
+先按文字系统区分中文、日文、韩文、俄文、阿拉伯文，拉丁字母文本再用字符n-gram模型区分英、法、德、西、葡、意。
+n-gram模型是随代码发布的紧凑频率表（language_profiles.tsv，由build_language_profiles.py从各语言语料生成），
+只检查原文开头的少量字符，单次检测耗时在微秒级，不需要调用上游。
+开头的语言不代表整段原文（如以英文摘要开头的中文文档），判断原文已是目标语言、可以跳过翻译时
+由is_entirely_in()按窗口检查整段原文，原文太长无法全部检查时不跳过
+"""
+import math
+import os
+import re
+
+import config
+
+# 参与检测的最大字符数，足以判断语言且耗时与原文长度无关
+SAMPLE_CHARS = 200
+# 判断原文已是目标语言时最多检查的窗口数（每个窗口SAMPLE_CHARS个字符），更长的原文不跳过翻译
+SAME_LANGUAGE_MAX_WINDOWS = 16
+# 拉丁字母少于该数量时不做n-gram判断
+MIN_LATIN_LETTERS = 4
+# 每种语言的频率表保留的n-gram数
+PROFILE_SIZE = 400
+
+KANA_RE = re.compile(r'[぀-ヿㇰ-ㇿ]')
+HANGUL_RE = re.compile(r'[ᄀ-ᇿ㄰-㆏가-힯]')
+HAN_RE = re.compile(r'[㐀-䶿一-鿿豈-﫿]')
+CYRILLIC_RE = re.compile(r'[Ѐ-ӿ]')
+ARABIC_RE = re.compile(r'[؀-ۿݐ-ݿ]')
+LATIN_RE = re.compile(r'[A-Za-zÀ-ÖØ-öø-ɏ]')
+# 非字母字符统一视为词边界
+NON_LETTER_RE = re.compile(r'[^a-zß-öø-ɏ]+')
+
+
+def _normalize(text):
+    """小写并把非字母字符折叠为词边界'_'，前后补边界"""
+    return '_' + NON_LETTER_RE.sub('_', text.lower()).strip('_') + '_'
+
+
+def _ngrams(text):
+    """n-gram特征：所有三元组，以及非ASCII字母（重音字母等区分度高）的一元组"""
+    normalized = _normalize(text)
+    grams = [normalized[i:i + 3] for i in range(len(normalized) - 2)]
+    grams.extend(char for char in normalized if char > '\x7f')
+    return grams
+
+
+def build_profile(text, size=PROFILE_SIZE):
+    """从语料统计n-gram频率，返回(总数, [(n-gram, 次数), ...])，按次数降序保留size个"""
+    counts = {}
+    for gram in _ngrams(text):
+        counts[gram] = counts.get(gram, 0) + 1
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:size]
+    return sum(counts.values()), ranked
+
+
+def write_profiles(profiles, path):
+    """保存频率表：每行为“语言 总数 n-gram 次数 n-gram 次数 ...”"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("# 语言检测n-gram频率表，由build_language_profiles.py生成，'_'表示词边界\n")
+        for lang in sorted(profiles):
+            total, ranked = profiles[lang]
+            f.write(' '.join([lang, str(total)] + [f"{gram} {count}" for gram, count in ranked]) + '\n')
+    os.replace(tmp_path, path)
+
+
+def read_profiles(path):
+    profiles = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split()
+            lang, total = fields[0], int(fields[1])
+            profiles[lang] = (total, [(fields[i], int(fields[i + 1])) for i in range(2, len(fields) - 1, 2)])
+    return profiles
+
+
+class LanguageDetector:
+    """按文字系统和n-gram频率表检测语言"""
+
+    def __init__(self, profiles):
+        self.languages = sorted(profiles)
+        # 每个n-gram对应各语言的对数概率，不在某语言频率表中的n-gram取该语言的下限
+        self._floor = []
+        self._weights = {}
+        for index, lang in enumerate(self.languages):
+            total, ranked = profiles[lang]
+            floor = math.log(0.5 / total)
+            self._floor.append(floor)
+            for gram, count in ranked:
+                self._weights.setdefault(gram, {})[index] = math.log(count / total) - floor
+
+    @classmethod
+    def load(cls, path):
+        """从频率表文件加载，文件不存在时只按文字系统检测"""
+        if not path or not os.path.exists(path):
+            return cls({})
+        return cls(read_profiles(path))
+
+    def detect(self, text, sample_chars=SAMPLE_CHARS):
+        """返回检测到的语言代码（只检查开头的sample_chars个字符），文本太短或无法判断时返回None"""
+        sample = text[:sample_chars]
+        kana = len(KANA_RE.findall(sample))
+        han = len(HAN_RE.findall(sample))
+        counts = {
+            'ja': kana + han if kana else 0,
+            'zh': 0 if kana else han,
+            'ko': len(HANGUL_RE.findall(sample)),
+            'ru': len(CYRILLIC_RE.findall(sample)),
+            'ar': len(ARABIC_RE.findall(sample)),
+        }
+        script, script_chars = max(counts.items(), key=lambda item: item[1])
+        latin = len(LATIN_RE.findall(sample))
+        # 中日韩文中夹杂的英文术语按字符数折算后比较（约3个字母对应1个汉字）
+        weight = 3 if script in ('zh', 'ja', 'ko') else 1
+        if script_chars and script_chars * weight >= latin:
+            return script
+        if latin < MIN_LATIN_LETTERS or not self.languages:
+            return None
+        return self._detect_latin(sample)
+
+    def _detect_latin(self, sample):
+        grams = _ngrams(sample)
+        scores = [floor * len(grams) for floor in self._floor]
+        weights = self._weights
+        hits = 0
+        for gram in grams:
+            row = weights.get(gram)
+            if row:
+                hits += 1
+                for index, weight in row.items():
+                    scores[index] += weight
+        # 没有任何n-gram命中频率表时无法判断
+        if not hits:
+            return None
+        return self.languages[max(range(len(scores)), key=scores.__getitem__)]
+
+
+detector = LanguageDetector.load(config.LANGUAGE_PROFILES_PATH)
+
+
+def detect_language(text):
+    """检测文本语言，无法判断时返回None"""
+    if not config.LANG_DETECT_ENABLED or not text:
+        return None
+    return detector.detect(text)
+
+
+def is_entirely_in(text, lang):
+    """
+    整段原文是否都是lang：按SAMPLE_CHARS切成连续窗口逐个检测（过短的末尾并入前一个窗口），
+    不含字母的窗口不参与判断；原文超过SAME_LANGUAGE_MAX_WINDOWS个窗口时无法全部检查，返回False
+    """
+    if not lang or not config.LANG_DETECT_ENABLED or len(text) > SAMPLE_CHARS * SAME_LANGUAGE_MAX_WINDOWS:
+        return False
+    start = 0
+    while start < len(text):
+        end = start + SAMPLE_CHARS
+        if len(text) - end < SAMPLE_CHARS // 2:
+            end = len(text)
+        window = text[start:end]
+        if any(char.isalpha() for char in window) and detector.detect(window, len(window)) != lang:
+            return False
+        start = end
+    return True
+
+
+def resolve_source_lang(text, source_lang):
+    """source_lang为auto时返回(检测到的语言, True)，无法判断或已指定源语言时返回(source_lang, False)"""
+    if source_lang != 'auto':
+        return source_lang, False
+    detected = detect_language(text)
+    if detected is None:
+        return source_lang, False
+    return detected, True
+
+
+def resolve_batch_source_lang(texts, source_lang, target_lang):
+    """
+    批量翻译时source_lang为auto则逐条检测，返回(源语言, 整条原文已是目标语言的条目下标集合)；
+    其余条目检测结果一致时源语言取该语言，否则保持auto
+    """
+    if source_lang != 'auto':
+        return source_lang, set()
+    detected = [detect_language(text) for text in texts]
+    same_language = {i for i, lang in enumerate(detected) if lang == target_lang and is_entirely_in(texts[i], lang)}
+    remaining = {lang for i, lang in enumerate(detected) if i not in same_language}
+    if len(remaining) == 1 and None not in remaining:
+        source_lang = remaining.pop()
+    return source_lang, same_language
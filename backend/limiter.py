@@ -0,0 +1,163 @@
+"""
+上游并发自适应限制
+每个provider一个AIMD并发上限：调用成功时上限缓慢增加（每个上限窗口约加1），
+收到429/503、超时或延迟明显高于基线时上限按比例减小；429的Retry-After期间暂停放行。
+上限之前是按优先级分道的公平队列：interactive（流式翻译） > default（普通翻译） > bulk（批量翻译），
+高优先级道有请求等待时总是先放行，同一道内先到先得
+"""
+import threading
+import time
+from collections import deque
+
+LANES = ('interactive', 'default', 'bulk')
+
+
+class QueueTimeout(Exception):
+    """排队超过等待上限"""
+
+
+class AdaptiveLimiter:
+    """单个provider的AIMD并发上限和分道等待队列"""
+
+    def __init__(self, initial=16, min_limit=1, max_limit=256, backoff=0.7,
+                 latency_factor=3.0, queue_timeout=30.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._lanes = {lane: deque() for lane in LANES}
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._baselines = {}      # 每道的延迟基线（慢速EWMA），批量调用本身耗时更长，不与交互请求比较
+        self._stats = {
+            "admitted": 0, "timeouts": 0, "decreases": 0, "throttled": 0,
+            "lanes": {lane: {"admitted": 0, "wait_seconds_total": 0.0, "max_wait_seconds": 0.0}
+                      for lane in LANES}
+        }
+
+    def _head_of_queue(self, lane, ticket):
+        """ticket是否是当前应放行的等待者：所有更高优先级道为空，且位于本道队首"""
+        for name in LANES:
+            if name == lane:
+                return self._lanes[name][0] is ticket
+            if self._lanes[name]:
+                return False
+        return False
+
+    def acquire(self, lane='default'):
+        """排队等待放行，返回排队等待的秒数；超过queue_timeout抛出QueueTimeout"""
+        if lane not in self._lanes:
+            lane = 'default'
+        ticket = object()
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        with self._cond:
+            self._lanes[lane].append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if (now >= self._blocked_until and self.in_flight < int(self.limit)
+                            and self._head_of_queue(lane, ticket)):
+                        break
+                    if now >= deadline:
+                        self._stats["timeouts"] += 1
+                        raise QueueTimeout(f"排队等待超过{self.queue_timeout:.0f}秒")
+                    wait = deadline - now
+                    if self._blocked_until > now:
+                        wait = min(wait, self._blocked_until - now)
+                    self._cond.wait(wait)
+            finally:
+                self._lanes[lane].remove(ticket)
+                # 队首变化后其他等待者可能可以放行
+                self._cond.notify_all()
+            self.in_flight += 1
+            waited = time.monotonic() - start
+            self._stats["admitted"] += 1
+            lane_stats = self._stats["lanes"][lane]
+            lane_stats["admitted"] += 1
+            lane_stats["wait_seconds_total"] += waited
+            lane_stats["max_wait_seconds"] = max(lane_stats["max_wait_seconds"], waited)
+        return waited
+
+    def release(self, lane='default', elapsed=None, overloaded=False, retry_after=None):
+        """
+        结束一次调用并调整上限
+        lane        acquire时使用的道
+        elapsed     成功调用的上游耗时（秒），None表示没有延迟样本
+        overloaded  上游返回429/503或超时
+        retry_after 上游要求的等待秒数
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+                self._stats["throttled"] += 1
+            if overloaded:
+                self._decrease(now)
+            elif elapsed is not None:
+                baseline = self._baselines.get(lane)
+                if baseline is not None and elapsed > self.latency_factor * baseline:
+                    self._decrease(now)
+                else:
+                    # 加性增加：每个上限窗口的调用全部成功时上限约加1
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self._baselines[lane] = elapsed if baseline is None else baseline + 0.05 * (elapsed - baseline)
+            self._cond.notify_all()
+
+    def _decrease(self, now):
+        """乘性减小；同一批并发调用的连续过载信号只减小一次"""
+        cooldown = min(self._baselines.values(), default=1.0)
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._stats["decreases"] += 1
+
+    def stats(self):
+        with self._cond:
+            lanes = {}
+            for lane in LANES:
+                lane_stats = dict(self._stats["lanes"][lane])
+                lane_stats["queued"] = len(self._lanes[lane])
+                lane_stats["avg_wait_seconds"] = round(
+                    lane_stats["wait_seconds_total"] / lane_stats["admitted"], 4) if lane_stats["admitted"] else 0.0
+                lane_stats["wait_seconds_total"] = round(lane_stats["wait_seconds_total"], 4)
+                lane_stats["max_wait_seconds"] = round(lane_stats["max_wait_seconds"], 4)
+                lanes[lane] = lane_stats
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "latency_baseline_seconds": {lane: round(v, 4) for lane, v in self._baselines.items()},
+                "blocked_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+                "admitted": self._stats["admitted"],
+                "timeouts": self._stats["timeouts"],
+                "decreases": self._stats["decreases"],
+                "throttled": self._stats["throttled"],
+                "lanes": lanes
+            }
+
+
+class LimiterGroup:
+    """按provider名称创建和保存AdaptiveLimiter"""
+
+    def __init__(self, **options):
+        self.options = options
+        self._lock = threading.Lock()
+        self._limiters = {}
+
+    def get(self, name):
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                limiter = self._limiters[name] = AdaptiveLimiter(**self.options)
+            return limiter
+
+    def stats(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.stats() for name, limiter in limiters.items()}
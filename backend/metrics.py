@@ -0,0 +1,283 @@
+"""
+Prometheus文本格式的运行指标（/api/metrics）
+- Counter/Gauge/Histogram: 每个线程写自己的分片（threading.local），热路径上不加锁，
+  只有线程第一次写某个指标时登记分片需要加锁；导出时合并各分片，已退出线程的分片并入汇总分片
+- 各模块共用下面定义的指标：各处理阶段耗时、按服务/模型的上游耗时与首字节时间、
+  流式首个token时间和生成速度、进行中的请求与流数量、按类别的错误计数
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的默认分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# 生成速度直方图的分桶（token/秒）
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+
+# 线程分片数超过该值时在登记新分片前合并已退出线程的分片（Flask开发服务器每个请求一个线程）
+MAX_SHARDS = 64
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """按线程分片保存数据的指标基类，分片为{标签值元组: 数据}"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []        # [(线程, 分片)]
+        self._retired = {}       # 已退出线程的分片合并结果
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                if len(self._shards) >= MAX_SHARDS:
+                    self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead(self):
+        """把已退出线程的分片并入汇总分片，调用方持有锁"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                for labels, data in shard.items():
+                    self._retired[labels] = self._merge(self._retired.get(labels), data)
+        self._shards = alive
+
+    def _collect(self):
+        """合并所有分片，返回{标签值元组: 数据}"""
+        with self._lock:
+            self._retire_dead()
+            merged = {labels: self._merge(None, data) for labels, data in self._retired.items()}
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            # 其他线程可能同时新增标签组合，复制后再遍历
+            for labels, data in list(shard.items()):
+                merged[labels] = self._merge(merged.get(labels), data)
+        return merged
+
+    def _merge(self, total, data):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, data in sorted(self._collect().items()):
+            lines.extend(self._render_series(labels, data))
+        return lines
+
+    def _render_series(self, labels, data):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(data)}"]
+
+
+class Counter(_Metric):
+    """只增的计数器"""
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, total, data):
+        return (total or 0) + data
+
+
+class Gauge(Counter):
+    """可增可减的当前值（如进行中的请求数），各线程分片之和为当前值"""
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    @contextmanager
+    def track(self, labels=()):
+        """进入时加一，退出时减一"""
+        self.inc(labels)
+        try:
+            yield
+        finally:
+            self.dec(labels)
+
+
+class Histogram(_Metric):
+    """分桶直方图，每个标签组合的数据为[各桶计数..., 总和, 总数]"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        shard = self._shard()
+        data = shard.get(labels)
+        if data is None:
+            data = shard[labels] = [0] * (len(self.buckets) + 2)
+        # 分桶数很少，线性查找比二分更快
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[index] += 1
+                break
+        data[-2] += value
+        data[-1] += 1
+
+    @contextmanager
+    def time(self, labels=()):
+        """记录with块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, labels)
+
+    def _merge(self, total, data):
+        if total is None:
+            return list(data)
+        return [a + b for a, b in zip(total, data)]
+
+    def _render_series(self, labels, data):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), data[:-2] + [data[-1] - sum(data[:-2])]):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(round(data[-2], 6))}")
+        lines.append(f"{self.name}_count{label_text} {data[-1]}")
+        return lines
+
+
+class Registry:
+    """指标登记表，render()输出Prometheus文本格式"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """collector()返回[(指标名, 类型, 说明, {标签字典元组: 值})]，用于导出各模块已有的统计"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                print(f"导出指标失败: {str(e)}")
+                continue
+            for name, kind, documentation, series in samples:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in series.items():
+                    names = [k for k, _ in labels]
+                    values = [v for _, v in labels]
+                    lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'translator_http_request_seconds', 'HTTP请求处理耗时（流式请求到响应开始为止）', ('endpoint', 'status'))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'translator_http_requests_in_flight', '正在处理的HTTP请求数', ('endpoint',))
+STAGE_SECONDS = REGISTRY.histogram(
+    'translator_stage_seconds', '请求内各处理阶段耗时', ('stage',))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'translator_upstream_request_seconds', '单次上游调用的总耗时', ('provider', 'model', 'outcome'))
+UPSTREAM_TTFB_SECONDS = REGISTRY.histogram(
+    'translator_upstream_ttfb_seconds', '上游调用收到响应头的时间', ('provider', 'model'))
+STREAM_TTFT_SECONDS = REGISTRY.histogram(
+    'translator_stream_ttft_seconds', '流式调用从发出请求到收到第一个token的时间', ('provider', 'model'))
+STREAM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    'translator_stream_tokens_per_second', '流式调用收到第一个token之后的生成速度', ('provider', 'model'),
+    RATE_BUCKETS)
+STREAMS_IN_FLIGHT = REGISTRY.gauge(
+    'translator_streams_in_flight', '正在向客户端输出的流式响应数', ('endpoint',))
+STREAMS_CANCELLED = REGISTRY.counter(
+    'translator_streams_cancelled_total', '提前结束的流式响应数（客户端断开、空闲超时、总时长超时）',
+    ('endpoint', 'reason'))
+ERRORS = REGISTRY.counter(
+    'translator_errors_total', '按组件和类别统计的错误数', ('component', 'error_class'))
+
+
+def error_class(error):
+    """错误类别：timeout/network/circuit_open/http_429/http_4xx/http_5xx，其他错误取异常类名"""
+    if getattr(error, 'circuit_open', False):
+        return 'circuit_open'
+    if getattr(error, 'timeout', False):
+        return 'timeout'
+    if getattr(error, 'network', False):
+        return 'network'
+    status_code = getattr(error, 'status_code', None)
+    if status_code == 429:
+        return 'http_429'
+    if status_code is not None:
+        return f"http_{status_code // 100}xx"
+    return type(error).__name__
+
+
+def record_error(component, error):
+    ERRORS.inc((component, error_class(error)))
+
+
+def track_stream(events, endpoint):
+    """包装流式响应的生成器，输出期间计入进行中的流数量"""
+    STREAMS_IN_FLIGHT.inc((endpoint,))
+    try:
+        yield from events
+    finally:
+        STREAMS_IN_FLIGHT.dec((endpoint,))
+        close = getattr(events, 'close', None)
+        if close is not None:
+            close()
@@ -1,11 +1,8 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import requests
-import config
 import os
-import json
-import time
 from dotenv import load_dotenv
+from offline_engine import engine, simple_offline_translate
 
 app = Flask(__name__)
 # 配置JSON响应不转义中文字符
@@ -44,58 +41,11 @@ def index():
             "/api/translate - 翻译API",
             "/api/languages - 获取支持的语言",
             "/api/check - 检查API密钥",
-            "/api/health - 健康检查"
+            "/api/health - 健康检查",
+            "/api/offline/stats - 已加载的离线词典"
         ]
     })
 
-def simple_offline_translate(text, source_lang, target_lang):
-    """简单的离线翻译函数（无需API）"""
-    print(f"使用离线模式翻译: {source_lang} -> {target_lang}")
-    
-    # 模拟API延迟
-    time.sleep(1)
-    
-    # 基础翻译，非常简单的实现
-    if source_lang == "zh" and target_lang == "en":
-        # 非常简单的中英替换示例
-        common_words = {
-            "你好": "Hello",
-            "世界": "World",
-            "翻译": "Translation",
-            "软件": "Software",
-            "语言": "Language",
-            "谢谢": "Thank you",
-            "中文": "Chinese",
-            "英语": "English"
-        }
-        
-        translated = text
-        for zh, en in common_words.items():
-            if zh in text:
-                translated = translated.replace(zh, en)
-        return translated
-    elif source_lang == "en" and target_lang == "zh":
-        # 英译中
-        common_words = {
-            "Hello": "你好",
-            "World": "世界",
-            "Translation": "翻译",
-            "Software": "软件",
-            "Language": "语言",
-            "Thank you": "谢谢",
-            "Chinese": "中文",
-            "English": "英语"
-        }
-        
-        translated = text
-        for en, zh in common_words.items():
-            if en in text:
-                translated = translated.replace(en, zh)
-        return translated
-    else:
-        # 如果不是中英翻译，简单返回原文
-        return f"[离线翻译模式] {text}"
-
 @app.route('/api/translate', methods=['POST'])
 def translate():
     """翻译API端点"""
@@ -178,6 +128,11 @@ def health_check():
         "offline_mode": True
     })
 
+@app.route('/api/offline/stats', methods=['GET'])
+def offline_stats():
+    """词典目录和已加载的各语言对词典条数"""
+    return jsonify(engine.stats())
+
 if __name__ == '__main__':
     print(f"启动服务器: {HOST}:{PORT}, 调试模式: {DEBUG}")
     print(f"API访问地址: http://{HOST if HOST != '0.0.0.0' else 'localhost'}:{PORT}")
@@ -0,0 +1,196 @@
+"""
+离线翻译引擎（无需API），供离线服务和多服务路由的兜底provider使用
+按语言对从词典目录加载双语词典，对输入做一次从左到右的最长匹配替换，耗时与输入长度成正比，与词典大小无关：
+- <源语言>-<目标语言>.glossary: 由build_glossary.py预编译的二进制词典，mmap打开，多进程共享（优先使用）
+- <源语言>-<目标语言>.tsv: 每行“原文<TAB>译文”，#开头为注释，启动后解析并构建字典树，适合小词典
+"""
+import csv
+import os
+import threading
+
+import config
+from glossary import MappedGlossary
+from language_detect import detect_language
+from segmenter import CJK_RE, NO_SPACE_LANGS, is_word_char
+
+# 字典树中保存译文的键，不会与单个字符冲突
+_VALUE = ''
+
+
+class DictionaryTrie:
+    """双语词典的字典树，支持从任意位置查找最长匹配"""
+
+    def __init__(self, fold_case=False):
+        self.fold_case = fold_case
+        self.root = {}
+        self.entries = 0
+        self.max_length = 0
+
+    def add(self, source, target):
+        if self.fold_case:
+            source = source.lower()
+        node = self.root
+        for char in source:
+            node = node.setdefault(char, {})
+        if _VALUE not in node:
+            self.entries += 1
+        node[_VALUE] = target
+        self.max_length = max(self.max_length, len(source))
+
+    def longest_match(self, text, start, word_boundary=False):
+        """返回从start开始的最长词条(长度, 译文)，没有时返回None；word_boundary要求词条在词尾结束"""
+        node = self.root
+        best = None
+        for index in range(start, min(len(text), start + self.max_length)):
+            char = text[index]
+            node = node.get(char.lower() if self.fold_case else char)
+            if node is None:
+                break
+            if _VALUE in node:
+                end = index + 1
+                if not word_boundary or end == len(text) or not is_word_char(text[end]):
+                    best = (end - start, node[_VALUE])
+        return best
+
+
+def read_entries(path):
+    """逐条读取TSV（或.csv扩展名的CSV）词典文件中的(原文, 译文)，格式错误的行被跳过"""
+    skipped = 0
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        rows = csv.reader(f) if path.endswith('.csv') else (line.rstrip('\r\n').split('\t') for line in f)
+        for row in rows:
+            if not row or not row[0] or row[0].startswith('#'):
+                continue
+            if len(row) < 2 or not row[0].strip():
+                skipped += 1
+                continue
+            yield row[0].strip(), row[1].strip()
+    if skipped:
+        print(f"词典 {path} 中有 {skipped} 行格式错误，已跳过")
+
+
+def load_tsv(path, fold_case=False):
+    """从TSV文件加载词典并构建字典树"""
+    trie = DictionaryTrie(fold_case)
+    for source, target in read_entries(path):
+        trie.add(source, target)
+    return trie
+
+
+def translate_with_dictionary(dictionary, text, source_lang, target_lang):
+    """
+    一次扫描完成翻译：每个位置取最长匹配的词条替换，未命中的字符原样保留。
+    使用空格分词的源语言只在词首开始匹配、在词尾结束匹配；
+    译文之间按目标语言补空格（英文等）或去掉原文中的单个空格（中文、日文）
+    """
+    word_based = source_lang not in NO_SPACE_LANGS
+    spaced_target = target_lang not in NO_SPACE_LANGS
+    out = []
+    last_translated = False
+    pending_space = ''
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char == ' ' and last_translated and not spaced_target:
+            # 暂存译文后的空格，下一个也是译文时丢弃
+            pending_space += char
+            index += 1
+            continue
+        at_word_start = not word_based or index == 0 or not is_word_char(text[index - 1])
+        match = dictionary.longest_match(text, index, word_based) if at_word_start else None
+        if match is not None:
+            matched_length, translation = match
+            if pending_space and spaced_target:
+                out.append(pending_space)
+            elif spaced_target and out and out[-1] and is_word_char(out[-1][-1]) \
+                    and translation and is_word_char(translation[0]):
+                out.append(' ')
+            pending_space = ''
+            out.append(translation)
+            index += matched_length
+            last_translated = True
+            continue
+        if pending_space:
+            out.append(pending_space)
+            pending_space = ''
+        if word_based and is_word_char(char):
+            # 未命中的单词整体保留，避免从单词中间开始匹配
+            end = index + 1
+            while end < length and is_word_char(text[end]):
+                end += 1
+            out.append(text[index:end])
+            index = end
+        else:
+            out.append(char)
+            index += 1
+        last_translated = False
+    return ''.join(out)
+
+
+class OfflineEngine:
+    """按语言对懒加载词典目录中的词典"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dictionaries = {}
+
+    def dictionary(self, source_lang, target_lang):
+        """返回语言对的词典，没有对应词典文件时返回None"""
+        pair = f"{source_lang}-{target_lang}"
+        with self._lock:
+            if pair in self._dictionaries:
+                return self._dictionaries[pair]
+            dictionary = None
+            base = os.path.join(self.directory, pair) if self.directory else None
+            if base and os.path.exists(base + '.glossary'):
+                try:
+                    dictionary = MappedGlossary(base + '.glossary')
+                    print(f"已映射离线词典 {pair}.glossary: {dictionary.entries} 条")
+                    if os.path.exists(base + '.tsv') and \
+                            os.path.getmtime(base + '.tsv') > os.path.getmtime(base + '.glossary'):
+                        print(f"⚠️ {pair}.tsv 比 {pair}.glossary 新，请运行 build_glossary.py 重新编译")
+                except (OSError, ValueError) as e:
+                    print(f"打开离线词典 {base}.glossary 失败: {str(e)}")
+            if dictionary is None and base and os.path.exists(base + '.tsv'):
+                try:
+                    dictionary = load_tsv(base + '.tsv', fold_case=source_lang not in NO_SPACE_LANGS)
+                    print(f"已加载离线词典 {pair}.tsv: {dictionary.entries} 条")
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"加载离线词典 {base}.tsv 失败: {str(e)}")
+            self._dictionaries[pair] = dictionary
+            return dictionary
+
+    def translate(self, text, source_lang, target_lang):
+        if source_lang == 'auto':
+            # 没有指定源语言时在本地检测，无法判断时按是否含中日韩字符粗略判断
+            source_lang = detect_language(text) or ('zh' if CJK_RE.search(text) else 'en')
+        if source_lang == target_lang:
+            return text
+        dictionary = self.dictionary(source_lang, target_lang)
+        if dictionary is None:
+            return None
+        return translate_with_dictionary(dictionary, text, source_lang, target_lang)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "dictionaries": {
+                    pair: {"entries": d.entries, "format": "glossary" if isinstance(d, MappedGlossary) else "tsv"}
+                    for pair, d in self._dictionaries.items() if d is not None
+                }
+            }
+
+
+engine = OfflineEngine(config.OFFLINE_DICT_DIR)
+
+
+def simple_offline_translate(text, source_lang, target_lang):
+    """离线翻译函数（无需API），没有对应语言对的词典时返回带标记的原文"""
+    print(f"使用离线模式翻译: {source_lang} -> {target_lang}")
+    translated = engine.translate(text, source_lang, target_lang)
+    if translated is None:
+        return f"[离线翻译模式] {text}"
+    return translated
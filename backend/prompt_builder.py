@@ -0,0 +1,182 @@
+"""
+翻译提示构造与上游token预算
+- build_messages: 各接口共用的翻译提示模板，相同的原文和语言得到相同的提示（缓存键也相同）
+- TokenEstimator: 本地估算中日韩/西文文本的token数，并按上游返回的usage按模型校准
+- TokenBudget: 按原文长度和目标语言为每次调用确定max_tokens（不再固定为8192），
+  在发送前识别超出上下文窗口的原文，并给出切分片段时的原文token上限
+"""
+import math
+import threading
+
+from segmenter import estimate_tokens
+
+SYSTEM_PROMPT = "你是一个专业翻译助手，能够准确流畅地进行多语言翻译。"
+
+# 翻译提示模板：report为普通翻译，stream为app_llm流式接口使用的提示；未指定源语言时统一使用auto
+PROMPTS = {
+    'auto': "将以下文本翻译成{target}语言:\n\n",
+    'report': "将以下{source}文本翻译成学生写的实验报告且机器味道不浓的{target}语言:\n\n",
+    'stream': "将以下{source}机器味道不浓准确无误遇到人名或该语言固有名词也翻译成{target}语言:\n\n",
+}
+
+# 翻译记忆的模糊命中作为参考放在翻译提示之前
+REFERENCE_NOTE = "以下是与原文相似的句子及其已有译文，仅用于保持术语和译法一致，不要翻译或输出这些内容：\n"
+
+# 尚无usage样本时，译文token数与原文估算token数之比的初始值（按目标语言）
+DEFAULT_OUTPUT_RATIO = {'zh': 1.2, 'ja': 1.5, 'ko': 1.5}
+DEFAULT_OUTPUT_RATIO_OTHER = 1.3
+
+# 每条消息的角色、分隔符等结构开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def build_messages(text, source_lang, target_lang, style='report', references=None):
+    """构造翻译请求的消息列表；references为(相似原文, 译文)列表，作为参考附在提示之前"""
+    template = PROMPTS['auto'] if source_lang == 'auto' else PROMPTS[style]
+    prefix = ''
+    if references:
+        prefix = REFERENCE_NOTE + '\n'.join(f"{source} => {target}" for source, target in references) + '\n\n'
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prefix + template.format(source=source_lang, target=target_lang) + text}
+    ]
+
+
+def _user_content(messages):
+    """消息中最后一条用户消息的内容（待翻译的部分）"""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content") or ''
+    return ''
+
+
+class TokenEstimator:
+    """
+    token数估算：在segmenter.estimate_tokens的基础上，按模型记录两个EWMA校准系数
+    - prompt_ratio: 上游实际prompt_tokens / 本地估算的提示token数
+    - output_ratio: 上游实际completion_tokens / 本地估算的原文token数（按目标语言分别记录）
+    """
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _model(self, model):
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = {
+                "prompt_ratio": 1.0, "output_ratio": {}, "calls": 0, "truncated": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "requested_tokens": 0
+            }
+        return state
+
+    def prompt_tokens(self, messages, model=None):
+        """估算消息列表的提示token数"""
+        raw = sum(estimate_tokens(m.get("content") or '') + MESSAGE_OVERHEAD_TOKENS for m in messages)
+        with self._lock:
+            ratio = self._models[model]["prompt_ratio"] if model in self._models else 1.0
+        return math.ceil(raw * ratio)
+
+    def output_ratio(self, target_lang, model=None):
+        """译文token数与原文估算token数之比；model为None时取各模型中最大的（最保守）"""
+        default = DEFAULT_OUTPUT_RATIO.get(target_lang, DEFAULT_OUTPUT_RATIO_OTHER)
+        with self._lock:
+            if model is None:
+                return max([s["output_ratio"][target_lang] for s in self._models.values()
+                            if target_lang in s["output_ratio"]] or [default])
+            state = self._models.get(model)
+            return state["output_ratio"].get(target_lang, default) if state else default
+
+    def output_tokens(self, messages, target_lang, model=None):
+        """估算译文的token数"""
+        return math.ceil(estimate_tokens(_user_content(messages)) * self.output_ratio(target_lang, model))
+
+    def record(self, model, messages, target_lang, usage, requested=None, truncated=False):
+        """按上游返回的usage校准；truncated表示译文因max_tokens不足被截断，此时观测值只是下限"""
+        prompt_tokens = usage.get("prompt_tokens") if usage else None
+        completion_tokens = usage.get("completion_tokens") if usage else None
+        prompt_raw = sum(estimate_tokens(m.get("content") or '') + MESSAGE_OVERHEAD_TOKENS for m in messages)
+        source_raw = estimate_tokens(_user_content(messages))
+        default = DEFAULT_OUTPUT_RATIO.get(target_lang, DEFAULT_OUTPUT_RATIO_OTHER)
+        with self._lock:
+            state = self._model(model)
+            state["calls"] += 1
+            state["requested_tokens"] += requested or 0
+            if isinstance(prompt_tokens, int) and prompt_tokens > 0 and prompt_raw:
+                state["prompt_tokens"] += prompt_tokens
+                observed = min(4.0, max(0.25, prompt_tokens / prompt_raw))
+                state["prompt_ratio"] += self.alpha * (observed - state["prompt_ratio"])
+            current = state["output_ratio"].get(target_lang, default)
+            if isinstance(completion_tokens, int) and completion_tokens > 0 and source_raw:
+                state["completion_tokens"] += completion_tokens
+                observed = min(5.0, max(0.2, completion_tokens / source_raw))
+                if truncated:
+                    # 截断说明系数明显偏小，直接调高而不是慢慢逼近
+                    current = min(5.0, max(current, observed) * 1.25)
+                else:
+                    current += self.alpha * (observed - current)
+                state["output_ratio"][target_lang] = current
+            if truncated:
+                state["truncated"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: dict(state, prompt_ratio=round(state["prompt_ratio"], 3),
+                            output_ratio={k: round(v, 3) for k, v in state["output_ratio"].items()})
+                for model, state in self._models.items()
+            }
+
+
+class TokenBudget:
+    """
+    每次上游调用的token预算：
+    max_tokens = 估算译文token数 × safety + margin，限制在[min_output_tokens, max_output_tokens]之间，
+    且提示与译文合计不超过模型上下文窗口context_tokens
+    """
+
+    def __init__(self, context_tokens=32768, max_output_tokens=8192, min_output_tokens=256, safety=1.5,
+                 margin=64, estimator=None):
+        self.context_tokens = context_tokens
+        self.max_output_tokens = max_output_tokens
+        self.min_output_tokens = min(min_output_tokens, max_output_tokens)
+        self.safety = safety
+        self.margin = margin
+        self.estimator = estimator or TokenEstimator()
+
+    def max_tokens(self, messages, target_lang, model=None):
+        """本次调用的max_tokens；提示本身已超出上下文窗口时返回None"""
+        room = self.context_tokens - self.estimator.prompt_tokens(messages, model)
+        if room < self.min_output_tokens:
+            return None
+        wanted = math.ceil(self.estimator.output_tokens(messages, target_lang, model) * self.safety) + self.margin
+        return max(self.min_output_tokens, min(wanted, self.max_output_tokens, room))
+
+    def max_input_tokens(self, target_lang, model=None):
+        """
+        单次调用可容纳的原文token数上限（segmenter.estimate_tokens口径）：
+        译文不超过max_output_tokens，且提示与译文合计不超过上下文窗口
+        """
+        output_ratio = self.estimator.output_ratio(target_lang, model) * self.safety
+        by_output = (self.max_output_tokens - self.margin) / output_ratio
+        # 提示模板和系统消息按200个token预留
+        by_context = (self.context_tokens - 200) / (1.0 + output_ratio)
+        return max(1, int(min(by_output, by_context)))
+
+    def chunk_tokens(self, configured, target_lang):
+        """切分片段/打包批量条目时使用的原文token预算：配置值（0为不限）与单次调用上限中较小的一个"""
+        limit = self.max_input_tokens(target_lang)
+        return min(configured, limit) if configured > 0 else limit
+
+    def record(self, model, messages, target_lang, usage, requested=None, truncated=False):
+        self.estimator.record(model, messages, target_lang, usage, requested, truncated)
+
+    def stats(self):
+        return {
+            "context_tokens": self.context_tokens,
+            "max_output_tokens": self.max_output_tokens,
+            "min_output_tokens": self.min_output_tokens,
+            "safety": self.safety,
+            "models": self.estimator.stats()
+        }
@@ -0,0 +1,756 @@
+"""
+翻译服务提供方（provider）与按实时状态路由
+- OpenAICompatibleProvider: DeepSeek、ChatGLM等兼容OpenAI chat/completions协议的接口
+- OfflineProvider: 离线词典翻译，只作为所有在线服务都失败时的兜底
+- ProviderRouter: 按每个provider的EWMA延迟、EWMA错误率和进行中的请求数为每次调用选择provider，
+  调用失败时依次尝试下一个；可选地对迟迟未返回的非流式调用发出对冲请求（见hedging.py），
+  对暂时性错误退避重试，并跳过熔断中的服务（见resilience.py）
+"""
+import os
+import queue
+import random
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import requests
+
+from limiter import QueueTimeout
+from metrics import (STREAM_TOKENS_PER_SECOND, STREAM_TTFT_SECONDS, UPSTREAM_SECONDS, UPSTREAM_TTFB_SECONDS,
+                     error_class, record_error)
+from offline_engine import simple_offline_translate
+from segmenter import estimate_tokens
+from sse import iter_sse_data, json_loads
+
+# 一次翻译调用：messages供LLM使用，text/source_lang/target_lang供离线引擎使用（批量提示等场景text为None），
+# lane为并发限制队列中的优先级道（interactive/default/bulk）
+TranslationTask = namedtuple('TranslationTask', ['messages', 'text', 'source_lang', 'target_lang', 'lane'],
+                             defaults=('default',))
+
+# 调用结果：译文、实际使用的provider名称和模型，cacheable为False时结果不应写入缓存
+Completion = namedtuple('Completion', ['text', 'provider', 'model', 'cacheable'])
+
+
+class ProviderError(Exception):
+    """
+    上游调用失败，status_code为HTTP状态码（网络错误时为None）；
+    timeout/network标记超时和连接错误，circuit_open表示服务熔断中、未实际调用
+    """
+
+    def __init__(self, message, provider=None, status_code=None, retry_after=None, timeout=False,
+                 network=False, circuit_open=False):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.network = network
+        self.circuit_open = circuit_open
+
+    @property
+    def overloaded(self):
+        """上游过载信号：429/503或超时"""
+        return self.timeout or self.status_code in (429, 503)
+
+    @property
+    def retry_after_seconds(self):
+        """Retry-After头的秒数，缺失或为HTTP日期格式时返回None"""
+        try:
+            return max(0.0, float(self.retry_after))
+        except (TypeError, ValueError):
+            return None
+
+
+class RequestCancelled(Exception):
+    """调用被主动取消（对冲请求中落败的一方，或流式调用的客户端已全部断开）"""
+
+
+class Cancellation(threading.Event):
+    """可登记回调的取消标志：set()时调用已登记的回调（如中止上游响应），使阻塞在读取中的调用立即返回"""
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks_lock = threading.Lock()
+        self._callbacks = []
+
+    def on_cancel(self, callback):
+        """登记取消时的回调，已取消时立即调用"""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def _iter_chunks(response):
+    """按到达的粒度读取流式响应体：分块传输时逐块产出，否则每次最多读512字节（与iter_lines相同）"""
+    chunk_size = None if getattr(response.raw, 'chunked', False) else 512
+    return response.iter_content(chunk_size=chunk_size)
+
+
+def _abort_response(response):
+    """
+    从其他线程中止正在读取的响应：shutdown底层socket，阻塞在读取中的线程立即返回，
+    上游看到连接断开后停止生成（只close不会唤醒正在recv的线程）
+    """
+    connection = getattr(response.raw, 'connection', None) or getattr(response.raw, '_connection', None)
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        response.close()
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class Provider:
+    """provider基类"""
+    name = 'provider'
+    model = None
+    fallback = False     # 只在其他provider都失败时使用
+    cacheable = True
+
+    def supports(self, task):
+        return True
+
+    def complete(self, task, cancel=None):
+        """
+        返回完整译文；cancel为threading.Event（通常是Cancellation），置位后应尽快放弃调用并抛出RequestCancelled。
+        cancel提供on_cancel(callback)时可登记中止函数，取消时立即打断阻塞中的读取
+        """
+        raise NotImplementedError
+
+    def stream(self, task, on_abort=None):
+        """
+        发起流式调用，返回增量文本的迭代器；连接或HTTP错误在返回前抛出。
+        on_abort(callback)用于登记中止函数：调用callback后迭代器应尽快抛出RequestCancelled
+        """
+        text = self.complete(task)
+        return iter([text])
+
+    def hosts(self):
+        """需要预热连接的上游地址"""
+        return []
+
+
+class OpenAICompatibleProvider(Provider):
+    """兼容OpenAI chat/completions协议的LLM接口"""
+
+    def __init__(self, name, api_url, api_key, model, client, timeout=300, temperature=0.3, max_tokens=8192,
+                 budget=None):
+        self.name = name
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.client = client
+        self.timeout = timeout
+        self.temperature = temperature
+        self.max_tokens = max_tokens    # 未配置budget时每次调用使用的max_tokens，配置时为截断后重试使用的上限
+        self.budget = budget            # prompt_builder.TokenBudget，按原文估算max_tokens并用usage校准
+
+    def _request_tokens(self, task):
+        """本次调用的max_tokens，原文超出模型上下文窗口时在发送前报错"""
+        if self.budget is None:
+            return self.max_tokens
+        max_tokens = self.budget.max_tokens(task.messages, task.target_lang, self.model)
+        if max_tokens is None:
+            raise ProviderError(f"{self.name} 原文超出模型上下文窗口，请切分后再翻译", self.name, 413)
+        return max_tokens
+
+    def _record_usage(self, task, usage, max_tokens, finish_reason):
+        """把上游返回的usage交给budget校准，返回译文是否因max_tokens不足被截断"""
+        truncated = finish_reason == 'length'
+        if self.budget is not None:
+            self.budget.record(self.model, task.messages, task.target_lang, usage, max_tokens, truncated)
+        if truncated:
+            print(f"⚠️ {self.name} 译文达到max_tokens={max_tokens}被截断")
+        return truncated
+
+    def _post(self, task, stream, max_tokens):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        payload = {
+            "model": self.model,
+            "messages": task.messages,
+            "temperature": self.temperature,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            payload["stream"] = True
+        print(f"发送{'流式' if stream else ''}请求到{self.name}，模型: {self.model}，max_tokens: {max_tokens}")
+        start = time.perf_counter()
+        try:
+            # 非流式调用也延迟读取响应体，以便分别统计首字节时间和生成/传输时间
+            response = self.client.post(self.api_url, headers=headers, json=payload,
+                                        timeout=self.timeout, stream=True)
+        except requests.exceptions.Timeout as e:
+            raise ProviderError(f"{self.name} API请求超时: {str(e)}", self.name, timeout=True) from e
+        except requests.exceptions.RequestException as e:
+            raise ProviderError(f"{self.name} API请求失败: {str(e)}", self.name, network=True) from e
+
+        if response.status_code >= 400:
+            body = response.text[:200]
+            retry_after = response.headers.get('Retry-After')
+            response.close()
+            if response.status_code == 404:
+                message = f"API端点未找到(404)。请检查API URL是否正确: {self.api_url}"
+            elif response.status_code == 401:
+                message = "API密钥无效或已过期(401)"
+            else:
+                message = f"API HTTP错误({response.status_code}): {body}"
+            raise ProviderError(f"{self.name} {message}", self.name, response.status_code, retry_after)
+        UPSTREAM_TTFB_SECONDS.observe(time.perf_counter() - start, (self.name, self.model or ''))
+        return response
+
+    def complete(self, task, cancel=None):
+        max_tokens = self._request_tokens(task)
+        if cancel is not None:
+            # 可取消的调用改用流式接口读取：取消时中止响应，上游随即停止生成
+            result = {}
+            response = self._post(task, True, max_tokens)
+            if hasattr(cancel, 'on_cancel'):
+                def abort():
+                    result["aborted"] = True
+                    _abort_response(response)
+                cancel.on_cancel(abort)
+            deltas = self._iter_deltas(response, task, max_tokens, result)
+            parts = []
+            try:
+                for delta in deltas:
+                    if cancel.is_set():
+                        raise RequestCancelled(f"{self.name} 调用已取消")
+                    parts.append(delta)
+            finally:
+                deltas.close()
+            if not result.get("truncated") or max_tokens >= self.max_tokens:
+                return ''.join(parts)
+            if cancel.is_set():
+                raise RequestCancelled(f"{self.name} 调用已取消")
+        else:
+            text, truncated = self._complete_once(task, max_tokens)
+            if not truncated or max_tokens >= self.max_tokens:
+                return text
+        # 估算的max_tokens偏小导致译文被截断时，按上限重新翻译一次
+        return self._complete_once(task, self.max_tokens)[0]
+
+    def _complete_once(self, task, max_tokens):
+        """非流式调用，返回(译文, 是否被截断)"""
+        response = self._post(task, False, max_tokens)
+        try:
+            result = response.json()
+            choice = result['choices'][0]
+            text = choice['message']['content']
+        except requests.exceptions.RequestException as e:
+            raise ProviderError(f"{self.name} 读取响应失败: {str(e)}", self.name, network=True) from e
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ProviderError(f"{self.name} API响应格式错误: {str(e)}", self.name) from e
+        finally:
+            response.close()
+        usage = result.get('usage') if isinstance(result.get('usage'), dict) else None
+        return text, self._record_usage(task, usage, max_tokens, choice.get('finish_reason'))
+
+    def stream(self, task, on_abort=None):
+        max_tokens = self._request_tokens(task)
+        start = time.perf_counter()
+        response = self._post(task, True, max_tokens)
+        result = {}
+        if on_abort is not None:
+            def abort():
+                result["aborted"] = True
+                _abort_response(response)
+            on_abort(abort)
+        return self._iter_deltas(response, task, max_tokens, result, start)
+
+    def _iter_deltas(self, response, task, max_tokens, result=None, start=None):
+        """
+        解析SSE响应，逐个产出content增量；结束时记录usage（上游在最后的数据块中返回时），截断情况写入result。
+        start为发出请求的时间，给出时统计首个token时间和生成速度；result中aborted被置位时抛出RequestCancelled
+        """
+        usage = None
+        finish_reason = None
+        completed = False
+        first_token_at = None
+        estimated_tokens = 0
+        try:
+            for data in iter_sse_data(_iter_chunks(response)):
+                try:
+                    data_json = json_loads(data)
+                except ValueError:
+                    print(f"无法解析JSON: {data[:200]!r}")
+                    continue
+                if not isinstance(data_json, dict):
+                    continue
+                if isinstance(data_json.get('usage'), dict):
+                    usage = data_json['usage']
+                if data_json.get('choices'):
+                    choice = data_json['choices'][0]
+                    finish_reason = choice.get('finish_reason') or finish_reason
+                    content = choice.get('delta', {}).get('content')
+                    if content:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        estimated_tokens += estimate_tokens(content)
+                        yield content
+            # 中止时socket被shutdown，读取可能正常结束也可能抛出异常
+            completed = not (result is not None and result.get("aborted"))
+        except Exception as e:
+            if result is not None and result.get("aborted"):
+                raise RequestCancelled(f"{self.name} 流式调用已中止") from e
+            if isinstance(e, requests.exceptions.RequestException):
+                raise ProviderError(f"{self.name} 流式响应中断: {str(e)}", self.name, network=True) from e
+            raise
+        finally:
+            response.close()
+            if completed:
+                truncated = self._record_usage(task, usage, max_tokens, finish_reason)
+                if result is not None:
+                    result["truncated"] = truncated
+                if start is not None and first_token_at is not None:
+                    self._record_stream_metrics(start, first_token_at, usage, estimated_tokens)
+        if not completed:
+            raise RequestCancelled(f"{self.name} 流式调用已中止")
+
+    def _record_stream_metrics(self, start, first_token_at, usage, estimated_tokens):
+        labels = (self.name, self.model or '')
+        STREAM_TTFT_SECONDS.observe(first_token_at - start, labels)
+        generation = time.perf_counter() - first_token_at
+        tokens = (usage or {}).get('completion_tokens') or estimated_tokens
+        if generation > 0 and tokens:
+            STREAM_TOKENS_PER_SECOND.observe(tokens / generation, labels)
+
+    def hosts(self):
+        return [self.api_url]
+
+
+class OfflineProvider(Provider):
+    """离线词典翻译，译文质量有限，只作兜底且不写入缓存"""
+    name = 'offline'
+    model = 'offline'
+    fallback = True
+    cacheable = False
+
+    def supports(self, task):
+        # 批量JSON提示等没有原文的调用无法离线处理
+        return task.text is not None
+
+    def complete(self, task, cancel=None):
+        return simple_offline_translate(task.text, task.source_lang, task.target_lang)
+
+
+def providers_from_env(client, names, timeout=300, budget=None):
+    """
+    按名称列表（逗号分隔）创建provider，未配置API密钥的在线服务会被跳过；
+    timeout传给requests，可以是(连接超时, 读取超时)；budget为共用的TokenBudget
+    """
+    max_tokens = budget.max_output_tokens if budget is not None else 8192
+    providers = []
+    for name in [n.strip() for n in names.split(',') if n.strip()]:
+        if name == 'deepseek':
+            api_key = os.getenv('DEEPSEEK_API_KEY')
+            base_url = os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com')
+            if api_key:
+                providers.append(OpenAICompatibleProvider(
+                    'deepseek', f"{base_url}/v1/chat/completions", api_key,
+                    os.getenv('DEEPSEEK_MODEL', 'deepseek-chat'), client, timeout,
+                    max_tokens=max_tokens, budget=budget))
+        elif name == 'chatglm':
+            api_key = os.getenv('CHATGLM_API_KEY')
+            if api_key and os.getenv('CHATGLM_API_URL'):
+                providers.append(OpenAICompatibleProvider(
+                    'chatglm', os.getenv('CHATGLM_API_URL'), api_key, os.getenv('CHATGLM_MODEL'), client, timeout,
+                    max_tokens=max_tokens, budget=budget))
+        elif name == 'openai':
+            # 其他任意OpenAI兼容接口
+            api_key = os.getenv('OPENAI_API_KEY')
+            if api_key and os.getenv('OPENAI_API_URL'):
+                providers.append(OpenAICompatibleProvider(
+                    'openai', os.getenv('OPENAI_API_URL'), api_key, os.getenv('OPENAI_MODEL'), client, timeout,
+                    max_tokens=max_tokens, budget=budget))
+        elif name == 'offline':
+            providers.append(OfflineProvider())
+        else:
+            print(f"未知的翻译服务: {name}，已忽略")
+    return providers
+
+
+class ProviderState:
+    """单个provider的实时统计"""
+
+    def __init__(self):
+        self.latency = None     # EWMA延迟（秒），尚无样本时为None
+        self.error_rate = 0.0   # EWMA错误率
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_error = None
+
+
+class ProviderRouter:
+    """为每次调用选择provider：得分 = EWMA延迟 × (1 + 进行中请求数) / (1 - EWMA错误率)，越低越优先"""
+
+    def __init__(self, providers, alpha=0.2, explore_rate=0.05, hedge=None, limits=None, retry=None, breakers=None):
+        self.providers = providers
+        self.alpha = alpha
+        self.explore_rate = explore_rate
+        self.hedge = hedge          # HedgePolicy，为None时不对冲
+        self.limits = limits        # LimiterGroup，为None时不限制并发
+        self.retry = retry          # RetryPolicy，为None时不重试（仍会切换服务）
+        self.breakers = breakers    # BreakerGroup，为None时不熔断
+        self._lock = threading.Lock()
+        self._state = {p.name: ProviderState() for p in providers}
+
+    def has_providers(self):
+        return bool(self.providers)
+
+    @property
+    def primary(self):
+        """配置顺序中的第一个provider"""
+        return self.providers[0] if self.providers else None
+
+    @property
+    def cache_scope(self):
+        """
+        结果可写入缓存的provider及其模型，作为缓存键的一部分：同一组服务之间共享缓存，
+        启用的服务或模型变化后旧缓存自动失效
+        """
+        return ','.join(f"{p.name}:{p.model or ''}" for p in self.providers if p.cacheable)
+
+    def _score(self, provider):
+        state = self._state[provider.name]
+        latency = state.latency
+        if latency is None:
+            # 从未成功过的provider：没有失败过则优先尝试一次，否则按当前最慢的provider估计
+            sampled = [s.latency for s in self._state.values() if s.latency is not None]
+            latency = 0.0 if not state.errors else max(sampled, default=1.0)
+        return latency * (1 + state.in_flight) / max(0.05, 1.0 - state.error_rate)
+
+    def candidates(self, task):
+        """按优先级排列可用的provider：在线服务按得分排序，兜底服务排在最后，熔断中的在线服务被排除"""
+        usable = [p for p in self.providers
+                  if p.supports(task) and (p.fallback or self._breaker(p) is None or self._breaker(p).available())]
+        with self._lock:
+            primary = sorted((p for p in usable if not p.fallback), key=self._score)
+        # 少量请求随机探测其他provider，使长时间未被选中的provider的统计得以更新
+        if len(primary) > 1 and random.random() < self.explore_rate:
+            primary.insert(0, primary.pop(random.randrange(1, len(primary))))
+        return primary + [p for p in usable if p.fallback]
+
+    def _begin(self, provider):
+        with self._lock:
+            state = self._state[provider.name]
+            state.in_flight += 1
+            state.requests += 1
+
+    def _end(self, provider, elapsed=None, error=None):
+        """结束一次调用：记录延迟样本或错误，两者都为None时只减少进行中的请求数"""
+        with self._lock:
+            state = self._state[provider.name]
+            state.in_flight -= 1
+            if error is None and elapsed is None:
+                return
+            if error is not None:
+                state.errors += 1
+                state.last_error = str(error)
+                state.error_rate += self.alpha * (1.0 - state.error_rate)
+                return
+            state.error_rate -= self.alpha * state.error_rate
+            if state.latency is None:
+                state.latency = elapsed
+            else:
+                state.latency += self.alpha * (elapsed - state.latency)
+
+    def complete(self, task):
+        """依次尝试候选provider，返回第一个成功的Completion；启用对冲时第一个候选可能被对冲"""
+        candidates = self.candidates(task)
+        if self.hedge is not None and candidates and not candidates[0].fallback:
+            delay = self.hedge.delay(candidates[0].name)
+            if delay is not None:
+                return self._complete_hedged(task, candidates, delay)
+        return self._complete_failover(task, candidates)
+
+    def _breaker(self, provider):
+        """在线服务的熔断器，兜底服务不熔断"""
+        if self.breakers is None or provider.fallback:
+            return None
+        return self.breakers.get(provider.name)
+
+    def _check_breaker(self, provider):
+        """熔断中的服务立即失败，不占用并发名额；返回熔断器（不熔断时为None）"""
+        breaker = self._breaker(provider)
+        if breaker is not None and not breaker.allow():
+            raise ProviderError(f"{provider.name} 熔断中，暂不调用", provider.name, circuit_open=True)
+        return breaker
+
+    @staticmethod
+    def _settle(breaker, error=None, neutral=False):
+        if breaker is None:
+            return
+        if neutral:
+            breaker.record_neutral()
+        elif error is not None:
+            breaker.record_failure(error)
+        else:
+            breaker.record_success()
+
+    def _limiter(self, provider):
+        """在线服务的并发限制器，兜底服务不限制"""
+        if self.limits is None or provider.fallback:
+            return None
+        return self.limits.get(provider.name)
+
+    def _admit(self, provider, task):
+        """在provider的并发限制队列中排队，返回限制器（不限制时为None）"""
+        limiter = self._limiter(provider)
+        if limiter is not None:
+            try:
+                limiter.acquire(task.lane)
+            except QueueTimeout as e:
+                raise ProviderError(f"{provider.name} {str(e)}", provider.name) from e
+        return limiter
+
+    @staticmethod
+    def _release(limiter, task, elapsed=None, error=None):
+        if limiter is None:
+            return
+        if isinstance(error, ProviderError):
+            limiter.release(task.lane, overloaded=error.overloaded, retry_after=error.retry_after_seconds)
+        else:
+            limiter.release(task.lane, elapsed)
+
+    def _call(self, provider, task, cancel=None):
+        """检查熔断、排队后调用一个provider并记录统计，返回译文"""
+        breaker = self._check_breaker(provider)
+        try:
+            limiter = self._admit(provider, task)
+        except ProviderError:
+            self._settle(breaker, neutral=True)
+            raise
+        self._begin(provider)
+        start = time.monotonic()
+        try:
+            text = provider.complete(task, cancel)
+        except RequestCancelled:
+            self._end(provider)
+            self._release(limiter, task)
+            self._settle(breaker, neutral=True)
+            self._observe(provider, start, outcome='cancelled')
+            raise
+        except Exception as e:
+            self._end(provider, error=e)
+            self._release(limiter, task, error=e)
+            self._settle(breaker, e)
+            self._observe(provider, start, e)
+            raise
+        elapsed = time.monotonic() - start
+        self._observe(provider, start)
+        self._end(provider, elapsed)
+        self._release(limiter, task, elapsed)
+        self._settle(breaker)
+        if self.hedge is not None:
+            self.hedge.record(provider.name, elapsed)
+        return text
+
+    @staticmethod
+    def _observe(provider, start, error=None, outcome=None):
+        """记录一次上游调用的耗时指标，出错时同时按类别计数"""
+        if error is not None:
+            record_error('upstream', error)
+            outcome = error_class(error)
+        UPSTREAM_SECONDS.observe(time.monotonic() - start, (provider.name, provider.model or '', outcome or 'ok'))
+
+    def _complete_failover(self, task, candidates, last_error=None):
+        """
+        依次尝试在线服务；全部失败且有暂时性错误时，退避后只重试这些服务，
+        重试次数用完（或Retry-After过长、总耗时超限）后再尝试兜底服务
+        """
+        online = [p for p in candidates if not p.fallback]
+        start = time.monotonic()
+        attempt = 1
+        while online:
+            retryable = []
+            retry_after = None
+            for provider in online:
+                try:
+                    text = self._call(provider, task)
+                except Exception as e:
+                    print(f"{provider.name} 调用失败，尝试下一个服务: {str(e)}")
+                    last_error = e
+                    if self.retry is not None and self.retry.retryable(e):
+                        retryable.append(provider)
+                        if e.retry_after_seconds is not None:
+                            retry_after = max(retry_after or 0.0, e.retry_after_seconds)
+                    continue
+                return Completion(text, provider.name, provider.model, provider.cacheable)
+            if not retryable or attempt >= self.retry.max_attempts \
+                    or time.monotonic() - start >= self.retry.max_elapsed:
+                break
+            delay = self.retry.backoff(attempt, retry_after)
+            if delay is None:
+                print(f"Retry-After为 {retry_after:.0f}s，超过重试等待上限，不再重试")
+                break
+            print(f"{delay:.2f}s 后重试: {', '.join(p.name for p in retryable)}")
+            time.sleep(delay)
+            online = retryable
+            attempt += 1
+
+        for provider in candidates:
+            if not provider.fallback:
+                continue
+            try:
+                text = self._call(provider, task)
+            except Exception as e:
+                print(f"{provider.name} 调用失败: {str(e)}")
+                last_error = e
+                continue
+            return Completion(text, provider.name, provider.model, provider.cacheable)
+        raise last_error or ProviderError("没有可用的翻译服务")
+
+    def _complete_hedged(self, task, candidates, delay):
+        """主请求超过delay仍未返回时发出对冲请求，取先成功的结果并取消另一份"""
+        results = queue.Queue()
+        attempts = []
+
+        def launch(provider, hedged):
+            cancel = Cancellation()
+            attempts.append((provider, cancel, hedged))
+
+            def run():
+                try:
+                    results.put((provider, hedged, self._call(provider, task, cancel), None))
+                except Exception as e:
+                    results.put((provider, hedged, None, e))
+
+            threading.Thread(target=run, name=f'hedge-{provider.name}', daemon=True).start()
+
+        primary = candidates[0]
+        launch(primary, False)
+        pending = 1
+        try:
+            first = results.get(timeout=delay)
+        except queue.Empty:
+            first = None
+            if self.hedge.acquire():
+                # 优先对冲到另一个在线服务，只有一个在线服务时对冲到同一个服务
+                alternates = [p for p in candidates[1:] if not p.fallback]
+                target = alternates[0] if alternates else primary
+                print(f"{primary.name} 超过 {delay:.2f}s 未返回，向 {target.name} 发出对冲请求")
+                launch(target, True)
+                pending += 1
+
+        last_error = None
+        while pending:
+            provider, hedged, text, error = first if first is not None else results.get()
+            first = None
+            pending -= 1
+            if error is None:
+                if pending:
+                    # 取消仍在进行的另一份请求
+                    for _, cancel, other_hedged in attempts:
+                        if other_hedged != hedged:
+                            cancel.set()
+                    self.hedge.count("cancelled")
+                if hedged:
+                    self.hedge.count("hedge_wins")
+                return Completion(text, provider.name, provider.model, provider.cacheable)
+            print(f"{provider.name} 调用失败: {str(error)}")
+            last_error = error
+
+        # 已发出的请求都失败，按顺序尝试其余服务
+        tried = {provider.name for provider, _, _ in attempts}
+        return self._complete_failover(task, [p for p in candidates if p.name not in tried], last_error)
+
+    def stream(self, task, on_abort=None):
+        """
+        发起流式调用，返回(provider, 增量迭代器)；只在建立连接阶段切换provider，
+        输出开始后的错误从迭代器中抛出。on_abort见Provider.stream，中止的调用不计为失败
+        """
+        last_error = None
+        for provider in self.candidates(task):
+            try:
+                breaker = self._check_breaker(provider)
+            except ProviderError as e:
+                print(f"{provider.name} 熔断中，尝试下一个服务")
+                last_error = e
+                continue
+            try:
+                limiter = self._admit(provider, task)
+            except ProviderError as e:
+                self._settle(breaker, neutral=True)
+                print(f"{provider.name} 流式调用排队超时，尝试下一个服务: {str(e)}")
+                last_error = e
+                continue
+            self._begin(provider)
+            start = time.monotonic()
+            try:
+                deltas = provider.stream(task, on_abort)
+            except Exception as e:
+                self._end(provider, error=e)
+                self._release(limiter, task, error=e)
+                self._settle(breaker, e)
+                self._observe(provider, start, e)
+                print(f"{provider.name} 流式调用失败，尝试下一个服务: {str(e)}")
+                last_error = e
+                continue
+            return provider, self._track_stream(provider, deltas, start, limiter, task, breaker)
+        raise last_error or ProviderError("没有可用的翻译服务")
+
+    def _track_stream(self, provider, deltas, start, limiter, task, breaker):
+        """转发增量，结束时记录延迟或错误；客户端中途断开或调用被中止时不计入统计"""
+        error = None
+        completed = False
+        try:
+            for delta in deltas:
+                yield delta
+            completed = True
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            close = getattr(deltas, 'close', None)
+            if close is not None:
+                close()
+            if error is not None:
+                self._end(provider, error=error)
+            else:
+                self._end(provider, time.monotonic() - start if completed else None)
+            self._observe(provider, start, error, None if error is not None or completed else 'cancelled')
+            # 流式调用的耗时取决于译文长度，不作为并发上限的延迟信号
+            self._release(limiter, task, error=error)
+            self._settle(breaker, error, neutral=error is None and not completed)
+
+    def stats(self):
+        with self._lock:
+            providers = {
+                p.name: {
+                    "model": p.model,
+                    "fallback": p.fallback,
+                    "ewma_latency_seconds": round(self._state[p.name].latency, 4)
+                    if self._state[p.name].latency is not None else None,
+                    "ewma_error_rate": round(self._state[p.name].error_rate, 4),
+                    "in_flight": self._state[p.name].in_flight,
+                    "requests": self._state[p.name].requests,
+                    "errors": self._state[p.name].errors,
+                    "last_error": self._state[p.name].last_error,
+                    "score": round(self._score(p), 4)
+                }
+                for p in self.providers
+            }
+        return {
+            "providers": providers,
+            "hedging": self.hedge.stats() if self.hedge is not None else None,
+            "limits": self.limits.stats() if self.limits is not None else None,
+            "breakers": self.breakers.stats() if self.breakers is not None else None
+        }
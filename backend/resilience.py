@@ -0,0 +1,154 @@
+"""
+上游调用的重试与熔断
+- RetryPolicy: 只重试暂时性错误（超时、网络错误、5xx、429），重试间隔为带随机抖动的指数退避，
+  上游给出Retry-After时至少等待该时长，超过上限则不再重试
+- CircuitBreaker: 每个provider一个熔断器。连续失败达到阈值后打开，打开期间的调用立即失败（由路由切换到
+  其他服务或离线兜底），冷却时间过后放行一个探测请求（半开），探测成功则关闭，失败则重新打开
+"""
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def is_transient(error):
+    """暂时性错误：超时、网络错误、429和5xx，重试可能成功"""
+    if getattr(error, 'circuit_open', False):
+        return False
+    if getattr(error, 'timeout', False) or getattr(error, 'network', False):
+        return True
+    status_code = getattr(error, 'status_code', None)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def is_outage(error):
+    """说明服务不可用、应计入熔断的错误：除429（由并发限制处理）以外的暂时性错误，以及密钥无效"""
+    status_code = getattr(error, 'status_code', None)
+    if status_code == 429:
+        return False
+    return is_transient(error) or status_code in (401, 403)
+
+
+class RetryPolicy:
+    """带随机抖动的指数退避重试策略"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, max_retry_after=30.0, max_elapsed=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after  # Retry-After超过该值时放弃重试
+        self.max_elapsed = max_elapsed          # 从第一次调用起超过该时长后不再发起重试
+
+    def retryable(self, error):
+        return is_transient(error)
+
+    def backoff(self, attempt, retry_after=None):
+        """第attempt次重试前的等待秒数（full jitter），应放弃重试时返回None"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after:
+            if retry_after > self.max_retry_after:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker:
+    """单个provider的熔断器"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0           # 连续失败次数
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    def available(self):
+        """是否可能放行调用（不改变状态），用于路由时预先排除熔断中的服务"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.reset_timeout
+            return not self._probing
+
+    def allow(self):
+        """尝试放行一次调用；冷却结束后只放行一个探测请求"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                self._stats["probes"] += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print("熔断器关闭，服务已恢复")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self, error):
+        """记录一次失败；不属于服务不可用的错误（如请求内容错误）只结束探测，不计入连续失败"""
+        with self._lock:
+            if not is_outage(error):
+                self._release_probe()
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self._stats["opened"] += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def record_neutral(self):
+        """调用被取消或中途放弃，不影响熔断状态"""
+        with self._lock:
+            self._release_probe()
+
+    def _release_probe(self):
+        if self.state == HALF_OPEN and self._probing:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self.state
+            stats["consecutive_failures"] = self.failures
+            if self.state == OPEN:
+                stats["reopen_in_seconds"] = round(
+                    max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 2)
+        return stats
+
+
+class BreakerGroup:
+    """按provider名称创建和保存CircuitBreaker"""
+
+    def __init__(self, **options):
+        self.options = options
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(**self.options)
+            return breaker
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
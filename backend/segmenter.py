@@ -0,0 +1,193 @@
+"""
+长文本分段
+按段落和句子边界把原文切分成不超过token预算的片段（同时支持中文和西文标点），
+片段可并行翻译后按原顺序拼接
+"""
+import math
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# 中日韩字符（含全角标点），大致按每字符1个token估算
+CJK_RE = re.compile(r'[　-〿぀-ヿ㐀-䶿一-鿿가-힯豈-﫿＀-￯]')
+
+# 段落分隔：空行
+PARAGRAPH_SPLIT_RE = re.compile(r'(\n[ \t]*\n\s*)')
+
+# 句子：中文句末标点后直接断句，西文句末标点后需跟空白
+SENTENCE_RE = re.compile(
+    r'.+?(?:[。！？；…]+[”’」』）》]*|[.!?;]+[”’"\')\]]*(?=\s|$)|\n|$)\s*',
+    re.S
+)
+
+# 译文不使用空格分词的目标语言
+NO_SPACE_LANGS = ('zh', 'ja')
+
+# 片段：text为原文片段，separator为其后的段落分隔符（None表示与下一片段属于同一段落），
+# leading为第一个片段之前的空白（开头的空行、缩进），拼接译文时原样放在最前面
+Chunk = namedtuple('Chunk', ['text', 'separator', 'leading'], defaults=('',))
+
+
+def is_word_char(char):
+    """是否为西文单词字符（字母或数字，不含中日韩字符）"""
+    return char.isalnum() and not CJK_RE.match(char)
+
+
+def estimate_tokens(text):
+    """粗略估算token数：中日韩字符每字1个token，其他字符每4个字符1个token"""
+    if not text:
+        return 0
+    cjk = len(CJK_RE.findall(text))
+    return _tokens(cjk, len(text) - cjk)
+
+
+def _tokens(cjk, other):
+    """按中日韩字符数和其他字符数估算token数，与estimate_tokens一致"""
+    return cjk + math.ceil(other / 4)
+
+
+def split_sentences(paragraph):
+    """把段落切分成句子，保留句末空白"""
+    return [s for s in SENTENCE_RE.findall(paragraph) if s]
+
+
+def _hard_split(sentence, max_tokens):
+    """单句超出预算时按字符硬切，逐字累计字符数，不再对整个片段反复估算"""
+    pieces = []
+    start = 0
+    cjk = other = 0
+    for i, char in enumerate(sentence):
+        is_cjk = CJK_RE.match(char) is not None
+        if i > start and _tokens(cjk + is_cjk, other + (not is_cjk)) > max_tokens:
+            pieces.append(sentence[start:i])
+            start = i
+            cjk = other = 0
+        if is_cjk:
+            cjk += 1
+        else:
+            other += 1
+    if start < len(sentence):
+        pieces.append(sentence[start:])
+    return pieces
+
+
+def _split_paragraph(paragraph, max_tokens):
+    """把超长段落按句子合并成不超过预算的片段，累计当前片段的字符数"""
+    pieces = []
+    current = []
+    cjk = other = 0
+    for sentence in split_sentences(paragraph):
+        sentence_cjk = len(CJK_RE.findall(sentence))
+        sentence_other = len(sentence) - sentence_cjk
+        if _tokens(sentence_cjk, sentence_other) > max_tokens:
+            if current:
+                pieces.append(''.join(current))
+                current = []
+                cjk = other = 0
+            pieces.extend(_hard_split(sentence, max_tokens))
+            continue
+        if current and _tokens(cjk + sentence_cjk, other + sentence_other) > max_tokens:
+            pieces.append(''.join(current))
+            current = []
+            cjk = other = 0
+        current.append(sentence)
+        cjk += sentence_cjk
+        other += sentence_other
+    if current:
+        pieces.append(''.join(current))
+    return pieces
+
+
+def leading_space(text):
+    """原文开头的空白（与split_into_chunks记在第一个片段上的leading相同）"""
+    return text[:len(text) - len(text.lstrip())] if text.strip() else ''
+
+
+def split_into_chunks(text, max_tokens):
+    """把原文切分成片段列表，短文本直接返回单个片段；原文开头的空白记在第一个片段的leading上"""
+    leading = leading_space(text)
+    body = text[len(leading):]
+    if max_tokens <= 0 or estimate_tokens(body) <= max_tokens:
+        return [Chunk(body, None, leading)]
+
+    # 拆分为(段落, 分隔符)对
+    parts = PARAGRAPH_SPLIT_RE.split(body)
+    paragraphs = []
+    for i in range(0, len(parts), 2):
+        separator = parts[i + 1] if i + 1 < len(parts) else None
+        if parts[i]:
+            paragraphs.append((parts[i], separator))
+
+    chunks = []
+    current = ''
+    current_sep = None
+    for paragraph, separator in paragraphs:
+        if estimate_tokens(paragraph) > max_tokens:
+            if current:
+                chunks.append(Chunk(current, current_sep))
+                current = ''
+            pieces = _split_paragraph(paragraph, max_tokens)
+            for piece in pieces[:-1]:
+                chunks.append(Chunk(piece, None))
+            chunks.append(Chunk(pieces[-1], separator))
+            continue
+        candidate = current + (current_sep or '') + paragraph if current else paragraph
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(Chunk(current, current_sep))
+            current = paragraph
+        else:
+            current = candidate
+        current_sep = separator
+    if current:
+        chunks.append(Chunk(current, current_sep))
+    chunks[0] = chunks[0]._replace(leading=leading)
+    return chunks
+
+
+def chunk_joiner(chunk, target_lang):
+    """返回某个片段译文之后应拼接的分隔符"""
+    if chunk.separator is not None:
+        return chunk.separator
+    return '' if target_lang in NO_SPACE_LANGS else ' '
+
+
+def join_translations(chunks, translations, target_lang):
+    """按原顺序拼接各片段译文，开头的空白和段落之间的分隔符按原文保留"""
+    result = [chunks[0].leading] if chunks else []
+    last = len(chunks) - 1
+    for i, (chunk, translated) in enumerate(zip(chunks, translations)):
+        result.append(translated.strip())
+        if i < last:
+            result.append(chunk_joiner(chunk, target_lang))
+    return ''.join(result)
+
+
+class DeltaStripper:
+    """
+    让流式输出的片段译文与join_translations一致：去掉开头的空白，在第一段内容之前输出原文开头的空白leading，
+    结尾的空白先暂存，后面还有内容时再随之输出，片段结束时丢弃
+    """
+
+    def __init__(self, leading=''):
+        self._started = False
+        self._pending = leading
+
+    def push(self, delta):
+        """接收一段增量，返回可以输出的部分"""
+        if not self._started:
+            delta = delta.lstrip()
+            if not delta:
+                return ''
+            self._started = True
+        text = self._pending + delta
+        stripped = text.rstrip()
+        self._pending = text[len(stripped):]
+        return stripped
+
+
+def translate_chunks(chunks, translate_fn, max_workers):
+    """并发翻译所有片段，返回与片段顺序一致的结果列表；单个片段直接在当前线程执行"""
+    if len(chunks) == 1:
+        return [translate_fn(chunks[0].text)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        return list(executor.map(translate_fn, [chunk.text for chunk in chunks]))
@@ -0,0 +1,239 @@
+"""
+相同翻译请求的合并（single-flight）
+同一时刻有多个相同的请求（原文、语言、模型和提示相同，即缓存键相同）时，
+只有第一个请求（leader）调用上游，其余请求（follower）等待并共享它的结果：
+- SingleFlight: 非流式调用，follower阻塞等待leader的返回值或异常
+- StreamFlights: 流式调用，由后台线程读取上游并把增量广播给所有订阅者，
+  后加入的订阅者先收到已产生的前缀，再继续接收后续增量
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """按键合并并发的相同调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key, fn):
+        """执行fn()或等待正在执行的相同调用，返回(结果, 是否共享了其他请求的结果)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._stats["followers"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """SingleFlight的asyncio版本，供异步服务模式使用"""
+
+    def __init__(self):
+        self._calls = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    async def do(self, key, coro_fn):
+        future = self._calls.get(key)
+        if future is not None:
+            self._stats["followers"] += 1
+            # shield: 某个follower被取消时不影响leader和其他follower
+            return await asyncio.shield(future), True
+
+        self._stats["leaders"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await coro_fn()
+        except asyncio.CancelledError:
+            # leader的客户端断开时follower也随之取消
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有follower时避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class StreamBroadcast:
+    """一次上游流式调用的增量缓冲，支持多个订阅者各自从头读取"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._deltas = []
+        self._done = False
+        self._error = None
+        self.subscribers = 0
+        # 产生这次输出的上游模型，由生产者在开始输出前设置
+        self.model = None
+        # 所有订阅者都已离开时置位，生产者应尽快停止读取上游
+        self.cancelled = threading.Event()
+        self._cancel_callbacks = []
+
+    @property
+    def text(self):
+        with self._cond:
+            return ''.join(self._deltas)
+
+    def publish(self, delta):
+        with self._cond:
+            self._deltas.append(delta)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def on_cancel(self, callback):
+        """登记取消时的回调（如关闭上游连接，使阻塞在读取中的生产者立即返回），已取消时立即调用"""
+        with self._cond:
+            if not self.cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def attach(self):
+        """登记一个订阅者，随后应调用subscribe()读取；已被取消时返回False"""
+        with self._cond:
+            if self.cancelled.is_set():
+                return False
+            self.subscribers += 1
+            return True
+
+    def subscribe(self, poll_interval=None):
+        """
+        按顺序产出全部增量；加入时已产生的部分合并为一个增量先行产出。上游出错时抛出异常。
+        给出poll_interval时，超过该秒数没有新增量则产出None，调用方可借此发送心跳或检查时限；
+        poll_interval也可以是每次等待前调用、返回秒数（或None）的函数
+        """
+        index = 0
+        try:
+            while True:
+                timed_out = False
+                timeout = poll_interval() if callable(poll_interval) else poll_interval
+                with self._cond:
+                    while index == len(self._deltas) and not self._done:
+                        if not self._cond.wait(timeout):
+                            timed_out = True
+                            break
+                    new = self._deltas[index:]
+                    index += len(new)
+                    done = self._done and index == len(self._deltas)
+                    error = self._error
+                if new:
+                    yield ''.join(new)
+                elif timed_out:
+                    yield None
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            callbacks = []
+            with self._cond:
+                self.subscribers -= 1
+                if self.subscribers == 0 and not self._done:
+                    self.cancelled.set()
+                    callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+            for callback in callbacks:
+                callback()
+
+
+class StreamFlights:
+    """按键合并并发的相同流式调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {"leaders": 0, "followers": 0, "cancelled": 0}
+
+    def join(self, key, produce):
+        """
+        加入正在进行的相同流式调用，没有时启动新的调用。
+        produce(broadcast) 在后台线程中读取上游并调用broadcast.publish()，返回即表示完成。
+        返回(broadcast, 是否加入了已有调用)，调用方随后通过broadcast.subscribe()读取增量
+        """
+        with self._lock:
+            broadcast = self._flights.get(key)
+            if broadcast is not None and broadcast.attach():
+                self._stats["followers"] += 1
+                return broadcast, True
+            broadcast = self._flights[key] = StreamBroadcast()
+            broadcast.attach()
+            self._stats["leaders"] += 1
+
+        def run():
+            try:
+                produce(broadcast)
+                if broadcast.cancelled.is_set():
+                    with self._lock:
+                        self._stats["cancelled"] += 1
+                broadcast.finish()
+            except Exception as e:
+                broadcast.finish(e)
+            finally:
+                with self._lock:
+                    if self._flights.get(key) is broadcast:
+                        del self._flights[key]
+
+        threading.Thread(target=run, name='stream-flight', daemon=True).start()
+        return broadcast, False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+            stats["subscribers"] = sum(b.subscribers for b in self._flights.values())
+        return stats
@@ -0,0 +1,378 @@
+"""
+翻译记录的本地落盘队列（spool）
+Java后端不可用时，写入失败的记录追加到分段的JSONL文件中：
+- 多个写入方合并为一次fsync（group commit）
+- 当前分段超过大小上限后轮转到新分段
+- 回放线程在Java后端恢复后按批把记录重新发送，并用checkpoint文件记录进度，
+  已完整回放的分段会被删除
+- 每个spool目录由持有其排他文件锁的一个进程独占；多进程部署时，拿不到主目录锁的进程
+  改用自己的子目录 pid-<进程号>，进程退出后遗留的子目录由主目录的持有者并入主spool回放
+"""
+import fcntl
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+
+SEGMENT_PREFIX = 'spool-'
+SEGMENT_SUFFIX = '.jsonl'
+CHECKPOINT_FILE = 'checkpoint.json'
+LOCK_FILE = '.lock'
+PROCESS_DIR_PREFIX = 'pid-'
+
+
+class SpoolLocked(Exception):
+    """spool目录已被另一个进程持有"""
+
+
+def _segment_name(seq):
+    return f"{SEGMENT_PREFIX}{seq:010d}{SEGMENT_SUFFIX}"
+
+
+def _segment_seq(path):
+    name = os.path.basename(path)
+    return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+class RecordSpool:
+    """分段追加写入的JSONL记录队列"""
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, fsync_interval=0.01):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._dir_lock = self._lock_directory(directory)
+
+        self._lock = threading.Lock()
+        self._sync_cond = threading.Condition(self._lock)
+        self._syncing = False
+        self._written_seq = 0      # 已写入（未必已落盘）的追加序号
+        self._synced_seq = 0       # 已fsync的追加序号
+        self._stats = {"appended": 0, "replayed": 0, "fsyncs": 0, "rotations": 0, "corrupt_lines": 0}
+
+        segments = self._segments()
+        self._active_seq = segments[-1] if segments else 1
+        self._file = open(self._path(self._active_seq), 'ab')
+        self._active_size = self._file.tell()
+        self._terminate_torn_line()
+        self._checkpoint = self._load_checkpoint(segments)
+
+    @property
+    def position(self):
+        """当前回放进度 (分段序号, 字节偏移)"""
+        return self._checkpoint
+
+    @staticmethod
+    def _lock_directory(directory):
+        """对spool目录加排他锁，进程退出时由操作系统释放；已被其他进程持有时抛出SpoolLocked"""
+        lock_file = open(os.path.join(directory, LOCK_FILE), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise SpoolLocked(directory)
+        except OSError:
+            lock_file.close()
+            raise
+        return lock_file
+
+    def _path(self, seq):
+        return os.path.join(self.directory, _segment_name(seq))
+
+    def _segments(self):
+        pattern = os.path.join(self.directory, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+        return sorted(_segment_seq(path) for path in glob.glob(pattern))
+
+    def _terminate_torn_line(self):
+        """上次崩溃时最后一行可能只写了一半，补上换行，避免与新记录拼成一行"""
+        if not self._active_size:
+            return
+        with open(self._path(self._active_seq), 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+        self._file.write(b'\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._active_size += 1
+
+    def _load_checkpoint(self, segments):
+        """读取回放进度，(分段序号, 字节偏移)；没有checkpoint时从最早的分段开始"""
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['segment'], data['offset']
+        except (OSError, ValueError, KeyError):
+            return (segments[0] if segments else self._active_seq), 0
+
+    def _save_checkpoint(self, position):
+        """原子地写入checkpoint：先写临时文件再替换"""
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"segment": position[0], "offset": position[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def append(self, records):
+        """追加一批记录，返回时记录已落盘"""
+        data = b''.join(
+            json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n' for record in records
+        )
+        with self._lock:
+            if self._active_size and self._active_size + len(data) > self.segment_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._active_size += len(data)
+            self._written_seq += 1
+            my_seq = self._written_seq
+            self._stats["appended"] += len(records)
+            self._wait_synced(my_seq)
+
+    def _rotate(self):
+        """封存当前分段并打开新分段，调用方需持有锁"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced_seq = self._written_seq
+        self._file.close()
+        self._active_seq += 1
+        self._file = open(self._path(self._active_seq), 'ab')
+        self._active_size = 0
+        self._stats["rotations"] += 1
+
+    def _wait_synced(self, my_seq):
+        """group commit：一个写入方负责fsync，其他写入方等待覆盖自己的那次fsync，调用方需持有锁"""
+        while self._synced_seq < my_seq:
+            if self._syncing:
+                self._sync_cond.wait()
+                continue
+            self._syncing = True
+            # 短暂等待，让并发写入方把数据也写进来，合并到同一次fsync
+            if self.fsync_interval:
+                self._lock.release()
+                time.sleep(self.fsync_interval)
+                self._lock.acquire()
+            target = self._written_seq
+            file = self._file
+            try:
+                file.flush()
+                os.fsync(file.fileno())
+            finally:
+                self._syncing = False
+                self._synced_seq = max(self._synced_seq, target)
+                self._stats["fsyncs"] += 1
+                self._sync_cond.notify_all()
+
+    def read_batch(self, max_records):
+        """从checkpoint位置读取最多max_records条记录，返回(记录列表, 读取后的位置)"""
+        with self._lock:
+            self._file.flush()
+            active_seq = self._active_seq
+        seq, offset = self._checkpoint
+        records = []
+        while len(records) < max_records and seq <= active_seq:
+            path = self._path(seq)
+            if not os.path.exists(path):
+                seq, offset = seq + 1, 0
+                continue
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                while len(records) < max_records:
+                    line = f.readline()
+                    if not line:
+                        break
+                    if not line.endswith(b'\n'):
+                        # 活动分段中尚未写完的行留到下次读取；封存分段中的残缺行（崩溃导致）直接跳过
+                        if seq == active_seq:
+                            break
+                        self._stats["corrupt_lines"] += 1
+                        offset += len(line)
+                        continue
+                    offset += len(line)
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        self._stats["corrupt_lines"] += 1
+            if len(records) < max_records and seq < active_seq:
+                seq, offset = seq + 1, 0
+            else:
+                break
+        return records, (seq, offset)
+
+    def commit(self, position, count):
+        """确认回放到position为止的记录，删除已完整回放的分段"""
+        self._save_checkpoint(position)
+        previous = self._checkpoint[0]
+        self._checkpoint = position
+        self._stats["replayed"] += count
+        for seq in range(previous, position[0]):
+            try:
+                os.remove(self._path(seq))
+            except OSError:
+                pass
+
+    def pending_bytes(self):
+        """尚未回放的字节数"""
+        seq, offset = self._checkpoint
+        total = 0
+        for segment in self._segments():
+            if segment < seq:
+                continue
+            try:
+                size = os.path.getsize(self._path(segment))
+            except OSError:
+                continue
+            total += size - offset if segment == seq else size
+        return max(total, 0)
+
+    def import_legacy_backups(self, backup_dir):
+        """把旧版每条记录一个JSON文件的备份导入spool，导入后删除原文件"""
+        paths = sorted(glob.glob(os.path.join(backup_dir, 'translation_*.json')))
+        if not paths:
+            return 0
+        records = []
+        imported = []
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    records.append(json.load(f))
+                imported.append(path)
+            except (OSError, ValueError) as e:
+                # 无法解析的文件保留在原处
+                print(f"⚠️ 无法读取旧备份文件 {path}: {str(e)}")
+        if records:
+            self.append(records)
+        for path in imported:
+            os.remove(path)
+        print(f"已把 {len(records)} 条旧备份记录导入spool")
+        return len(records)
+
+    def adopt_orphans(self):
+        """把已退出进程遗留的 pid-* 子目录中未回放的记录并入本spool，并删除子目录；仍在使用的子目录跳过"""
+        adopted = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, f"{PROCESS_DIR_PREFIX}*"))):
+            if not os.path.isdir(path):
+                continue
+            try:
+                orphan = RecordSpool(path, self.segment_bytes, fsync_interval=0)
+            except SpoolLocked:
+                continue
+            except OSError as e:
+                print(f"⚠️ 无法打开遗留的spool目录 {path}: {str(e)}")
+                continue
+            try:
+                while True:
+                    records, position = orphan.read_batch(1000)
+                    if not records:
+                        break
+                    self.append(records)
+                    orphan.commit(position, len(records))
+                    adopted += len(records)
+            finally:
+                orphan.close()
+            shutil.rmtree(path, ignore_errors=True)
+        if adopted:
+            print(f"已把 {adopted} 条遗留的翻译记录并入spool {self.directory}")
+        return adopted
+
+    def close(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self._dir_lock.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active_segment"] = self._active_seq
+        stats["checkpoint"] = {"segment": self._checkpoint[0], "offset": self._checkpoint[1]}
+        stats["segments"] = len(self._segments())
+        stats["pending_bytes"] = self.pending_bytes()
+        return stats
+
+
+class SpoolReplayer:
+    """后台回放线程：按批把spool中的记录发送到Java后端，失败时指数退避"""
+
+    def __init__(self, spool, sink, batch_size=200, interval=5.0, max_backoff=300.0, adopt_orphans=False):
+        self.spool = spool
+        self.sink = sink
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        # 只有主spool目录的持有者负责并入其他进程遗留的子目录
+        self.adopt_orphans = adopt_orphans
+        self._stop = threading.Event()
+        self._backoff = interval
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name='spool-replayer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._backoff):
+            if self.adopt_orphans:
+                try:
+                    self.spool.adopt_orphans()
+                except OSError as e:
+                    print(f"⚠️ 并入遗留spool记录时出错: {str(e)}")
+            while not self._stop.is_set():
+                records, position = self.spool.read_batch(self.batch_size)
+                if not records:
+                    if position != self.spool.position:
+                        # 只跨过了空分段或残缺行，也需要推进进度
+                        self.spool.commit(position, 0)
+                    self._backoff = self.interval
+                    break
+                try:
+                    self.sink(records)
+                except Exception as e:
+                    # Java后端仍不可用，退避后再试
+                    self.last_error = str(e)
+                    self._backoff = min(self._backoff * 2, self.max_backoff)
+                    break
+                self.spool.commit(position, len(records))
+                self.last_error = None
+                print(f"✅ 已从spool回放 {len(records)} 条翻译记录")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(5)
+
+    def stats(self):
+        stats = self.spool.stats()
+        stats["replay_backoff_seconds"] = self._backoff
+        stats["replay_last_error"] = self.last_error
+        return stats
+
+
+def open_spool(directory, segment_bytes, fsync_interval, legacy_backup_dir=None):
+    """
+    打开spool目录，返回(spool, 是否为主目录)，目录为空或无法打开时返回(None, False)（禁用spool）。
+    主目录已被其他进程持有时改用本进程的 pid-<进程号> 子目录；
+    旧版备份文件和遗留子目录只由主目录的持有者导入
+    """
+    if not directory:
+        return None, False
+    primary = True
+    try:
+        try:
+            spool = RecordSpool(directory, segment_bytes, fsync_interval)
+        except SpoolLocked:
+            primary = False
+            process_dir = os.path.join(directory, f"{PROCESS_DIR_PREFIX}{os.getpid()}")
+            print(f"翻译记录spool {directory} 已被其他进程使用，本进程改用 {process_dir}")
+            spool = RecordSpool(process_dir, segment_bytes, fsync_interval)
+    except (OSError, SpoolLocked) as e:
+        print(f"无法打开翻译记录spool {directory}: {str(e)}，写入失败的记录将被丢弃")
+        return None, False
+    if primary:
+        if legacy_backup_dir and os.path.isdir(legacy_backup_dir):
+            spool.import_legacy_backups(legacy_backup_dir)
+        spool.adopt_orphans()
+    print(f"翻译记录spool: {spool.directory}，待回放 {spool.pending_bytes()} 字节")
+    return spool, primary
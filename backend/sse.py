@@ -0,0 +1,303 @@
+"""
+流式翻译的SSE事件编码，以及上游SSE响应的解码
+full模式（默认）：兼容原有协议，每个update事件同时携带增量和累积全文
+delta模式（客户端协商）：update事件只携带增量，在时间/字节窗口内合并细碎的token增量，
+并定期发送包含已发送字节数和CRC32校验值的checkpoint事件
+SSEDecoder：直接在字节块上增量切分上游SSE事件，不逐行解码成字符串；安装了orjson时用它解析事件JSON
+StreamDeadline：流式输出的空闲和总时长限制，配合HEARTBEAT及时发现已断开的客户端
+"""
+import asyncio
+import json
+import time
+import zlib
+from concurrent.futures import TimeoutError as FutureTimeout
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+STREAM_MODES = ('full', 'delta')
+
+# 解析上游事件JSON使用的函数（接受bytes），解析失败时抛出ValueError的子类
+json_loads = orjson.loads if orjson is not None else json.loads
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# 上游流结束标记
+DONE = b'[DONE]'
+
+# 心跳：SSE注释行，客户端解析时忽略；写入失败说明客户端已断开
+HEARTBEAT = ": keep-alive\n\n"
+
+
+def sse_event(data):
+    return f"data: {json.dumps(data)}\n\n"
+
+
+class StreamTimeout(Exception):
+    """流式输出超过空闲或总时长限制，reason为idle_timeout或total_timeout"""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+
+class StreamDeadline:
+    """流式输出的空闲（两次输出之间）和总时长限制，值为0时不限制"""
+
+    def __init__(self, idle_seconds, total_seconds):
+        self.idle_seconds = idle_seconds
+        self.total_seconds = total_seconds
+        self.started = self.last_activity = time.monotonic()
+
+    def touch(self):
+        """记录一次输出"""
+        self.last_activity = time.monotonic()
+
+    def check(self, idle=True):
+        """超出限制时抛出StreamTimeout；idle为False时只检查总时长（如等待并行片段时）"""
+        now = time.monotonic()
+        if self.total_seconds and now - self.started >= self.total_seconds:
+            raise StreamTimeout(f"流式翻译超过{self.total_seconds:g}秒的总时长限制", 'total_timeout')
+        if idle and self.idle_seconds and now - self.last_activity >= self.idle_seconds:
+            raise StreamTimeout(f"上游超过{self.idle_seconds:g}秒没有输出", 'idle_timeout')
+
+
+def wait_with_heartbeat(future, deadline, interval):
+    """
+    等待concurrent.futures.Future完成（用yield from取得结果），期间每隔interval秒产出一次心跳并检查总时长；
+    interval为0或None时直接阻塞等待
+    """
+    while True:
+        try:
+            return future.result(timeout=interval or None)
+        except FutureTimeout:
+            deadline.check(idle=False)
+            yield HEARTBEAT
+
+
+def parse_stream_mode(value):
+    """解析客户端请求的流式模式，未指定时为full，无法识别时返回None"""
+    if value is None or value == '':
+        return 'full'
+    return value if value in STREAM_MODES else None
+
+
+class StreamEncoder:
+    """把上游增量编码成SSE事件文本，push/flush/end_event返回的字符串可能包含零个或多个事件"""
+
+    def __init__(self, mode='full', window_ms=30, window_bytes=256, checkpoint_every=32):
+        self.mode = mode
+        self.window = window_ms / 1000.0
+        self.window_bytes = window_bytes
+        self.checkpoint_every = checkpoint_every
+        self._parts = []           # 已接收的全部增量，结束时再拼接，避免反复复制累积字符串
+        self._pending = []         # delta模式下尚未发送的增量
+        self._pending_bytes = 0
+        self._last_emit = 0.0
+        self._sent_bytes = 0       # delta模式下已发送内容的UTF-8字节数
+        self._crc = 0
+        self._events_since_checkpoint = 0
+        self.events = 0
+
+    @property
+    def text(self):
+        return ''.join(self._parts)
+
+    def start_event(self, **fields):
+        data = {'type': 'start'}
+        data.update(fields)
+        if self.mode == 'delta':
+            data['mode'] = 'delta'
+        self.events += 1
+        return sse_event(data)
+
+    def push(self, delta):
+        """接收一段上游增量"""
+        if not delta:
+            return ''
+        self._parts.append(delta)
+        if self.mode == 'full':
+            self.events += 1
+            return sse_event({'type': 'update', 'delta': delta, 'text': self.text})
+
+        encoded = delta.encode('utf-8')
+        self._pending.append(delta)
+        self._pending_bytes += len(encoded)
+        now = time.monotonic()
+        # 距上次发送已超过时间窗口（前沿触发），或累积字节数达到上限时立即发送；
+        # 其余增量由调用方在wait_timeout()秒内没有新增量时调用flush()发送（后沿触发）
+        if now - self._last_emit >= self.window or self._pending_bytes >= self.window_bytes:
+            return self.flush(now)
+        return ''
+
+    def wait_timeout(self, heartbeat=None):
+        """
+        等待下一个上游增量的最长秒数：有缓冲的增量时为当前时间窗口的剩余时间（到时由调用方flush），
+        否则为心跳间隔heartbeat（None表示一直等待）
+        """
+        if not self._pending:
+            return heartbeat
+        remaining = max(0.0, self._last_emit + self.window - time.monotonic())
+        return remaining if heartbeat is None else min(remaining, heartbeat)
+
+    def flush(self, now=None):
+        """发送delta模式下缓冲的增量，必要时附带checkpoint事件"""
+        if not self._pending:
+            return ''
+        chunk = ''.join(self._pending)
+        encoded = chunk.encode('utf-8')
+        self._pending = []
+        self._pending_bytes = 0
+        self._last_emit = now if now is not None else time.monotonic()
+        self._sent_bytes += len(encoded)
+        self._crc = zlib.crc32(encoded, self._crc)
+        self.events += 1
+        output = sse_event({'type': 'update', 'delta': chunk})
+
+        self._events_since_checkpoint += 1
+        if self.checkpoint_every and self._events_since_checkpoint >= self.checkpoint_every:
+            self._events_since_checkpoint = 0
+            self.events += 1
+            output += sse_event(self._checkpoint('checkpoint'))
+        return output
+
+    def _checkpoint(self, event_type):
+        return {'type': event_type, 'bytes': self._sent_bytes, 'crc32': self._crc}
+
+    def end_event(self, **extra):
+        """发送结束事件；full模式携带全文，delta模式携带总字节数和校验值"""
+        if self.mode == 'full':
+            data = {'type': 'end', 'text': self.text}
+            data.update(extra)
+            self.events += 1
+            return sse_event(data)
+        output = self.flush()
+        data = self._checkpoint('end')
+        data.update(extra)
+        self.events += 1
+        return output + sse_event(data)
+
+
+class SSEDecoder:
+    """
+    增量解析SSE字节流：feed()接收任意切分的字节块，返回其中已完整的事件的data内容（bytes，多行data以换行连接）。
+    跳过注释行（以':'开头）和没有data字段的事件，兼容\r\n和\r换行；
+    只有收到事件结尾的空行时才拼接缓冲区，单个事件跨很多个字节块时耗时仍与长度成正比
+    """
+
+    def __init__(self):
+        self._parts = []           # 尚未构成完整事件的字节块
+        self._pending_cr = False   # 上一块以\r结尾，需与下一块开头的\n合并判断
+
+    def feed(self, chunk):
+        if self._pending_cr:
+            chunk = b'\r' + chunk
+            self._pending_cr = False
+        if b'\r' in chunk:
+            if chunk.endswith(b'\r'):
+                chunk = chunk[:-1]
+                self._pending_cr = True
+            chunk = chunk.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        if not chunk:
+            return []
+        parts = self._parts
+        if b'\n\n' not in chunk and not (parts and chunk[:1] == b'\n' and parts[-1][-1:] == b'\n'):
+            parts.append(chunk)
+            return []
+        if parts:
+            parts.append(chunk)
+            chunk = b''.join(parts)
+        blocks = chunk.split(b'\n\n')
+        rest = blocks.pop()
+        self._parts = [rest] if rest else []
+        events = []
+        append = events.append
+        for block in blocks:
+            # 最常见的单行"data: ..."事件只做一次切片
+            if block[:6] == b'data: ' and b'\n' not in block:
+                append(block[6:])
+            elif block:
+                data = self._parse_block(block)
+                if data is not None:
+                    append(data)
+        return events
+
+    def finish(self):
+        """流结束时处理缓冲区中最后一个事件（兼容末尾缺少空行的上游）"""
+        rest = b''.join(self._parts)
+        self._parts = []
+        self._pending_cr = False
+        if not rest.strip():
+            return []
+        data = self._parse_block(rest.strip(b'\n'))
+        return [data] if data is not None else []
+
+    @staticmethod
+    def _parse_block(block):
+        lines = []
+        for line in block.split(b'\n'):
+            if not line or line[:1] == b':':
+                continue
+            field, _, value = line.partition(b':')
+            if field == b'data':
+                lines.append(value[1:] if value[:1] == b' ' else value)
+        return b'\n'.join(lines) if lines else None
+
+
+def iter_sse_data(chunks):
+    """从字节块的迭代器中依次产出各事件的data内容，遇到[DONE]时结束"""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if data == DONE:
+                return
+            yield data
+    for data in decoder.finish():
+        if data == DONE:
+            return
+        yield data
+
+
+async def aiter_sse_data(chunks):
+    """iter_sse_data的异步版本，chunks为异步字节块迭代器（如aiohttp的response.content.iter_any()）"""
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if data == DONE:
+                return
+            yield data
+    for data in decoder.finish():
+        if data == DONE:
+            return
+        yield data
+
+
+async def aiter_with_heartbeat(items, interval):
+    """
+    转发异步迭代器的产出，两次产出之间每隔interval秒产出一次None（供调用方发送心跳、检查时限），
+    interval为0或None时原样转发；interval也可以是每次等待前调用、返回秒数（或None）的函数。
+    等待期间不取消正在进行的读取，调用方停止迭代时才取消
+    """
+    if not interval:
+        async for item in items:
+            yield item
+        return
+    iterator = items.__aiter__()
+    while True:
+        pending = asyncio.ensure_future(iterator.__anext__())
+        try:
+            while True:
+                timeout = interval() if callable(interval) else interval
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if done:
+                    break
+                yield None
+        except BaseException:
+            pending.cancel()
+            raise
+        try:
+            item = pending.result()
+        except StopAsyncIteration:
+            return
+        yield item
@@ -0,0 +1,243 @@
+"""
+可续传的流式响应：事件编号与服务端回放缓冲
+- 每个流分配随机ID，发给客户端的每个SSE事件带有 id: <流ID>:<序号>（序号从1开始，心跳不编号）
+- 事件生成器在后台线程中运行，产出的事件写入回放缓冲；HTTP响应只是缓冲的订阅者。
+  客户端断线后带Last-Event-ID重连，从该序号之后继续读取正在进行（或刚结束）的流，不再调用上游
+- 所有订阅者都离开后继续生成grace秒等待重连，期间无人重连则关闭生成器（随之关闭上游连接）
+- 回放缓冲按字节计入内存：单个流超过上限时丢弃最早的事件，总量超过上限时先淘汰已结束的流；
+  流结束后保留ttl秒供重连回放
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+
+from sse import HEARTBEAT, sse_event
+
+
+class StreamGone(Exception):
+    """要续传的流不存在、已过期，或缺失的事件已被丢弃，客户端应重新发起翻译"""
+
+
+def parse_event_id(value):
+    """解析Last-Event-ID（<流ID>:<序号>），返回(流ID, 序号)，格式不正确时返回(None, None)"""
+    stream_id, sep, index = (value or '').strip().rpartition(':')
+    if not sep or not stream_id or not index.isdigit():
+        return None, None
+    return stream_id, int(index)
+
+
+class ReplayBuffer:
+    """一个流已产生的事件，条件变量与登记表共用一把锁，内存计数在同一把锁下更新"""
+
+    def __init__(self, stream_id, registry):
+        self.stream_id = stream_id
+        self._registry = registry
+        self._cond = threading.Condition(registry._lock)
+        self._events = deque()     # [(序号, 事件文本)]
+        self.last_index = 0        # 最后一个事件的序号
+        self.bytes = 0
+        self.done = False
+        self.evicted = False
+        self.finished_at = None
+        # 订阅者在响应开始读取时才登记；发起请求的响应开始读取之前同样按grace计时
+        self.subscribers = 0
+        self._left_at = time.monotonic()   # 最后一个订阅者离开（或流创建）的时间
+
+    def append(self, chunk):
+        """写入生成器产出的一段SSE文本：逐个事件编号，心跳等注释行不保存"""
+        events = [event for event in chunk.split('\n\n') if event and not event.startswith(':')]
+        if not events:
+            return
+        with self._cond:
+            if self.evicted:
+                return
+            for event in events:
+                self.last_index += 1
+                text = f"id: {self.stream_id}:{self.last_index}\n{event}\n\n"
+                self._events.append((self.last_index, text))
+                # 事件JSON按ASCII输出，字符数即字节数
+                self.bytes += len(text)
+                self._registry.bytes += len(text)
+            self._registry._trim(self)
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    def _drop_oldest(self):
+        """丢弃最早的一个事件，调用方持有锁"""
+        _, text = self._events.popleft()
+        self.bytes -= len(text)
+        self._registry.bytes -= len(text)
+        self._registry._stats["dropped_events"] += 1
+
+    def _missing(self, after):
+        """序号after之后的事件是否已有部分被丢弃，调用方持有锁"""
+        if self.evicted:
+            return after < self.last_index
+        first = self._events[0][0] if self._events else self.last_index + 1
+        return after + 1 < first
+
+    def abandoned(self, grace):
+        """所有订阅者都已离开超过grace秒"""
+        with self._cond:
+            return (not self.done and self.subscribers == 0 and
+                    time.monotonic() - self._left_at >= grace)
+
+    def subscribe(self, after=0, poll_interval=None):
+        """
+        按顺序产出序号after之后的事件文本（已有的事件合并产出），流结束后返回；缺失的事件已被丢弃时抛出StreamGone。
+        生成器开始执行时登记订阅者、结束时注销；客户端在响应开始读取前断开时生成器不会执行，不会留下订阅者。
+        给出poll_interval时，超过该秒数没有新事件则产出None，调用方可借此发送心跳
+        """
+        index = after
+        with self._cond:
+            self.subscribers += 1
+        try:
+            while True:
+                timed_out = False
+                with self._cond:
+                    while index == self.last_index and not self.done and not self.evicted:
+                        if not self._cond.wait(poll_interval):
+                            timed_out = True
+                            break
+                    if self._missing(index):
+                        raise StreamGone("流的部分事件已从回放缓冲中丢弃，请重新发起翻译")
+                    new = []
+                    if index < self.last_index:
+                        first = self._events[0][0]
+                        new = [text for _, text in islice(self._events, index + 1 - first, None)]
+                        index = self.last_index
+                    done = self.done
+                if new:
+                    yield ''.join(new)
+                elif timed_out:
+                    yield None
+                if done and index == self.last_index:
+                    return
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                if self.subscribers == 0:
+                    self._left_at = time.monotonic()
+
+
+class ReplayRegistry:
+    """按流ID保存回放缓冲，控制总内存和已结束流的保留时间"""
+
+    def __init__(self, max_bytes, stream_max_bytes, ttl, grace):
+        self.max_bytes = max_bytes
+        self.stream_max_bytes = stream_max_bytes
+        self.ttl = ttl
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._streams = OrderedDict()    # 按创建顺序
+        self.bytes = 0
+        self._stats = {"started": 0, "resumed": 0, "gone": 0, "abandoned": 0,
+                       "evicted_streams": 0, "dropped_events": 0}
+
+    def start(self, make_events):
+        """
+        新建一个流：make_events(stream_id)返回产出SSE文本的生成器，在后台线程中运行并写入回放缓冲。
+        返回ReplayBuffer；发起请求的响应读取时才登记为订阅者，grace秒内没有开始读取时停止生成
+        """
+        stream_id = secrets.token_urlsafe(12)
+        buffer = ReplayBuffer(stream_id, self)
+        with self._lock:
+            self._expire()
+            self._streams[stream_id] = buffer
+            self._stats["started"] += 1
+        events = make_events(stream_id)
+        threading.Thread(target=self._pump, args=(buffer, events), name='stream-replay', daemon=True).start()
+        return buffer
+
+    def resume(self, stream_id, after):
+        """
+        查找重连的客户端要续传的流，返回ReplayBuffer；流不存在或缺失的事件已被丢弃时抛出StreamGone。
+        同时重新开始grace计时，客户端在grace秒内开始读取（登记为订阅者）即可接上
+        """
+        with self._lock:
+            self._expire()
+            buffer = self._streams.get(stream_id)
+            if buffer is None or after > buffer.last_index or buffer._missing(after):
+                self._stats["gone"] += 1
+                raise StreamGone("流不存在或已过期，请重新发起翻译")
+            if buffer.subscribers == 0:
+                buffer._left_at = time.monotonic()
+            self._stats["resumed"] += 1
+            return buffer
+
+    def _pump(self, buffer, events):
+        try:
+            for chunk in events:
+                buffer.append(chunk)
+                # 生成器没有输出时也会定期产出心跳，借此检查是否已无人订阅
+                if buffer.abandoned(self.grace):
+                    print(f"流 {buffer.stream_id} 的客户端断开后 {self.grace:g} 秒内未重连，停止生成")
+                    with self._lock:
+                        self._stats["abandoned"] += 1
+                    break
+        except Exception as e:
+            print(f"流式事件生成出错: {str(e)}")
+            buffer.append(sse_event({'type': 'error', 'message': str(e)}))
+        finally:
+            events.close()
+            buffer.finish()
+
+    def _trim(self, buffer):
+        """写入事件后控制内存：单个流超限时丢弃其最早的事件；总量超限时先淘汰最早结束的流，调用方持有锁"""
+        while buffer.bytes > self.stream_max_bytes and len(buffer._events) > 1:
+            buffer._drop_oldest()
+        if self.bytes <= self.max_bytes:
+            return
+        for stream_id, other in list(self._streams.items()):
+            if self.bytes <= self.max_bytes:
+                return
+            if other.done:
+                self._evict(stream_id, other)
+        while self.bytes > self.max_bytes and len(buffer._events) > 1:
+            buffer._drop_oldest()
+
+    def _evict(self, stream_id, buffer):
+        self._remove(stream_id, buffer)
+        self._stats["evicted_streams"] += 1
+
+    def _remove(self, stream_id, buffer):
+        del self._streams[stream_id]
+        self.bytes -= buffer.bytes
+        buffer.bytes = 0
+        buffer._events.clear()
+        buffer.evicted = True
+        buffer._cond.notify_all()
+
+    def _expire(self):
+        """移除结束超过ttl秒的流，调用方持有锁"""
+        now = time.monotonic()
+        for stream_id, buffer in list(self._streams.items()):
+            if buffer.done and now - buffer.finished_at >= self.ttl:
+                self._remove(stream_id, buffer)
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            stats = dict(self._stats)
+            stats["streams"] = len(self._streams)
+            stats["running"] = sum(1 for b in self._streams.values() if not b.done)
+            stats["subscribers"] = sum(b.subscribers for b in self._streams.values())
+            stats["bytes"] = self.bytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+def follow(buffer, after=0, heartbeat=None):
+    """HTTP响应的事件生成器：读取回放缓冲中序号after之后的事件，没有新事件时发送心跳"""
+    try:
+        for events in buffer.subscribe(after, heartbeat):
+            yield HEARTBEAT if events is None else events
+    except StreamGone as e:
+        yield sse_event({'type': 'error', 'message': str(e)})
@@ -0,0 +1,149 @@
+"""
+翻译结果缓存
+进程内LRU+TTL缓存，缓存键由规范化文本、源/目标语言、模型和提示模板指纹组成
+可选接入磁盘存储层（见cache_store.py），作为多进程共享、重启后保留的二级缓存
+"""
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """规范化原文：统一Unicode形式和换行符，去掉首尾空白"""
+    text = unicodedata.normalize('NFC', text or '')
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text.strip()
+
+
+def prompt_fingerprint(messages, text):
+    """计算提示模板指纹：把消息中的原文替换成占位符后取哈希，
+    这样同一模板下不同原文的指纹相同，模板改动后旧缓存自动失效"""
+    digest = hashlib.sha256()
+    for message in messages:
+        content = message.get('content', '')
+        if text:
+            content = content.replace(text, '{text}')
+        digest.update(message.get('role', '').encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(content.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def make_cache_key(text, source_lang, target_lang, model, fingerprint):
+    """生成缓存键"""
+    parts = [normalize_text(text), source_lang or '', target_lang or '', model or '', fingerprint or '']
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """线程安全的LRU+TTL翻译缓存，max_entries为0时表示禁用缓存
+
+    store为可选的磁盘存储层：内存未命中时回查磁盘并提升到内存，
+    写入时同时写磁盘；创建时从磁盘预热最近使用的条目
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600, store=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._entries = OrderedDict()  # key -> (译文, 过期时间)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.store_hits = 0
+        self.warmed = 0
+        if self.enabled and self.store is not None:
+            self.warm_from_store()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """查询缓存，未命中或已过期返回None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+        # 内存未命中，回查磁盘存储
+        if self.store is not None:
+            found = self.store.get(key)
+            if found is not None:
+                value, created_at = found
+                with self._lock:
+                    self._put(key, value, created_at + self.ttl)
+                    self.hits += 1
+                    self.store_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if not self.enabled or not value:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put(key, value, expires_at)
+        if self.store is not None:
+            self.store.set(key, value)
+
+    def _put(self, key, value, expires_at):
+        """写入内存条目，调用方需持有锁"""
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def warm_from_store(self):
+        """从磁盘存储加载最近使用的条目，重新部署后命中率不从零开始"""
+        rows = self.store.recent_entries(self.max_entries)
+        with self._lock:
+            # 按访问时间从旧到新插入，保持LRU顺序
+            for key, value, created_at in reversed(rows):
+                self._put(key, value, created_at + self.ttl)
+            self.warmed = len(rows)
+        if rows:
+            print(f"已从磁盘缓存预热 {len(rows)} 条翻译结果")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """返回缓存统计信息"""
+        store_stats = self.store.stats() if self.store is not None else None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "store_hits": self.store_hits,
+                "warmed": self.warmed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "store": store_stats
+            }
@@ -0,0 +1,461 @@
+"""
+翻译记忆（translation memory）
+按语言对保存已翻译过的句子，重新提交的文档中未改动的句子直接复用译文：
+- 精确匹配：规范化原文（合并空白）的哈希
+- 模糊匹配：字符3-gram集合的MinHash签名，LSH分带索引找出候选，再按真实Jaccard相似度确认；
+  模糊命中的句子仍交给模型翻译，但相似句的原文和译文会作为参考放入提示，保持译法一致
+文档中未精确命中的句子按原文中相邻的片段，用接口本身的提示模板翻译；没有任何命中时不改变翻译方式
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from segmenter import NO_SPACE_LANGS, PARAGRAPH_SPLIT_RE, split_sentences
+from translation_cache import normalize_text
+
+SHINGLE_SIZE = 3
+NUM_PERM = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERM // BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _permutation(i):
+    digest = hashlib.sha256(f"tm-minhash-{i}".encode('utf-8')).digest()
+    a = int.from_bytes(digest[:8], 'big') % (_MERSENNE_PRIME - 1) + 1
+    b = int.from_bytes(digest[8:16], 'big') % _MERSENNE_PRIME
+    return a, b
+
+
+# 固定的哈希置换参数，保证重启后签名不变
+_PERMUTATIONS = [_permutation(i) for i in range(NUM_PERM)]
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 文档中的一个句子：text为去掉首尾空白的原文，tail为其后的空白或段落分隔符
+Segment = namedtuple('Segment', ['text', 'tail'])
+
+# 记忆命中：score为相似度（精确命中为1.0）
+Match = namedtuple('Match', ['source', 'target', 'score'])
+
+# 需要翻译的一段原文（相邻的未命中句子）：references为其中模糊命中的(句子, 相似原文, 译文)
+Span = namedtuple('Span', ['source', 'references'])
+
+# 借助翻译记忆翻译一篇文档的计划：positions为各句在原文中的位置，ranges为各段的(首句序号, 末句序号)
+MemoryPlan = namedtuple('MemoryPlan', ['text', 'positions', 'matches', 'ranges', 'spans', 'fuzzy_references'])
+
+
+def segment_key(text):
+    """精确匹配键：规范化并合并连续空白后取哈希"""
+    normalized = _WHITESPACE_RE.sub(' ', normalize_text(text))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def shingles(text):
+    """字符3-gram集合（忽略大小写和空白差异），同时适用于中日韩文本和西文"""
+    normalized = _WHITESPACE_RE.sub(' ', normalize_text(text)).lower()
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    """计算MinHash签名"""
+    values = [zlib.crc32(s.encode('utf-8')) for s in shingle_set]
+    return [min((a * x + b) % _MERSENNE_PRIME for x in values) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature):
+    """把签名分成BANDS段，每段哈希成一个桶号；两个签名只要有一段相同即为候选"""
+    return [
+        (band, zlib.crc32(struct.pack(f'>{ROWS_PER_BAND}Q',
+                                      *signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])))
+        for band in range(BANDS)
+    ]
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def split_segments(text):
+    """把文档切分成句子，保留句间空白和段落分隔符以便拼回译文"""
+    segments = []
+    parts = PARAGRAPH_SPLIT_RE.split(normalize_text(text))
+    for i in range(0, len(parts), 2):
+        separator = parts[i + 1] if i + 1 < len(parts) else ''
+        sentences = split_sentences(parts[i]) if parts[i] else []
+        for j, sentence in enumerate(sentences):
+            stripped = sentence.rstrip()
+            tail = sentence[len(stripped):]
+            if j == len(sentences) - 1:
+                tail = separator or tail
+            if stripped.strip():
+                segments.append(Segment(stripped.strip(), tail))
+    return segments
+
+
+class TranslationMemory:
+    """SQLite（WAL模式）翻译记忆库，多进程共享"""
+
+    # 每写入多少条检查一次容量
+    CHECK_INTERVAL = 256
+
+    def __init__(self, path, fuzzy_threshold=0.7, max_segments=500000):
+        self.path = path
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_segments = max_segments
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        self._stats = {"lookups": 0, "exact_hits": 0, "fuzzy_hits": 0, "added": 0, "evicted": 0, "errors": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _conn(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tm_segments (
+                id INTEGER PRIMARY KEY,
+                pair TEXT NOT NULL,
+                source_key TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (pair, source_key)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tm_lsh (
+                pair TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                segment_id INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tm_lsh_bucket ON tm_lsh(pair, band, bucket)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tm_lsh_segment ON tm_lsh(segment_id)")
+
+    @staticmethod
+    def _pair(source_lang, target_lang):
+        return f"{source_lang or 'auto'}>{target_lang or ''}"
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def lookup(self, texts, source_lang, target_lang):
+        """批量精确匹配，返回与texts等长的列表，命中位置为Match，其余为None"""
+        pair = self._pair(source_lang, target_lang)
+        keys = [segment_key(text) for text in texts]
+        found = {}
+        try:
+            conn = self._conn()
+            unique = list(set(keys))
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                for row_id, key, source, target in conn.execute(
+                        f"SELECT id, source_key, source, target FROM tm_segments "
+                        f"WHERE pair = ? AND source_key IN ({placeholders})", [pair] + batch):
+                    found[key] = (row_id, Match(source, target, 1.0))
+            if found:
+                conn.executemany("UPDATE tm_segments SET hit_count = hit_count + 1 WHERE id = ?",
+                                 [(row_id,) for row_id, _ in found.values()])
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"查询翻译记忆失败: {str(e)}")
+            return [None] * len(texts)
+        matches = [found[key][1] if key in found else None for key in keys]
+        self._count("lookups", len(texts))
+        self._count("exact_hits", sum(1 for m in matches if m is not None))
+        return matches
+
+    def get(self, text, source_lang, target_lang):
+        """单条精确匹配，返回译文或None"""
+        match = self.lookup([text], source_lang, target_lang)[0]
+        return match.target if match is not None else None
+
+    def fuzzy(self, text, source_lang, target_lang):
+        """模糊匹配：返回Jaccard相似度最高且不低于阈值的Match，没有时返回None"""
+        pair = self._pair(source_lang, target_lang)
+        query = shingles(text)
+        if not query:
+            return None
+        buckets = lsh_buckets(minhash(query))
+        try:
+            conn = self._conn()
+            condition = ' OR '.join('(band = ? AND bucket = ?)' for _ in buckets)
+            params = [pair] + [value for bucket in buckets for value in bucket]
+            rows = conn.execute(
+                f"SELECT source, target FROM tm_segments WHERE id IN ("
+                f"SELECT DISTINCT segment_id FROM tm_lsh WHERE pair = ? AND ({condition}) LIMIT 50)",
+                params
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"模糊查询翻译记忆失败: {str(e)}")
+            return None
+        best = None
+        for source, target in rows:
+            score = jaccard(query, shingles(source))
+            if score >= self.fuzzy_threshold and (best is None or score > best.score):
+                best = Match(source, target, round(score, 4))
+        if best is not None:
+            self._count("fuzzy_hits")
+        return best
+
+    def add(self, pairs, source_lang, target_lang):
+        """写入(原文, 译文)列表；原文已存在时更新译文"""
+        pair = self._pair(source_lang, target_lang)
+        now = time.time()
+        added = 0
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for source, target in pairs:
+                    source = source.strip()
+                    target = (target or '').strip()
+                    if not source or not target:
+                        continue
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO tm_segments (pair, source_key, source, target, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (pair, segment_key(source), source, target, now)
+                    )
+                    if cursor.rowcount:
+                        conn.executemany(
+                            "INSERT INTO tm_lsh (pair, band, bucket, segment_id) VALUES (?, ?, ?, ?)",
+                            [(pair, band, bucket, cursor.lastrowid)
+                             for band, bucket in lsh_buckets(minhash(shingles(source)))]
+                        )
+                        added += 1
+                    else:
+                        conn.execute(
+                            "UPDATE tm_segments SET target = ?, created_at = ? WHERE pair = ? AND source_key = ?",
+                            (target, now, pair, segment_key(source))
+                        )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"写入翻译记忆失败: {str(e)}")
+            return 0
+
+        self._count("added", added)
+        with self._lock:
+            self._writes_since_check += added
+            should_check = self._writes_since_check >= self.CHECK_INTERVAL
+            if should_check:
+                self._writes_since_check = 0
+        if should_check:
+            self.enforce_limits()
+        return added
+
+    def enforce_limits(self):
+        """超出条数上限时删除命中最少、最旧的句子（淘汰到上限的90%）"""
+        try:
+            conn = self._conn()
+            count = conn.execute("SELECT COUNT(*) FROM tm_segments").fetchone()[0]
+            if count <= self.max_segments:
+                return
+            victims = conn.execute(
+                "SELECT id FROM tm_segments ORDER BY hit_count ASC, created_at ASC LIMIT ?",
+                (count - int(self.max_segments * 0.9),)
+            ).fetchall()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM tm_lsh WHERE segment_id = ?", victims)
+            conn.executemany("DELETE FROM tm_segments WHERE id = ?", victims)
+            conn.execute("COMMIT")
+            self._count("evicted", len(victims))
+            print(f"翻译记忆淘汰 {len(victims)} 个句子")
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"翻译记忆容量检查失败: {str(e)}")
+
+    def stats(self):
+        try:
+            segments = self._conn().execute("SELECT COUNT(*) FROM tm_segments").fetchone()[0]
+        except sqlite3.Error:
+            segments = None
+        with self._lock:
+            stats = dict(self._stats)
+        stats["path"] = self.path
+        stats["segments"] = segments
+        stats["exact_hit_rate"] = round(stats["exact_hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+        return stats
+
+
+def _locate_segments(text, segments):
+    """返回各句在原文中的(起, 止)位置；规范化改变了原文（如换行符、Unicode组合）而无法定位时返回None"""
+    positions = []
+    pos = 0
+    for segment in segments:
+        start = text.find(segment.text, pos)
+        if start < 0:
+            return None
+        pos = start + len(segment.text)
+        positions.append((start, pos))
+    return positions
+
+
+def _gap(text, target_lang):
+    """两部分译文之间的分隔：含换行时原样保留（包括缩进），同一行内按目标语言决定是否加空格"""
+    if '\n' in text:
+        return text
+    return '' if target_lang in NO_SPACE_LANGS else ' '
+
+
+def align_segments(source_text, translated_text):
+    """
+    把原文和译文按句对齐：两者切分出的句子数相同时逐句配对，返回(原文句, 译文句)列表；
+    句数不同（合并或拆分了句子）时无法可靠对齐，返回空列表
+    """
+    sources = split_segments(source_text)
+    targets = split_segments(translated_text)
+    if not sources or len(sources) != len(targets):
+        return []
+    return [(source.text, target.text) for source, target in zip(sources, targets)]
+
+
+def learn_translation(memory, source_text, translated_text, source_lang, target_lang):
+    """把一次翻译中能按句对齐的句子写入翻译记忆，返回写入的句数"""
+    pairs = align_segments(source_text, translated_text)
+    if pairs:
+        memory.add(pairs, source_lang, target_lang)
+    return len(pairs)
+
+
+def plan_with_memory(memory, text, source_lang, target_lang):
+    """
+    查询翻译记忆并确定需要翻译的部分：精确命中的句子直接复用，相邻的未命中句子合成一段原文（MemoryPlan.spans），
+    每段附带其中模糊命中的(句子, 相似原文, 译文)参考。
+    文档少于两个句子、既无精确命中也无模糊命中或无法定位句子时返回None（由调用方按普通方式翻译）
+    """
+    segments = split_segments(text)
+    if len(segments) < 2:
+        return None
+    sources = [segment.text for segment in segments]
+    matches = memory.lookup(sources, source_lang, target_lang)
+    references = {}
+    for i, match in enumerate(matches):
+        if match is None:
+            reference = memory.fuzzy(sources[i], source_lang, target_lang)
+            if reference is not None:
+                references[i] = (sources[i], reference.source, reference.target)
+    if all(match is None for match in matches) and not references:
+        return None
+    positions = _locate_segments(text, segments)
+    if positions is None:
+        return None
+
+    # 相邻的未命中句子合并为一段：(首句序号, 末句序号)
+    ranges = []
+    for i, match in enumerate(matches):
+        if match is not None:
+            continue
+        if ranges and ranges[-1][1] == i - 1:
+            ranges[-1] = (ranges[-1][0], i)
+        else:
+            ranges.append((i, i))
+    spans = [
+        Span(text[positions[first][0]:positions[last][1]],
+             [references[i] for i in range(first, last + 1) if i in references])
+        for first, last in ranges
+    ]
+    return MemoryPlan(text, positions, matches, ranges, spans, len(references))
+
+
+def finish_with_memory(memory, plan, results, source_lang, target_lang):
+    """
+    按原文拼接记忆命中的译文和各段的翻译结果results（与plan.spans对应的(译文, 是否命中缓存)），
+    句子之间的换行和缩进按原文保留；能按句对齐的新译文写回记忆。返回(译文, 统计信息)
+    """
+    text, positions = plan.text, plan.positions
+    learned = []
+    span_text = {}
+    for (first, _), span, (translated, _) in zip(plan.ranges, plan.spans, results):
+        span_text[first] = translated.strip()
+        learned.extend(align_segments(span.source, translated))
+    if learned:
+        memory.add(learned, source_lang, target_lang)
+
+    parts = [text[:positions[0][0]]]
+    span_ends = dict(plan.ranges)
+    i = 0
+    while i < len(positions):
+        if i > 0:
+            parts.append(_gap(text[positions[i - 1][1]:positions[i][0]], target_lang))
+        if i in span_text:
+            parts.append(span_text[i])
+            i = span_ends[i] + 1
+        else:
+            parts.append(plan.matches[i].target)
+            i += 1
+
+    novel = sum(last - first + 1 for first, last in plan.ranges)
+    stats = {
+        "segments": len(positions),
+        "memory_hits": len(positions) - novel,
+        "fuzzy_references": plan.fuzzy_references,
+        "translated": novel,
+        "spans": len(plan.spans),
+        "cached": all(cached for _, cached in results)
+    }
+    return ''.join(parts), stats
+
+
+def translate_with_memory(memory, text, source_lang, target_lang, translate_span, parallelism=4):
+    """
+    借助翻译记忆翻译文档（见plan_with_memory/finish_with_memory）：各段未命中的原文由translate_span(原文, 参考)
+    按接口本身的翻译方式（提示模板、缓存、切分）并行翻译，返回(译文, 是否命中缓存)。
+    不使用翻译记忆时返回None，否则返回(译文, 统计信息)
+    """
+    plan = plan_with_memory(memory, text, source_lang, target_lang)
+    if plan is None:
+        return None
+    if len(plan.spans) > 1:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(plan.spans)))) as executor:
+            results = list(executor.map(lambda span: translate_span(span.source, span.references), plan.spans))
+    else:
+        results = [translate_span(span.source, span.references) for span in plan.spans]
+    return finish_with_memory(memory, plan, results, source_lang, target_lang)
+
+
+def open_memory(path, fuzzy_threshold, max_segments):
+    """打开翻译记忆库，路径为空或打开失败时返回None（禁用翻译记忆）"""
+    if not path:
+        return None
+    try:
+        memory = TranslationMemory(path, fuzzy_threshold, max_segments)
+        print(f"翻译记忆已启用: {path}")
+        return memory
+    except (sqlite3.Error, OSError) as e:
+        print(f"无法打开翻译记忆库 {path}: {str(e)}，已禁用翻译记忆")
+        return None
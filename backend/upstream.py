@@ -0,0 +1,142 @@
+"""
+上游HTTP客户端
+LLM接口和Java后端的所有调用共享同一个requests.Session，按主机划分连接池并保持keep-alive，
+避免每次翻译都重新进行TCP+TLS握手；支持启动时预热连接和连接池使用统计
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def host_prefix(url):
+    """提取URL的 scheme://host[:port] 部分"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class UpstreamClient:
+    """带按主机连接池的共享上游客户端"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=20, pool_block=False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.session = requests.Session()
+        self._default_adapter = self._make_adapter(pool_maxsize)
+        self.session.mount('http://', self._default_adapter)
+        self.session.mount('https://', self._default_adapter)
+        self._adapters = {}  # 主机前缀 -> 专用HTTPAdapter
+        self._host_stats = {}
+        self._lock = threading.Lock()
+
+    def _make_adapter(self, maxsize):
+        return HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=maxsize,
+            pool_block=self.pool_block,
+            max_retries=0
+        )
+
+    def register_host(self, url, pool_maxsize=None):
+        """为某个上游主机挂载独立的连接池，可单独设置池大小"""
+        if not url:
+            return None
+        prefix = host_prefix(url)
+        with self._lock:
+            if prefix not in self._adapters:
+                adapter = self._make_adapter(pool_maxsize or self.pool_maxsize)
+                self._adapters[prefix] = adapter
+                self.session.mount(prefix, adapter)
+        return prefix
+
+    def _stats_for(self, prefix):
+        stats = self._host_stats.get(prefix)
+        if stats is None:
+            stats = self._host_stats[prefix] = {
+                "requests": 0,
+                "errors": 0,
+                "in_flight": 0,
+                "max_in_flight": 0,
+                "total_seconds": 0.0
+            }
+        return stats
+
+    def request(self, method, url, **kwargs):
+        """发送请求，统计每个主机的请求数、并发数和耗时（流式请求统计到收到响应头为止）"""
+        prefix = host_prefix(url)
+        with self._lock:
+            stats = self._stats_for(prefix)
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        start = time.time()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                stats["in_flight"] -= 1
+                stats["total_seconds"] += time.time() - start
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def prewarm(self, urls, connections=2, timeout=5):
+        """在后台线程中预先建立连接，任何HTTP响应（包括404）都会让连接进入连接池"""
+        def warm(url):
+            try:
+                response = self.request('HEAD', host_prefix(url) + '/', timeout=timeout)
+                response.close()
+            except requests.exceptions.RequestException as e:
+                print(f"预热连接失败 {host_prefix(url)}: {str(e)}")
+
+        def run():
+            threads = []
+            for url in urls:
+                if not url:
+                    continue
+                for _ in range(connections):
+                    thread = threading.Thread(target=warm, args=(url,), daemon=True)
+                    thread.start()
+                    threads.append(thread)
+            for thread in threads:
+                thread.join()
+            print(f"上游连接预热完成: {', '.join(host_prefix(u) for u in urls if u)}")
+
+        if connections > 0:
+            threading.Thread(target=run, daemon=True).start()
+
+    def stats(self):
+        """返回每个主机的连接池使用情况"""
+        adapters = [self._default_adapter] + list(self._adapters.values())
+        pools = {}
+        for adapter in adapters:
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                prefix = f"{pool.scheme}://{pool.host}:{pool.port}"
+                idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+                pools[prefix] = {
+                    "maxsize": pool.pool.maxsize if pool.pool else 0,
+                    "idle_connections": idle,
+                    "connections_created": pool.num_connections,
+                    "requests_sent": pool.num_requests
+                }
+        with self._lock:
+            hosts = {}
+            for prefix, stats in self._host_stats.items():
+                hosts[prefix] = dict(stats)
+                done = stats["requests"] - stats["in_flight"]
+                hosts[prefix]["avg_seconds"] = round(stats["total_seconds"] / done, 4) if done else 0.0
+                hosts[prefix]["total_seconds"] = round(stats["total_seconds"], 3)
+        return {"pools": pools, "hosts": hosts}
@@ -0,0 +1,911 @@
+"""
+Flask版翻译服务的共用实现
+app.py（首选DeepSeek）和app_llm.py（首选ChatGLM）只是两个入口：create_app(profile)按入口的配置
+创建翻译缓存、翻译服务路由、写入队列等组件并注册全部接口，两者只在首选服务、模型环境变量和
+流式接口的提示模板上不同
+"""
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+from flask_cors import CORS
+
+import config
+import metrics
+from batching import build_batch_messages, translate_batch
+from cache_store import open_store
+from hedging import HedgePolicy
+from history_writer import HistoryWriter, JavaBackendSink, make_record
+from jobs import JobQueueFull, open_jobs
+from language_detect import is_entirely_in, resolve_batch_source_lang, resolve_source_lang
+from limiter import LimiterGroup
+from metrics import STAGE_SECONDS, STREAMS_CANCELLED, record_error, track_stream
+from prompt_builder import TokenBudget, build_messages
+from providers import ProviderRouter, RequestCancelled, TranslationTask, providers_from_env
+from resilience import BreakerGroup, RetryPolicy
+from segmenter import DeltaStripper, chunk_joiner, join_translations, split_into_chunks, translate_chunks
+from singleflight import SingleFlight, StreamFlights
+from spool import SpoolReplayer, open_spool
+from sse import HEARTBEAT, StreamDeadline, StreamEncoder, StreamTimeout, parse_stream_mode, wait_with_heartbeat
+from stream_replay import ReplayRegistry, StreamGone, follow, parse_event_id
+from translation_cache import TranslationCache, make_cache_key, prompt_fingerprint
+from translation_memory import learn_translation, open_memory, translate_with_memory
+from upstream import UpstreamClient
+
+# 入口配置：首选服务的环境变量名和默认值、TRANSLATION_PROVIDERS为空时的服务顺序、流式接口使用的提示模板
+AppProfile = namedtuple('AppProfile', [
+    'api_key_env', 'api_url_env', 'model_env', 'default_api_url', 'default_model', 'default_providers',
+    'stream_style'
+])
+
+
+def create_app(profile):
+    """创建Flask应用；每个进程只应调用一次（组件中包含后台线程和全局指标收集器）"""
+    app = Flask(__name__)
+    # 配置JSON响应不转义中文字符
+    app.config['JSON_AS_ASCII'] = False
+    # 为所有路由启用CORS，允许任何来源访问API
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+
+    # 加载.env文件中的配置
+    dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+    if os.path.exists(dotenv_path):
+        load_dotenv(dotenv_path)
+        print(f"已加载环境变量: {dotenv_path}")
+    else:
+        print("警告: 未找到.env文件")
+
+    api_key = os.getenv(profile.api_key_env)
+    api_url = os.getenv(profile.api_url_env, profile.default_api_url)
+    default_model = os.getenv(profile.model_env, profile.default_model)
+    print(f"API配置状态: {'已配置' if api_key else '未配置'}")
+    print(f"使用模型: {default_model}")
+    print(f"API基础URL: {api_url}")
+
+    # 翻译结果缓存
+    cache_store = open_store(config.CACHE_DB_PATH, config.CACHE_DB_MAX_MB * 1024 * 1024,
+                             config.CACHE_TTL_SECONDS, config.CACHE_DB_POLICY)
+    translation_cache = TranslationCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS, cache_store)
+    # 句子级翻译记忆：重新提交的文档中已翻译过的句子直接复用
+    translation_memory = open_memory(config.TM_DB_PATH, config.TM_FUZZY_THRESHOLD, config.TM_MAX_SEGMENTS)
+    # 合并并发的相同翻译请求，只有第一个请求调用上游
+    inflight = SingleFlight()
+    stream_flights = StreamFlights()
+    # 可续传流式翻译的回放缓冲：客户端断线后带Last-Event-ID重连，从缓冲中接着输出
+    stream_replay = ReplayRegistry(
+        config.STREAM_REPLAY_MAX_MB * 1024 * 1024, config.STREAM_REPLAY_STREAM_KB * 1024,
+        config.STREAM_REPLAY_TTL, config.STREAM_RESUME_GRACE
+    ) if config.STREAM_REPLAY_MAX_MB > 0 else None
+
+    # 共享上游连接池：LLM接口和Java后端各自使用独立的keep-alive连接池
+    java_backend_url = os.getenv('JAVA_BACKEND_URL', 'http://localhost:8080/api/translations')
+    upstream = UpstreamClient(config.UPSTREAM_POOL_CONNECTIONS, config.UPSTREAM_POOL_MAXSIZE)
+
+    # 上游token预算：按原文长度和目标语言确定每次调用的max_tokens，并按上游返回的usage校准估算
+    token_budget = TokenBudget(config.MODEL_CONTEXT_TOKENS, config.MAX_OUTPUT_TOKENS, config.MIN_OUTPUT_TOKENS,
+                               config.OUTPUT_TOKEN_SAFETY)
+
+    # 翻译服务路由：每次调用按实时延迟、错误率和进行中请求数选择服务，失败时切换到下一个
+    router = ProviderRouter(
+        providers_from_env(upstream, config.TRANSLATION_PROVIDERS or profile.default_providers,
+                           (config.UPSTREAM_CONNECT_TIMEOUT, config.UPSTREAM_READ_TIMEOUT), token_budget),
+        config.ROUTER_EWMA_ALPHA, config.ROUTER_EXPLORE_RATE,
+        hedge=HedgePolicy(config.HEDGE_PERCENTILE, config.HEDGE_MIN_DELAY_MS / 1000.0, config.HEDGE_MIN_SAMPLES,
+                          budget_ratio=config.HEDGE_BUDGET_RATIO) if config.HEDGE_ENABLED else None,
+        # 每个服务的自适应并发上限，超出时按优先级排队：流式翻译 > 普通翻译 > 批量翻译
+        limits=LimiterGroup(initial=config.LIMITER_INITIAL, min_limit=config.LIMITER_MIN,
+                            max_limit=config.LIMITER_MAX,
+                            queue_timeout=config.LIMITER_QUEUE_TIMEOUT) if config.LIMITER_ENABLED else None,
+        # 暂时性错误退避重试；连续失败的服务熔断，请求直接切换到其他服务或离线兜底
+        retry=RetryPolicy(config.RETRY_MAX_ATTEMPTS, config.RETRY_BASE_DELAY_MS / 1000.0, config.RETRY_MAX_DELAY,
+                          max_elapsed=config.RETRY_MAX_ELAPSED),
+        breakers=BreakerGroup(failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+                              reset_timeout=config.BREAKER_RESET_TIMEOUT)
+        if config.BREAKER_FAILURE_THRESHOLD > 0 else None
+    )
+    print(f"启用的翻译服务: {', '.join(p.name for p in router.providers) or '无'}")
+    provider_hosts = [host for p in router.providers for host in p.hosts()]
+    for host in provider_hosts + [java_backend_url]:
+        upstream.register_host(host)
+    upstream.prewarm(provider_hosts + [java_backend_url], config.UPSTREAM_PREWARM_CONNECTIONS)
+
+    # 翻译记录后台批量写入Java后端，请求线程只负责入队；
+    # 写入失败或队列已满的记录追加到本地spool，Java后端恢复后由回放线程重新发送
+    history_sink = JavaBackendSink(upstream, java_backend_url)
+    record_spool, spool_primary = open_spool(
+        config.SPOOL_DIR, config.SPOOL_SEGMENT_MB * 1024 * 1024, config.SPOOL_FSYNC_MS / 1000.0,
+        legacy_backup_dir=os.path.join(os.path.dirname(__file__), 'translation_backups')
+    )
+    spool_replayer = SpoolReplayer(
+        record_spool, history_sink, config.SPOOL_REPLAY_BATCH, config.SPOOL_REPLAY_INTERVAL,
+        adopt_orphans=spool_primary
+    ) if record_spool else None
+
+    def save_to_backup_file(records):
+        """Java后端写入失败时，把翻译记录追加到本地spool，等待回放"""
+        if record_spool is None:
+            print(f"❌ 未启用spool，丢弃 {len(records)} 条翻译记录")
+            return False
+        try:
+            record_spool.append(records)
+            print(f"✅ {len(records)} 条翻译记录已写入本地spool，等待Java后端恢复后回放")
+            return True
+        except Exception as e:
+            print(f"❌ 写入本地spool时出错: {str(e)}")
+            return False
+
+    history_writer = HistoryWriter(
+        history_sink, config.HISTORY_QUEUE_SIZE, config.HISTORY_BATCH_SIZE, config.HISTORY_FLUSH_INTERVAL,
+        on_failure=save_to_backup_file
+    )
+
+    def save_to_database(original_text, translated_text, source_lang, target_lang, ip_address, models=()):
+        """
+        把翻译记录放入后台写入队列，返回是否成功入队；
+        models为实际产生译文的上游模型（路由和故障切换下可能不止一个），全部来自缓存时为空
+        """
+        if not translated_text or not translated_text.strip():
+            print("❌ 译文为空，拒绝保存到数据库")
+            return False
+        with STAGE_SECONDS.time(('save',)):
+            return history_writer.submit(
+                make_record(original_text, translated_text, source_lang, target_lang, ip_address,
+                            ','.join(sorted(m for m in models if m)) or None)
+            )
+
+    def segment_cache_key(text, source_lang, target_lang, style='report', references=None):
+        """计算某个原文片段的缓存键；译文可能来自路由选中的任一服务，按启用的服务及模型区分"""
+        messages = build_messages(text, source_lang, target_lang, style, references)
+        return make_cache_key(text, source_lang, target_lang, router.cache_scope, prompt_fingerprint(messages, text))
+
+    def translate_segment(text, source_lang, target_lang, style='report', lane='default', models=None,
+                          references=None):
+        """
+        翻译单个原文片段（优先查缓存），返回(译文, 是否命中缓存)；
+        style为提示模板，lane为上游并发排队的优先级道，调用了上游时把实际使用的模型加入集合models，
+        references为翻译记忆中相似句的(原文, 译文)参考
+        """
+        with STAGE_SECONDS.time(('cache_lookup',)):
+            cache_key = segment_cache_key(text, source_lang, target_lang, style, references)
+            cached_text = translation_cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text, True
+
+        def call():
+            with STAGE_SECONDS.time(('prompt',)):
+                messages = build_messages(text, source_lang, target_lang, style, references)
+            completion = router.complete(TranslationTask(messages, text, source_lang, target_lang, lane))
+            translated_text = completion.text.strip()
+            # 兜底服务（离线翻译）的结果不写入缓存
+            if completion.cacheable:
+                translation_cache.set(cache_key, translated_text)
+            return translated_text, completion.model
+
+        # 相同片段正在翻译时等待其结果，不重复调用API
+        (translated_text, model), shared = inflight.do(cache_key, call)
+        if shared:
+            print("合并到正在进行的相同翻译请求")
+        if models is not None:
+            models.add(model)
+        return translated_text, False
+
+    def batch_cache_key(text, source_lang, target_lang):
+        """
+        批量JSON提示产生的译文的缓存键：按批量提示模板计算指纹，与单条提示的缓存分开，
+        普通翻译和流式翻译不会读到由另一套提示产生的译文
+        """
+        messages = build_batch_messages(['{text}'], source_lang, target_lang)
+        return make_cache_key(text, source_lang, target_lang, router.cache_scope,
+                              'batch:' + prompt_fingerprint(messages, None))
+
+    def lookup_segment(text, source_lang, target_lang):
+        """查询批量翻译的单条译文：先查批量提示的缓存，再查翻译记忆"""
+        cached_text = translation_cache.get(batch_cache_key(text, source_lang, target_lang))
+        if cached_text is None and translation_memory is not None:
+            cached_text = translation_memory.get(text, source_lang, target_lang)
+        return cached_text
+
+    def store_segment(text, translated_text, source_lang, target_lang):
+        """保存批量提示产生的单条译文到翻译缓存和翻译记忆"""
+        translation_cache.set(batch_cache_key(text, source_lang, target_lang), translated_text)
+        if translation_memory is not None:
+            translation_memory.add([(text, translated_text)], source_lang, target_lang)
+
+    def stream_to_broadcast(broadcast, task, cache_key):
+        """读取上游流式响应并广播增量，完成后写入缓存；所有客户端都断开时立即关闭上游连接并停止"""
+        provider, deltas = router.stream(task, broadcast.on_cancel)
+        broadcast.model = provider.model
+        try:
+            for delta in deltas:
+                if broadcast.cancelled.is_set():
+                    print("所有客户端已断开，停止读取上游流式响应")
+                    return
+                broadcast.publish(delta)
+        except RequestCancelled:
+            print("所有客户端已断开，已关闭上游流式连接")
+            return
+        finally:
+            deltas.close()
+        if provider.cacheable:
+            translation_cache.set(cache_key, broadcast.text.strip())
+
+    def sse_response(events, stream_id=None):
+        headers = {
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # 防止Nginx缓冲
+        }
+        if stream_id:
+            headers['X-Stream-Id'] = stream_id
+        return Response(stream_with_context(track_stream(events, 'translate_stream')),
+                        mimetype='text/event-stream', headers=headers)
+
+    def start_stream(make_events):
+        """启动流式响应；启用回放缓冲时make_events(流ID)返回的生成器在后台运行，响应从回放缓冲读取事件"""
+        if stream_replay is None:
+            return sse_response(make_events(None))
+        buffer = stream_replay.start(make_events)
+        return sse_response(follow(buffer, 0, config.STREAM_HEARTBEAT_SECONDS or None), buffer.stream_id)
+
+    def resume_stream(last_event_id):
+        """断线重连：从回放缓冲中Last-Event-ID之后的事件接着输出，不再调用上游"""
+        if stream_replay is None:
+            return jsonify({"error": "未启用流式翻译续传，请重新发起翻译"}), 410
+        stream_id, index = parse_event_id(last_event_id)
+        if stream_id is None:
+            return jsonify({"error": "Last-Event-ID格式不正确"}), 400
+        try:
+            buffer = stream_replay.resume(stream_id, index)
+        except StreamGone as e:
+            return jsonify({"error": str(e)}), 410
+        print(f"流 {stream_id} 断线重连，从第 {index + 1} 个事件继续输出")
+        return sse_response(follow(buffer, index, config.STREAM_HEARTBEAT_SECONDS or None), stream_id)
+
+    # 异步翻译任务，重启后工作线程立即继续处理未完成的任务；任务内的片段使用最低优先级的bulk道
+    job_manager = open_jobs(
+        config.JOBS_DB_PATH,
+        lambda text, source_lang, target_lang: translate_segment(text, source_lang, target_lang, lane='bulk')[0],
+        config.JOB_WORKERS, config.JOB_PARALLELISM, config.JOB_MAX_QUEUED, config.JOB_MAX_ATTEMPTS,
+        config.JOB_LEASE_SECONDS, config.JOB_RETENTION_HOURS * 3600,
+        on_complete=lambda job, result: save_to_database(job["text"], result, job["source_lang"],
+                                                         job["target_lang"], job["client_ip"])
+    )
+
+    @app.route('/')
+    def index():
+        """首页 - 返回API状态信息"""
+        return jsonify({
+            "status": "ok",
+            "message": "翻译API服务正在运行",
+            "model": default_model,
+            "endpoints": [
+                "/api/translate - 翻译API",
+                "/api/translate/batch - 批量翻译API",
+                "/api/languages - 获取支持的语言",
+                "/api/check - 检查API密钥",
+                "/api/config - 配置API密钥",
+                "/api/health - 健康检查",
+                "/api/cache/stats - 缓存统计",
+                "/api/upstream/stats - 上游连接池统计",
+                "/api/providers/stats - 翻译服务路由统计"
+            ]
+        })
+
+    @app.route('/api/translate', methods=['POST'])
+    def translate():
+        """
+        翻译API端点
+        请求JSON格式:
+        {
+            "text": "要翻译的文本",
+            "source_lang": "源语言代码(可选)",
+            "target_lang": "目标语言代码"
+        }
+        """
+        print("收到翻译请求")
+        if not router.has_providers():
+            return jsonify({"error": "未配置API密钥"}), 500
+
+        try:
+            data = request.json
+            print(f"翻译请求数据: {data}")
+
+            if not data:
+                return jsonify({"error": "未收到有效的JSON数据"}), 400
+
+            text = data.get('text', '')
+            source_lang = data.get('source_lang', config.DEFAULT_SOURCE_LANG)
+            target_lang = data.get('target_lang', config.DEFAULT_TARGET_LANG)
+
+            if not text:
+                return jsonify({"error": "文本不能为空"}), 400
+
+            # 未指定源语言时在本地检测；整段原文已是目标语言时直接返回，不调用上游
+            with STAGE_SECONDS.time(('detect',)):
+                source_lang, detected = resolve_source_lang(text, source_lang)
+            if detected and source_lang == target_lang and is_entirely_in(text, target_lang):
+                print(f"检测到原文已是目标语言({target_lang})，直接返回原文")
+                return jsonify({
+                    "original_text": text,
+                    "translated_text": text,
+                    "source_lang": source_lang,
+                    "target_lang": target_lang,
+                    "mode": "api",
+                    "cached": False,
+                    "stored": False,
+                    "detected_source_lang": source_lang,
+                    "same_language": True
+                })
+
+            # 实际产生译文的上游模型，写入翻译记录
+            models = set()
+            max_chunk_tokens = token_budget.chunk_tokens(config.SEGMENT_MAX_TOKENS, target_lang)
+
+            def translate_text(part, references=()):
+                """
+                长文本按段落/句子切分（超出单次调用token上限的原文也会切分），各片段并行翻译后按顺序拼接；
+                references为翻译记忆模糊命中的(句子, 相似原文, 译文)，只附在包含该句的片段上
+                """
+                chunks = split_into_chunks(part, max_chunk_tokens)
+                if len(chunks) > 1:
+                    print(f"长文本切分为 {len(chunks)} 个片段并行翻译")
+                results = translate_chunks(
+                    chunks,
+                    lambda chunk_text: translate_segment(
+                        chunk_text, source_lang, target_lang, models=models,
+                        references=[(source, target) for sentence, source, target in references
+                                    if sentence in chunk_text] or None
+                    ),
+                    config.TRANSLATE_PARALLELISM
+                )
+                return join_translations(chunks, [r[0] for r in results], target_lang), all(r[1] for r in results)
+
+            # 多句文档先查翻译记忆：已翻译过的句子直接复用，其余部分仍按普通方式翻译；没有任何命中时返回None
+            memory_result = None
+            if translation_memory is not None:
+                memory_start = time.perf_counter()
+                memory_result = translate_with_memory(
+                    translation_memory, text, source_lang, target_lang,
+                    translate_span=translate_text,
+                    parallelism=config.TRANSLATE_PARALLELISM
+                )
+                STAGE_SECONDS.observe(time.perf_counter() - memory_start, ('memory',))
+            memory_stats = None
+            if memory_result is not None:
+                translated_text, memory_stats = memory_result
+                cached = memory_stats["cached"]
+                print(f"翻译记忆命中 {memory_stats['memory_hits']}/{memory_stats['segments']} 句")
+            else:
+                with STAGE_SECONDS.time(('translate',)):
+                    translated_text, cached = translate_text(text)
+                if cached:
+                    print("命中翻译缓存")
+                elif translation_memory is not None:
+                    learn_translation(translation_memory, text, translated_text, source_lang, target_lang)
+            print(f"翻译结果: {translated_text[:50]}...")
+
+            # 翻译记录放入后台队列写入Java后端数据库，不阻塞响应
+            queued = save_to_database(text, translated_text, source_lang, target_lang, request.remote_addr, models)
+
+            return jsonify({
+                "original_text": text,
+                "translated_text": translated_text,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "mode": "api",
+                "cached": cached,
+                "stored": queued,
+                **({"detected_source_lang": source_lang} if detected else {}),
+                **({"translation_memory": {k: memory_stats[k] for k in ("segments", "memory_hits", "translated")}}
+                   if memory_stats else {})
+            })
+
+        except Exception as e:
+            print(f"翻译错误: {str(e)}")
+            record_error('api', e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/api/translate/batch', methods=['POST'])
+    def translate_batch_endpoint():
+        """
+        批量翻译API端点，把多条短文本打包成少量上游调用
+        请求JSON格式:
+        {
+            "items": ["文本1", {"id": "标识", "text": "文本2"}, ...],
+            "source_lang": "源语言代码(可选)",
+            "target_lang": "目标语言代码"
+        }
+        """
+        print("收到批量翻译请求")
+        if not router.has_providers():
+            return jsonify({"error": "未配置API密钥"}), 500
+
+        try:
+            data = request.json
+            if not data:
+                return jsonify({"error": "未收到有效的JSON数据"}), 400
+
+            items = data.get('items')
+            source_lang = data.get('source_lang', config.DEFAULT_SOURCE_LANG)
+            target_lang = data.get('target_lang', config.DEFAULT_TARGET_LANG)
+
+            if not isinstance(items, list) or not items:
+                return jsonify({"error": "items必须是非空数组"}), 400
+            if len(items) > config.BATCH_MAX_REQUEST_ITEMS:
+                return jsonify({"error": f"单次最多翻译{config.BATCH_MAX_REQUEST_ITEMS}条"}), 400
+
+            ids = []
+            texts = []
+            for index, item in enumerate(items):
+                if isinstance(item, dict):
+                    ids.append(item.get('id', index))
+                    texts.append(item.get('text', ''))
+                else:
+                    ids.append(index)
+                    texts.append(item)
+                if not isinstance(texts[-1], str) or not texts[-1].strip():
+                    return jsonify({"error": f"第{index + 1}条文本为空或格式错误"}), 400
+
+            print(f"批量翻译 {len(texts)} 条")
+
+            # 未指定源语言时逐条检测，已是目标语言的条目直接返回原文
+            source_lang, same_language = resolve_batch_source_lang(texts, source_lang, target_lang)
+            pending = [i for i in range(len(texts)) if i not in same_language]
+
+            models = set()
+
+            def complete(messages):
+                completion = router.complete(TranslationTask(messages, None, source_lang, target_lang, 'bulk'))
+                models.add(completion.model)
+                return completion.text
+
+            with STAGE_SECONDS.time(('batch',)):
+                results, stats = translate_batch(
+                    [texts[i] for i in pending], source_lang, target_lang,
+                    lookup=lambda t: lookup_segment(t, source_lang, target_lang),
+                    store=lambda t, translated: store_segment(t, translated, source_lang, target_lang),
+                    complete=complete,
+                    translate_one=lambda t: translate_segment(t, source_lang, target_lang, lane='bulk',
+                                                              models=models)[0],
+                    max_tokens=token_budget.chunk_tokens(config.BATCH_MAX_TOKENS, target_lang),
+                    max_items=config.BATCH_MAX_ITEMS,
+                    parallelism=config.TRANSLATE_PARALLELISM
+                )
+            translated = dict(zip(pending, results))
+            results = [translated.get(i) or {"translated_text": texts[i], "cached": False, "same_language": True}
+                       for i in range(len(texts))]
+            stats["same_language"] = len(same_language)
+            print(f"批量翻译完成: {stats}")
+
+            for text, result in zip(texts, results):
+                if result.get("translated_text") and not result.get("cached") and not result.get("same_language"):
+                    save_to_database(text, result["translated_text"], source_lang, target_lang, request.remote_addr,
+                                     models)
+
+            return jsonify({
+                "items": [
+                    dict(result, id=item_id, original_text=text)
+                    for item_id, text, result in zip(ids, texts, results)
+                ],
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "mode": "api",
+                "stats": stats
+            })
+
+        except Exception as e:
+            print(f"批量翻译错误: {str(e)}")
+            record_error('api', e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/api/languages', methods=['GET'])
+    def get_languages():
+        """获取支持的语言列表"""
+        print("收到获取语言列表请求")
+        languages = {
+            "zh": "中文",
+            "en": "英语",
+            "ja": "日语",
+            "ko": "韩语",
+            "fr": "法语",
+            "de": "德语",
+            "es": "西班牙语",
+            "ru": "俄语",
+            "ar": "阿拉伯语",
+            "pt": "葡萄牙语",
+            "it": "意大利语"
+        }
+        return jsonify(languages)
+
+    @app.route('/api/check', methods=['GET'])
+    def check_api():
+        """检查API密钥是否已配置"""
+        print("检查API配置")
+
+        if router.has_providers():
+            return jsonify({
+                "status": "ok",
+                "message": "API密钥已配置",
+                "model": router.primary.model,
+                "providers": [p.name for p in router.providers],
+                "offline_mode": all(p.fallback for p in router.providers)
+            })
+        else:
+            return jsonify({"status": "error", "message": "API密钥未配置"}), 500
+
+    @app.route('/api/config', methods=['POST'])
+    def configure_api():
+        """配置API密钥和模型"""
+        print("收到API配置请求")
+        try:
+            data = request.json
+            print(f"配置数据: {data}")
+            if not data:
+                return jsonify({"error": "未收到有效的JSON数据"}), 400
+
+            # 正常API模式，需要API密钥
+            if not data.get('api_key'):
+                return jsonify({"error": "API密钥不能为空"}), 400
+        except Exception as e:
+            print(f"配置保存失败: {str(e)}")
+            return jsonify({"error": f"配置保存失败: {str(e)}"}), 500
+
+    # 添加一个简单的健康检查端点
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        print("收到健康检查请求")
+        return jsonify({
+            "status": "ok",
+            "message": "服务正常运行",
+            "model": default_model,
+        })
+
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        """翻译缓存命中/未命中/淘汰统计，以及合并的并发请求数"""
+        stats = translation_cache.stats()
+        stats["inflight"] = inflight.stats()
+        stats["stream_flights"] = stream_flights.stats()
+        stats["translation_memory"] = translation_memory.stats() if translation_memory is not None else None
+        return jsonify(stats)
+
+    @app.route('/api/providers/stats', methods=['GET'])
+    def providers_stats():
+        """各翻译服务的EWMA延迟、错误率和进行中请求数，对冲请求统计，以及token预算的校准情况"""
+        stats = router.stats()
+        stats["token_budget"] = token_budget.stats()
+        return jsonify(stats)
+
+    @app.route('/api/upstream/stats', methods=['GET'])
+    def upstream_stats():
+        """上游连接池使用情况"""
+        return jsonify(upstream.stats())
+
+    @app.route('/api/history/stats', methods=['GET'])
+    def history_stats():
+        """翻译记录写入队列和spool回放统计"""
+        stats = history_writer.stats()
+        stats["spool"] = spool_replayer.stats() if spool_replayer else None
+        return jsonify(stats)
+
+    @app.route('/api/streams/stats', methods=['GET'])
+    def streams_stats():
+        """可续传流式翻译的回放缓冲统计"""
+        if stream_replay is None:
+            return jsonify({"enabled": False})
+        return jsonify(dict(stream_replay.stats(), enabled=True))
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Prometheus文本格式的运行指标：各阶段和上游调用耗时、流式首token时间与生成速度、进行中请求数、错误计数"""
+        return app.response_class(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_endpoint = request.endpoint or 'unknown'
+        metrics.HTTP_REQUESTS_IN_FLIGHT.inc((g.metrics_endpoint,))
+
+    @app.after_request
+    def observe_request_metrics(response):
+        # 流式响应只统计到响应开始为止，输出期间计入进行中的流数量
+        if 'metrics_start' in g:
+            metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start,
+                                                 (g.metrics_endpoint, str(response.status_code)))
+        finish_request_metrics()
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(error=None):
+        # 没有走到after_request的请求在这里减少进行中的请求数，每个请求只减一次
+        if 'metrics_start' in g and not g.get('metrics_finished'):
+            g.metrics_finished = True
+            metrics.HTTP_REQUESTS_IN_FLIGHT.dec((g.metrics_endpoint,))
+
+    def export_stats():
+        """把翻译缓存、写入队列和各服务进行中请求数等已有统计导出为指标"""
+        cache = translation_cache.stats()
+        providers = router.stats()["providers"]
+        return [
+            ("translator_cache_lookups_total", "counter", "翻译缓存查询次数",
+             {(("result", "hit"),): cache["hits"], (("result", "miss"),): cache["misses"]}),
+            ("translator_cache_entries", "gauge", "内存翻译缓存条目数", {(): cache["size"]}),
+            ("translator_history_queue_depth", "gauge", "等待写入Java后端的翻译记录数",
+             {(): history_writer.stats()["queue_depth"]}),
+            ("translator_provider_in_flight", "gauge", "各翻译服务进行中的调用数",
+             {(("provider", name),): state["in_flight"] for name, state in providers.items()}),
+            ("translator_stream_replay_bytes", "gauge", "流式翻译回放缓冲占用的内存（字节）",
+             {(): stream_replay.bytes if stream_replay else 0}),
+            ("translator_jobs", "gauge", "按状态统计的异步翻译任务数",
+             {(("status", status),): count
+              for status, count in (job_manager.store.counts() if job_manager else {}).items()}),
+        ]
+
+    metrics.REGISTRY.add_collector(export_stats)
+
+    @app.route('/api/translate/stream', methods=['POST'])
+    def translate_stream():
+        """
+        流式翻译API端点
+        请求JSON格式:
+        {
+            "text": "要翻译的文本",
+            "source_lang": "源语言代码(可选)",
+            "target_lang": "目标语言代码",
+            "stream_mode": "full(默认，每次携带全文) 或 delta(只发送合并后的增量)"
+        }
+        每个事件带有 id: <流ID>:<序号>，start事件携带stream_id；断线后带请求头 Last-Event-ID 重新请求即可
+        接着收到缺失的事件（流不存在或已过期时返回410，应重新发起翻译）
+        """
+        last_event_id = request.headers.get('Last-Event-ID')
+        if last_event_id:
+            return resume_stream(last_event_id)
+
+        print("收到流式翻译请求")
+        if not router.has_providers():
+            return jsonify({"error": "未配置API密钥"}), 500
+
+        try:
+            data = request.json
+            print(f"流式翻译请求数据: {data}")
+
+            if not data:
+                return jsonify({"error": "未收到有效的JSON数据"}), 400
+
+            text = data.get('text', '')
+            source_lang = data.get('source_lang', config.DEFAULT_SOURCE_LANG)
+            target_lang = data.get('target_lang', config.DEFAULT_TARGET_LANG)
+
+            if not text:
+                return jsonify({"error": "文本不能为空"}), 400
+
+            stream_mode = parse_stream_mode(data.get('stream_mode'))
+            if stream_mode is None:
+                return jsonify({"error": "stream_mode只能是full或delta"}), 400
+
+            # 未指定源语言时在本地检测；整段原文已是目标语言时直接返回原文
+            with STAGE_SECONDS.time(('detect',)):
+                source_lang, detected = resolve_source_lang(text, source_lang)
+            start_fields = {'source_lang': source_lang, 'target_lang': target_lang}
+            if detected:
+                start_fields['detected_source_lang'] = source_lang
+            if detected and source_lang == target_lang and is_entirely_in(text, target_lang):
+                print(f"检测到原文已是目标语言({target_lang})，直接返回原文")
+
+                def same_language(stream_id=None):
+                    encoder = StreamEncoder(stream_mode)
+                    yield encoder.start_event(**start_fields, **({'stream_id': stream_id} if stream_id else {}))
+                    yield encoder.push(text)
+                    yield encoder.end_event(same_language=True)
+
+                return start_stream(same_language)
+
+            style = profile.stream_style
+            client_ip = request.remote_addr
+
+            # 长文本切分：第一个片段通过流式API实时输出，其余片段同时并行翻译，完成后按顺序输出
+            chunks = split_into_chunks(text, token_budget.chunk_tokens(config.SEGMENT_MAX_TOKENS, target_lang))
+            first_chunk = chunks[0].text
+            first_key = segment_cache_key(first_chunk, source_lang, target_lang, style)
+            first_cached = translation_cache.get(first_key)
+            if len(chunks) > 1:
+                print(f"长文本切分为 {len(chunks)} 个片段，流式输出第一个片段，其余并行翻译")
+
+            def generate(stream_id=None):
+                encoder = StreamEncoder(stream_mode, config.SSE_COALESCE_MS, config.SSE_COALESCE_BYTES,
+                                        config.SSE_CHECKPOINT_EVERY)
+                # 首先发送一个初始化事件，让前端知道连接已建立；
+                # 在订阅上游之前发送，客户端在此断开时不会留下未注销的订阅者
+                yield encoder.start_event(**start_fields, **({'stream_id': stream_id} if stream_id else {}))
+
+                deadline = StreamDeadline(config.STREAM_IDLE_TIMEOUT, config.STREAM_TOTAL_TIMEOUT)
+                heartbeat = config.STREAM_HEARTBEAT_SECONDS or None
+                subscription = None
+                executor = None
+                models = set()
+                try:
+                    pending = []
+                    if len(chunks) > 1:
+                        executor = ThreadPoolExecutor(
+                            max_workers=max(1, min(config.TRANSLATE_PARALLELISM, len(chunks) - 1)))
+                        pending = [
+                            executor.submit(translate_segment, chunk.text, source_lang, target_lang, style,
+                                            'interactive', models)
+                            for chunk in chunks[1:]
+                        ]
+
+                    all_cached = first_cached is not None
+                    if first_cached is not None:
+                        # 命中缓存时直接回放，不再调用API
+                        print("流式翻译命中缓存")
+                        yield encoder.push(chunks[0].leading + first_cached)
+                    else:
+                        # 调用流式API；相同请求正在进行时订阅其输出，先收到已产生的部分
+                        task = TranslationTask(build_messages(first_chunk, source_lang, target_lang, style),
+                                               first_chunk, source_lang, target_lang, 'interactive')
+                        broadcast, joined = stream_flights.join(
+                            first_key, lambda b: stream_to_broadcast(b, task, first_key)
+                        )
+                        if joined:
+                            print("合并到正在进行的相同流式翻译")
+                        # 与缓存中的译文及非流式拼接一致，去掉片段首尾的空白
+                        stripper = DeltaStripper(chunks[0].leading)
+                        # 有缓冲的增量时最多等到合并时间窗口结束，随后发送（后沿），不等下一个增量或心跳
+                        subscription = broadcast.subscribe(lambda: encoder.wait_timeout(heartbeat))
+                        for delta in subscription:
+                            if delta is None:
+                                deadline.check()
+                                # 上游暂时没有输出：发送缓冲的增量或心跳，客户端已断开时写入失败
+                                yield encoder.flush() or HEARTBEAT
+                                continue
+                            deadline.touch()
+                            deadline.check()
+                            # 发送增量内容（full模式同时携带累积的内容）
+                            event = encoder.push(stripper.push(delta))
+                            if event:
+                                yield event
+                        models.add(broadcast.model)
+
+                    # 按原顺序输出其余片段的译文
+                    for chunk, future in zip(chunks, pending):
+                        if not future.done():
+                            # 等待其余片段前先发送缓冲的增量
+                            event = encoder.flush()
+                            if event:
+                                yield event
+                        segment_text, segment_cached = yield from wait_with_heartbeat(future, deadline, heartbeat)
+                        all_cached = all_cached and segment_cached
+                        event = encoder.push(chunk_joiner(chunk, target_lang) + segment_text)
+                        if event:
+                            yield event
+
+                    # 翻译完成后发送完成事件
+                    yield encoder.end_event(**({'cached': True} if all_cached else {}))
+
+                    # 翻译记录放入后台写入队列
+                    save_to_database(text, encoder.text, source_lang, target_lang, client_ip, models)
+
+                except GeneratorExit:
+                    # 客户端断开（启用续传时为断开后超过等待时间仍未重连）后关闭生成器：
+                    # 停止订阅，最后一个订阅者离开时上游连接随即关闭
+                    print("客户端已断开流式连接，停止翻译")
+                    STREAMS_CANCELLED.inc(('translate_stream', 'client_disconnect'))
+                    raise
+                except StreamTimeout as e:
+                    print(f"流式翻译超时: {str(e)}")
+                    STREAMS_CANCELLED.inc(('translate_stream', e.reason))
+                    error_data = {'type': 'error', 'message': str(e)}
+                    yield encoder.flush() + f"data: {json.dumps(error_data)}\n\n"
+                except Exception as e:
+                    print(f"流式翻译过程中出错: {str(e)}")
+                    record_error('api', e)
+                    error_data = {'type': 'error', 'message': str(e)}
+                    yield encoder.flush() + f"data: {json.dumps(error_data)}\n\n"
+                finally:
+                    if subscription is not None:
+                        subscription.close()
+                    if executor is not None:
+                        executor.shutdown(wait=False, cancel_futures=True)
+
+            # 返回流式响应
+            return start_stream(generate)
+
+        except Exception as e:
+            print(f"流式翻译错误: {str(e)}")
+            record_error('api', e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/api/jobs', methods=['POST'])
+    def create_job():
+        """
+        提交异步翻译任务，立即返回任务ID和状态（202），随后通过 GET /api/jobs/<id> 查询进度和译文
+        请求JSON格式:
+        {
+            "text": "要翻译的文本",
+            "source_lang": "源语言代码(可选)",
+            "target_lang": "目标语言代码"
+        }
+        或multipart表单: file（UTF-8编码的文本文件）、source_lang、target_lang
+        """
+        if job_manager is None:
+            return jsonify({"error": "未启用异步翻译任务"}), 503
+        if not router.has_providers():
+            return jsonify({"error": "未配置API密钥"}), 500
+
+        try:
+            upload = request.files.get('file')
+            if upload is not None:
+                fields = request.form
+                # UTF-8每个字符最多4字节，超出时不再读取剩余内容
+                raw = upload.read(config.JOB_MAX_CHARS * 4 + 1)
+                if len(raw) > config.JOB_MAX_CHARS * 4:
+                    return jsonify({"error": f"原文不能超过 {config.JOB_MAX_CHARS} 个字符"}), 413
+                try:
+                    text = raw.decode('utf-8-sig')
+                except UnicodeDecodeError:
+                    return jsonify({"error": "上传的文件必须是UTF-8编码的文本"}), 400
+                filename = upload.filename
+            else:
+                fields = request.get_json(silent=True)
+                if not fields:
+                    return jsonify({"error": "未收到有效的JSON数据或上传文件"}), 400
+                text = fields.get('text', '')
+                filename = None
+            source_lang = fields.get('source_lang', config.DEFAULT_SOURCE_LANG)
+            target_lang = fields.get('target_lang', config.DEFAULT_TARGET_LANG)
+
+            if not text:
+                return jsonify({"error": "文本不能为空"}), 400
+            if len(text) > config.JOB_MAX_CHARS:
+                return jsonify({"error": f"原文不能超过 {config.JOB_MAX_CHARS} 个字符"}), 413
+
+            # 未指定源语言时在本地检测；整段原文已是目标语言时任务直接完成
+            with STAGE_SECONDS.time(('detect',)):
+                source_lang, detected = resolve_source_lang(text, source_lang)
+            same_language = detected and source_lang == target_lang and is_entirely_in(text, target_lang)
+            chunks = split_into_chunks(text, token_budget.chunk_tokens(config.SEGMENT_MAX_TOKENS, target_lang))
+            job = job_manager.submit(text, chunks, source_lang, target_lang, filename, request.remote_addr,
+                                     result=text if same_language else None)
+            print(f"已提交翻译任务 {job['id']}: {len(text)} 个字符，{len(chunks)} 个片段")
+            return jsonify(job), 202, {'Location': f"/api/jobs/{job['id']}"}
+
+        except JobQueueFull as e:
+            return jsonify({"error": str(e)}), 429
+        except Exception as e:
+            print(f"提交翻译任务出错: {str(e)}")
+            record_error('api', e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/api/jobs/stats', methods=['GET'])
+    def jobs_stats():
+        """异步翻译任务按状态的数量和处理统计"""
+        if job_manager is None:
+            return jsonify({"enabled": False})
+        return jsonify(dict(job_manager.stats(), enabled=True))
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        """查询异步翻译任务的状态和进度；未完成时partial_text为已译完的开头部分，完成后translated_text为完整译文"""
+        if job_manager is None:
+            return jsonify({"error": "未启用异步翻译任务"}), 503
+        job = job_manager.status(job_id)
+        if job is None:
+            return jsonify({"error": "任务不存在或已过期"}), 404
+        return jsonify(job)
+
+    return app
+
+
+def run(app):
+    """以开发服务器运行，HOST、PORT、DEBUG从环境变量读取"""
+    host = os.getenv('HOST', '0.0.0.0')
+    port = int(os.getenv('PORT', 5000))
+    debug = os.getenv('DEBUG', 'True') == 'True'
+
+    print(f"启动服务器: {host}:{port}, 调试模式: {debug}")
+    print(f"API访问地址: http://{host if host != '0.0.0.0' else 'localhost'}:{port}")
+    print(f"支持的API端点: /api/translate, /api/languages, /api/check, /api/config, /api/health")
+    app.run(host=host, port=port, debug=debug)
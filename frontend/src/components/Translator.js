@@ -74,44 +74,62 @@ function Translator({ languages, apiBaseUrl, onViewHistory }) {
     
     setTranslatedText('');
     
-    try {
-      const url = new URL(`${apiBaseUrl}/api/translate/stream`);
-      
-      const response = await fetch(url, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          text: sourceText,
-          source_lang: sourceLang,
-          target_lang: targetLang
-        })
-      });
-      
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.error || '流式翻译请求失败');
-      }
-      
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
-      let translationCompleted = false;
-      
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
+    const url = new URL(`${apiBaseUrl}/api/translate/stream`);
+    const body = JSON.stringify({
+      text: sourceText,
+      source_lang: sourceLang,
+      target_lang: targetLang,
+      // 只接收合并后的增量，由前端自行累积译文
+      stream_mode: 'delta'
+    });
+    let translationCompleted = false;
+    let accumulated = '';
+    // 最后收到的事件编号，网络中断后带上它重连，服务端只补发缺失的事件
+    let lastEventId = null;
+    let resumeAttempts = 0;
+    
+    while (true) {
+      try {
+        const headers = { 'Content-Type': 'application/json' };
+        if (lastEventId) {
+          headers['Last-Event-ID'] = lastEventId;
+        }
+        const response = await fetch(url, { method: 'POST', headers, body });
         
-        const text = decoder.decode(value, { stream: true });
+        if (!response.ok) {
+          const errorData = await response.json();
+          throw new Error(errorData.error || '流式翻译请求失败');
+        }
         
-        const lines = text.split('\n\n');
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let failed = false;
+        
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          
+          // 事件可能被拆分到多次读取中，保留最后一个不完整的事件
+          buffer += decoder.decode(value, { stream: true });
+          const events = buffer.split('\n\n');
+          buffer = events.pop();
+          for (const event of events) {
+            let payload = null;
+            for (const line of event.split('\n')) {
+              if (line.startsWith('id: ')) {
+                lastEventId = line.substring(4);
+              } else if (line.startsWith('data: ')) {
+                payload = line.substring(6);
+              }
+            }
+            if (payload === null) continue;
             try {
-              const data = JSON.parse(line.substring(6));
+              const data = JSON.parse(payload);
               
               if (data.type === 'update') {
-                setTranslatedText(data.text);
+                accumulated += data.delta;
+                setTranslatedText(accumulated);
               } else if (data.type === 'end') {
                 if (!translationCompleted) {
                   translationCompleted = true;
@@ -121,17 +139,28 @@ function Translator({ languages, apiBaseUrl, onViewHistory }) {
                   }, 3000);
                 }
               } else if (data.type === 'error') {
+                failed = true;
                 setError(data.message || '翻译过程中出错');
               }
             } catch (err) {
-              console.error('解析流数据失败:', err, line);
+              console.error('解析流数据失败:', err, event);
             }
           }
         }
+        // 连接在结束事件之前被关闭时同样尝试续传
+        if (translationCompleted || failed || !lastEventId || resumeAttempts >= 3) {
+          return;
+        }
+      } catch (err) {
+        // 网络中断（fetch抛出TypeError）时带Last-Event-ID重连，其他错误直接抛出
+        if (!(err instanceof TypeError) || !lastEventId || translationCompleted || resumeAttempts >= 3) {
+          console.error('流式翻译错误:', err);
+          throw err;
+        }
+        console.warn('流式连接中断，尝试续传:', err);
       }
-    } catch (err) {
-      console.error('流式翻译错误:', err);
-      throw err;
+      resumeAttempts += 1;
+      await new Promise(resolve => setTimeout(resolve, 1000 * resumeAttempts));
     }
   };
 
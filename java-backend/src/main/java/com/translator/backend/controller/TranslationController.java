@@ -43,6 +43,29 @@ public class TranslationController {
         return new ResponseEntity<>(savedRecord, HttpStatus.CREATED);
     }
 
+    /**
+     * 批量保存翻译记录（供Python服务的后台写入队列使用），整批在一个事务中保存
+     * 记录中已带有客户端IP和创建时间时保留原值，否则使用请求方IP和保存时间
+     */
+    @PostMapping("/batch")
+    public ResponseEntity<Map<String, Object>> saveTranslations(
+            @RequestBody List<TranslationRecord> translationRecords,
+            HttpServletRequest request) {
+
+        for (TranslationRecord record : translationRecords) {
+            record.setId(null);
+            if (record.getIpAddress() == null || record.getIpAddress().isEmpty()) {
+                record.setIpAddress(request.getRemoteAddr());
+            }
+        }
+
+        List<TranslationRecord> savedRecords = translationService.saveTranslations(translationRecords);
+
+        Map<String, Object> response = new HashMap<>();
+        response.put("saved", savedRecords.size());
+        return new ResponseEntity<>(response, HttpStatus.CREATED);
+    }
+
     /**
      * 根据ID获取翻译记录
      */
@@ -3,7 +3,6 @@ package com.translator.backend.model;
 import lombok.AllArgsConstructor;
 import lombok.Data;
 import lombok.NoArgsConstructor;
-import org.hibernate.annotations.CreationTimestamp;
 import org.hibernate.annotations.UpdateTimestamp;
 
 import javax.persistence.*;
@@ -44,9 +43,18 @@ public class TranslationRecord {
     @Column(length = 50)
     private String model;
 
-    @CreationTimestamp
+    /**
+     * 翻译发生的时间；Python服务批量写入或从spool回放时带上记录产生的时间，未提供时使用保存时间
+     */
     private LocalDateTime createdAt;
 
     @UpdateTimestamp
     private LocalDateTime updatedAt;
+
+    @PrePersist
+    protected void onCreate() {
+        if (createdAt == null) {
+            createdAt = LocalDateTime.now();
+        }
+    }
 } 
\ No newline at end of file
@@ -18,6 +18,11 @@ public interface TranslationService {
      */
     TranslationRecord saveTranslation(TranslationRecord translationRecord);
     
+    /**
+     * 批量保存翻译记录
+     */
+    List<TranslationRecord> saveTranslations(List<TranslationRecord> translationRecords);
+    
     /**
      * 根据ID查询翻译记录
      */
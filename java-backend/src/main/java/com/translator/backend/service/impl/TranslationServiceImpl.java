@@ -7,6 +7,7 @@ import lombok.RequiredArgsConstructor;
 import org.springframework.data.domain.Page;
 import org.springframework.data.domain.Pageable;
 import org.springframework.stereotype.Service;
+import org.springframework.transaction.annotation.Transactional;
 
 import java.time.LocalDateTime;
 import java.util.List;
@@ -26,6 +27,12 @@ public class TranslationServiceImpl implements TranslationService {
         return translationRecordRepository.save(translationRecord);
     }
 
+    @Override
+    @Transactional
+    public List<TranslationRecord> saveTranslations(List<TranslationRecord> translationRecords) {
+        return translationRecordRepository.saveAll(translationRecords);
+    }
+
     @Override
     public Optional<TranslationRecord> findById(Long id) {
         return translationRecordRepository.findById(id);